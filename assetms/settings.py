@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -193,6 +194,36 @@ SESSION_COOKIE_AGE = 3600  # 1 hour
 # Permission Cache Settings
 PERMISSION_CACHE_TIMEOUT = 3600
 
+# 'default' is per process. 'shared' only holds the schema and dashboard
+# version tokens (assets.schema, assets.dashboard), which every worker must
+# see for invalidations to reach it: a directory shared by the workers of one
+# host here; point it at Redis (django.core.cache.backends.redis.RedisCache)
+# when workers span several hosts. See DEPLOYMENT_GUIDE.md.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache',
+    },
+}
+
+# The suite runs with a per-process cache (assetms.test_runner)
+TEST_RUNNER = 'assetms.test_runner.TestRunner'
+
+# Asset schema registry (assets.schema): seconds a cached category/field snapshot
+# is trusted.
+SCHEMA_REGISTRY_TTL = 300
+
+# Background exports (assets.export_jobs, run by `manage.py run_export_jobs`):
+# running jobs older than this many seconds are marked failed.
+EXPORT_JOB_TIMEOUT = 3600
+
+# PDF exports (assets.pdf) render row chunks in this many worker processes;
+# merging the chunks needs the optional pypdf package.
+PDF_EXPORT_WORKERS = min(4, os.cpu_count() or 1)
+
 # Logging Configuration
 LOGGING = {
     'version': 1,
@@ -228,3 +259,66 @@ LOGGING = {
         },
     },
 }
+
+# Bulk import (assets.importer): rows per bulk insert, transaction and
+# resume checkpoint.
+IMPORT_BATCH_SIZE = 500
+
+# Bulk import staging (assets.staging): seconds a previewed upload stays
+# available for confirmation; `manage.py purge_import_staging` cleans up.
+IMPORT_STAGING_TTL = 86400
+
+# Base URL encoded in asset QR codes (assets.qr), e.g. https://assets.example.com.
+# Empty: the host of the request that creates the asset.
+ASSET_QR_BASE_URL = ''
+
+# Asset QR codes are served on demand from /assets/<uuid>/qr.png|svg. Set to
+# False to stop also writing a PNG per asset under qr_codes/.
+ASSET_QR_STORE_FILES = True
+# Rendered QR codes kept in each process's LRU cache.
+ASSET_QR_CACHE_SIZE = 1024
+
+# Scan lookups (assets.codes): seconds a resolved code and its scan payload
+# stay cached, which bounds how long other workers may serve a stale scan.
+SCAN_CACHE_TTL = 300
+
+# Batch scan uploads (assets.scans): most scans accepted per request, and
+# seconds an idempotency key is remembered so retried uploads are not
+# recorded twice.
+SCAN_BATCH_MAX = 1000
+SCAN_RECEIPT_TTL = 7 * 86400
+
+# Depreciation snapshots (assets.depreciation): months of stored book values
+# before and after the current month. `manage.py snapshot_depreciation`
+# should run monthly to move the window along.
+DEPRECIATION_SNAPSHOT_PAST = 12
+DEPRECIATION_SNAPSHOT_FUTURE = 12
+
+# Dashboard bundles (assets.dashboard): seconds a cached bundle may be served
+# when a write bypassed invalidation.
+DASHBOARD_CACHE_TTL = 300
+
+# Dashboard push events (assets.events): events kept for reconnecting
+# clients, seconds between keepalives (which also refresh the user session
+# and pick up other workers' changes), and seconds before a stream is closed
+# for the client to reconnect. Streams are only served under ASGI.
+EVENT_BUFFER_SIZE = 1000
+EVENT_STREAM_KEEPALIVE = 25
+EVENT_STREAM_MAX_AGE = 3600
+
+# Audit log writes (audit.buffer): 'buffered' queues log_audit entries and
+# writes them from a background thread in batches of AUDIT_FLUSH_SIZE or
+# every AUDIT_FLUSH_INTERVAL seconds, spooling them to AUDIT_SPOOL_DIR until
+# written; 'sync' writes each entry at once, as the test runner sets it.
+AUDIT_LOG_MODE = 'buffered'
+AUDIT_FLUSH_SIZE = 200
+AUDIT_FLUSH_INTERVAL = 2
+AUDIT_BUFFER_MAX = 10000
+AUDIT_SPOOL_DIR = BASE_DIR / 'logs' / 'audit-spool'
+
+# Audit archival (audit.archive, run by `manage.py archive_audit_logs`):
+# months kept in the audit log besides the current one, and months after
+# which archived entries are deleted, leaving their daily rollups (None
+# keeps them).
+AUDIT_RETENTION_MONTHS = 6
+AUDIT_ARCHIVE_RETENTION_MONTHS = None
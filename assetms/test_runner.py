@@ -0,0 +1,28 @@
+"""
+Test runner for the project (TEST_RUNNER).
+
+Runs the suite against per-process in-memory caches rather than the shared
+file cache in CACHES, so version tokens never leak between test runs, and
+with AUDIT_LOG_MODE 'sync', so audit entries exist as soon as they are logged.
+"""
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+TEST_SETTINGS = {
+    'CACHES': {
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        'shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'shared'},
+    },
+    'AUDIT_LOG_MODE': 'sync',
+}
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._test_settings = override_settings(**TEST_SETTINGS)
+        self._test_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._test_settings.disable()
+        super().teardown_test_environment(**kwargs)
@@ -17,7 +17,7 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 from assets.views import (
-    asset_create, get_dynamic_fields, AssetListView, AssetDetailView, AssetScanView, asset_by_code, AssetDetailByUUIDView, asset_export, AssetBulkImportView, download_import_template, dashboard_summary_api, dashboard_activity_api, dashboard_chart_data_api,
+    asset_create, get_dynamic_fields, AssetListView, AssetDetailView, AssetScanView, asset_by_code, asset_scan_batch, AssetDetailByUUIDView, asset_qr, asset_export, export_job_status, export_job_download, AssetBulkImportView, download_import_template, dashboard_summary_api, dashboard_bundle, dashboard_events, dashboard_activity_api, dashboard_chart_data_api,
     recent_added_assets_api, recent_scans_api, recent_transfers_api, recent_maintenance_api, full_audit_log_api, user_assets_api, user_activity_api, api_create_category, api_categories, api_category_fields, api_create_field, api_update_field, api_delete_field
 )
 from django.conf import settings
@@ -37,13 +37,19 @@ urlpatterns = [
     path('assets/<int:pk>/', AssetDetailView.as_view(), name='asset_detail'),
     path('scan/', AssetScanView.as_view(), name='asset_scan'),
     path('api/asset-by-code/', asset_by_code, name='asset_by_code'),
+    path('api/scans/batch/', asset_scan_batch, name='asset_scan_batch'),
     path('assets/<uuid:uuid>/', AssetDetailByUUIDView.as_view(), name='asset_detail_by_uuid'),
+    path('assets/<uuid:uuid>/qr.<str:format>', asset_qr, name='asset_qr'),
     path('dashboard/', TemplateView.as_view(template_name='dashboard.html'), name='dashboard'),
+    path('dashboard/bundle/', dashboard_bundle, name='dashboard_bundle'),
+    path('dashboard/events/', dashboard_events, name='dashboard_events'),
     path('dashboard_summary_api/', dashboard_summary_api, name='dashboard_summary_api'),
     path('dashboard_activity_api/', dashboard_activity_api, name='dashboard_activity_api'),
     path('dashboard_chart_data_api/', dashboard_chart_data_api, name='dashboard_chart_data_api'),
     path('', include('users.urls')),
     path('assets/export/', asset_export, name='asset_export'),
+    path('assets/export/jobs/<int:job_id>/', export_job_status, name='export_job_status'),
+    path('assets/export/jobs/<int:job_id>/download/', export_job_download, name='export_job_download'),
     path('test-modal/', TemplateView.as_view(template_name='test_modal.html'), name='test_modal'),
     path('assets/bulk-import/', AssetBulkImportView.as_view(), name='asset_bulk_import'),
     path('assets/download-import-template/', download_import_template, name='download_import_template'),
@@ -1,5 +1,8 @@
 from django.contrib import admin, messages
-from .models import AssetCategory, Asset, AssetCategoryField
+from .models import AssetCategory, Asset, AssetCategoryField, ExportLog
+from . import pdf, schema
+from .forms import NaturalKeyFormMixin
+from .exports import export_columns, iter_rows
 from django.forms.models import BaseInlineFormSet
 from import_export import resources
 from import_export.admin import ImportExportModelAdmin
@@ -8,13 +11,16 @@ from django import forms
 from django.urls import reverse
 from django.utils.safestring import mark_safe
 from django.conf import settings
+from django.http import FileResponse
+from django.utils import timezone
 import json
+import tempfile
 
 class AssetCategoryFieldInline(admin.TabularInline):
     model = AssetCategoryField
     extra = 1
     min_num = 1
-    fields = ('key', 'label', 'type', 'required')
+    fields = ('key', 'label', 'type', 'required', 'indexed')
 
 @admin.register(AssetCategory)
 class AssetCategoryAdmin(admin.ModelAdmin):
@@ -50,7 +56,7 @@ class AssetResource(resources.ModelResource):
             data[f'dyn_{k}'] = v
         return data
 
-class AssetAdminForm(forms.ModelForm):
+class AssetAdminForm(NaturalKeyFormMixin, forms.ModelForm):
     class Meta:
         model = Asset
         fields = '__all__'
@@ -65,8 +71,7 @@ class AssetAdminForm(forms.ModelForm):
         # If editing, get the category from the instance
         category = self.initial.get('category') or (self.instance.category.pk if self.instance and self.instance.category_id else None)
         if category:
-            fields = AssetCategoryField.objects.filter(category_id=category)
-            for f in fields:
+            for f in schema.category_fields(category):
                 fname = f"dyn_{f.key}"
                 self.fields[fname] = forms.CharField(
                     label=f.label,
@@ -86,6 +91,7 @@ class AssetAdminForm(forms.ModelForm):
                 key = name.replace('dyn_', '')
                 dynamic_data[key] = cleaned_data.get(name)
         cleaned_data['dynamic_data'] = dynamic_data
+        self.check_natural_key(cleaned_data.get('category'), dynamic_data)
         return cleaned_data
 
     def save(self, commit=True):
@@ -106,12 +112,18 @@ class AssetAdmin(ImportExportModelAdmin):
     actions = ['export_as_pdf']
     fieldsets = (
         (None, {
-            'fields': ('category', 'status', 'assigned_to', 'description', 'purchase_value', 'purchase_date', 'depreciation_method', 'useful_life_years', 'qr_code', 'images', 'documents', 'dynamic_data')
+            'fields': ('category', 'status', 'assigned_to', 'description', 'purchase_value', 'purchase_date', 'depreciation_method', 'useful_life_years', 'salvage_value', 'total_units', 'units_used', 'qr_code', 'images', 'documents', 'dynamic_data')
         }),
     )
     def export_as_pdf(self, request, queryset):
-        # TODO: Implement PDF export with branding
-        self.message_user(request, 'PDF export coming soon!')
+        header = export_columns()
+        row_count = queryset.count()
+        pdf_file = tempfile.TemporaryFile()
+        pdf.render_pdf(iter_rows(queryset, header), header, row_count, pdf_file)
+        pdf_file.seek(0)
+        ExportLog.objects.create(user=request.user, format='pdf', columns=header, filters={'selected_ids': ','.join(str(pk) for pk in queryset.values_list('pk', flat=True))})
+        log_audit(request.user, 'export', None, f'{row_count} assets exported as PDF via admin')
+        return FileResponse(pdf_file, as_attachment=True, filename=f'assets_{timezone.now():%Y%m%d_%H%M%S}.pdf', content_type='application/pdf')
     export_as_pdf.short_description = 'Export selected as PDF'
 
     def save_model(self, request, obj, form, change):
@@ -132,7 +144,9 @@ class AssetAdmin(ImportExportModelAdmin):
 
 @admin.register(AssetCategoryField)
 class AssetCategoryFieldAdmin(admin.ModelAdmin):
-    list_display = ('category', 'key', 'label', 'type', 'required')
+    list_display = ('category', 'key', 'label', 'type', 'required', 'indexed', 'index_built_at')
+    list_filter = ('indexed',)
+    readonly_fields = ('index_built_at',)
     actions = ['delete_selected_fields']
 
     def delete_selected_fields(self, request, queryset):
@@ -0,0 +1,93 @@
+"""
+Calendar time buckets for the dashboard charts.
+
+Counts per week, month or quarter are computed in the database with
+TruncWeek/TruncMonth/TruncQuarter in the current time zone and a GROUP BY,
+so Python only ever holds one row per bucket. Buckets follow calendar
+boundaries (weeks start on Monday, as in ISO 8601), and buckets without rows
+are filled with 0 so every period in the range appears exactly once.
+"""
+import datetime
+
+from django.db.models import Count
+from django.db.models.functions import TruncMonth, TruncQuarter, TruncWeek
+from django.utils import timezone
+
+GRANULARITIES = {
+    'week': TruncWeek,
+    'month': TruncMonth,
+    'quarter': TruncQuarter,
+}
+DEFAULT_GRANULARITY = 'month'
+DEFAULT_PERIODS = 12
+# Longest range a chart may ask for, in buckets
+MAX_BUCKETS = 260
+
+
+def bucket_start(day, granularity):
+    """First day of the bucket containing ``day``"""
+    if granularity == 'week':
+        return day - datetime.timedelta(days=day.weekday())
+    if granularity == 'quarter':
+        return datetime.date(day.year, 3 * ((day.month - 1) // 3) + 1, 1)
+    return day.replace(day=1)
+
+
+def shift(start, granularity, count):
+    """The bucket start ``count`` buckets after ``start`` (before, if negative)"""
+    if granularity == 'week':
+        return start + datetime.timedelta(weeks=count)
+    index = start.year * 12 + start.month - 1 + count * (3 if granularity == 'quarter' else 1)
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def label(start, granularity):
+    if granularity == 'week':
+        return start.strftime('%G-W%V')
+    if granularity == 'quarter':
+        return f'{start.year}-Q{(start.month - 1) // 3 + 1}'
+    return start.strftime('%Y-%m')
+
+
+def bucket_range(granularity, periods=DEFAULT_PERIODS, start=None, end=None):
+    """
+    Bucket starts, oldest first: from the bucket containing ``start`` to the
+    one containing ``end`` (today by default), or the last ``periods``
+    buckets up to ``end`` when there is no ``start``. Raises ValueError past
+    MAX_BUCKETS.
+    """
+    if not start and periods > MAX_BUCKETS:
+        raise ValueError(f'At most {MAX_BUCKETS} buckets per chart')
+    last = bucket_start(end or timezone.localdate(), granularity)
+    first = bucket_start(start, granularity) if start else shift(last, granularity, 1 - periods)
+    starts = []
+    current = first
+    while current <= last:
+        starts.append(current)
+        if len(starts) > MAX_BUCKETS:
+            raise ValueError(f'At most {MAX_BUCKETS} buckets per chart')
+        current = shift(current, granularity, 1)
+    return starts
+
+
+def local_midnight(day):
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+def count_by_bucket(qs, field, granularity, starts):
+    """(labels, counts) of ``qs`` rows per bucket of ``field``, for the bucket ``starts``"""
+    if not starts:
+        return [], []
+    since = local_midnight(starts[0])
+    until = local_midnight(shift(starts[-1], granularity, 1))
+    trunc = GRANULARITIES[granularity](field, tzinfo=timezone.get_current_timezone())
+    rows = (
+        qs.filter(**{f'{field}__gte': since, f'{field}__lt': until})
+        .annotate(bucket=trunc).values('bucket').annotate(count=Count('pk')).order_by()
+    )
+    counts = {}
+    for row in rows:
+        bucket = row['bucket']
+        day = timezone.localtime(bucket).date() if isinstance(bucket, datetime.datetime) else bucket
+        counts[day] = counts.get(day, 0) + row['count']
+    return [label(start, granularity) for start in starts], [counts.get(start, 0) for start in starts]
@@ -0,0 +1,253 @@
+"""
+Scan code resolution.
+
+A scanner may send any of: the internal ``ASSET|v1|<uuid>`` payload, the
+detail URL a QR code encodes (``.../assets/<uuid>/``), a legacy QR file name
+(``qr_codes/asset_<uuid>.png``, with or without directory or extension), a
+bare UUID or the numeric asset id. The id only matches a code that is
+nothing but the number, so a foreign barcode or URL ending in digits does
+not resolve to an asset. Every asset's codes are kept in the
+AssetCode table, so any of these resolves with one indexed lookup; an
+unknown code costs the same single query instead of a LIKE scan of
+Asset.qr_code.
+
+Resolved scans are served from a read-through cache: code -> asset id, and
+asset id -> the serialized scan payload. Saving or deleting an asset drops
+its entries (assets.signals), and the payload key carries the schema
+version, so category renames show up at once. Entries expire after
+SCAN_CACHE_TTL seconds regardless, which bounds staleness for writes that
+bypass signals and, since the default cache is per process, for changes
+made in other workers.
+"""
+import hashlib
+import logging
+import re
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import schema
+from .models import Asset, AssetCode
+
+logger = logging.getLogger(__name__)
+
+SCAN_CACHE_TTL = getattr(settings, 'SCAN_CACHE_TTL', 300)
+# Lookup order when a code matches several kinds
+KIND_PRIORITY = ('uuid', 'file', 'id')
+SYNC_CHUNK_SIZE = 500
+
+INTERNAL_CODE_RE = re.compile(r'^asset\|v1\|([0-9a-f-]{36})$')
+URL_UUID_RE = re.compile(r'/assets/([0-9a-f-]{36})(?:/|$)')
+FILE_UUID_RE = re.compile(r'^asset_([0-9a-f-]{36})$')
+
+
+def parse_uuid(value):
+    try:
+        return str(uuid.UUID(value))
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+
+def candidates(code):
+    """
+    Normalized forms of a scanned ``code`` to look up, most specific first,
+    as (form, kinds) pairs: the AssetCode kinds the form may match.
+    """
+    code = (code or '').strip().lower()[:255]
+    if not code:
+        return []
+    found = []
+    match = INTERNAL_CODE_RE.match(code) or URL_UUID_RE.search(code)
+    if match:
+        found.append((parse_uuid(match.group(1)), ('uuid',)))
+    name = code.split('?', 1)[0].rstrip('/').rsplit('/', 1)[-1]
+    stem = name.rsplit('.', 1)[0]
+    match = FILE_UUID_RE.match(stem)
+    if match:
+        found.append((parse_uuid(match.group(1)), ('uuid',)))
+    found.append((parse_uuid(code), ('uuid',)))
+    found.append((code, KIND_PRIORITY))
+    # Parts of a path or file name are never taken for an asset id
+    found += [(name, ('uuid', 'file')), (stem, ('uuid', 'file'))]
+    forms = {}
+    for form, kinds in found:
+        if form:
+            merged = forms.setdefault(form, [])
+            merged += [kind for kind in kinds if kind not in merged]
+    return [(form, tuple(kinds)) for form, kinds in forms.items()]
+
+
+def codes_for(asset):
+    codes = [(str(asset.uuid), 'uuid'), (str(asset.pk), 'id')]
+    if asset.qr_code:
+        name = asset.qr_code.name.lower().rsplit('/', 1)[-1]
+        codes.append((name[:255], 'file'))
+        stem = name.rsplit('.', 1)[0]
+        if stem != name:
+            codes.append((stem[:255], 'file'))
+    return codes
+
+
+def sync_assets(assets):
+    """Rewrite the AssetCode rows of ``assets`` and drop their cached scans. Returns rows written."""
+    assets = [a for a in assets if a.pk]
+    written = 0
+    for start in range(0, len(assets), SYNC_CHUNK_SIZE):
+        chunk = assets[start:start + SYNC_CHUNK_SIZE]
+        pks = [a.pk for a in chunk]
+        stale = list(AssetCode.objects.filter(asset_id__in=pks).values_list('code', 'kind'))
+        AssetCode.objects.filter(asset_id__in=pks).delete()
+        rows = [AssetCode(code=code, kind=kind, asset_id=a.pk) for a in chunk for code, kind in codes_for(a)]
+        # A code already claimed by another asset keeps pointing there
+        AssetCode.objects.bulk_create(rows, ignore_conflicts=True)
+        written += len(rows)
+        cache.delete_many([code_key(code, kind) for code, kind in stale + [(row.code, row.kind) for row in rows]] + [payload_key(pk) for pk in pks])
+    return written
+
+
+def forget_asset(asset):
+    cache.delete_many([code_key(code, kind) for code, kind in codes_for(asset)] + [payload_key(asset.pk)])
+
+
+def rebuild(batch_size=SYNC_CHUNK_SIZE):
+    """Rebuild codes for every asset, walking them by primary key in batches"""
+    last_pk = 0
+    total = 0
+    while True:
+        batch = list(Asset.objects.filter(pk__gt=last_pk).order_by('pk').only('pk', 'uuid', 'qr_code')[:batch_size])
+        if not batch:
+            return total
+        sync_assets(batch)
+        total += len(batch)
+        last_pk = batch[-1].pk
+
+
+def code_key(code, kind):
+    # Scanned text is arbitrary; keep keys short and free of spaces for memcached
+    return f'assets:scan:code:{kind}:{hashlib.md5(code.encode()).hexdigest()}'
+
+
+def candidate_keys(forms):
+    """Cache keys of the (form, kinds) pairs ``forms``, most specific first"""
+    return [code_key(form, kind) for form, kinds in forms for kind in kinds]
+
+
+def payload_key(asset_id):
+    return f'assets:scan:asset:{asset_id}:{schema.schema_version()}'
+
+
+def lookup_many(form_lists):
+    """
+    (asset id, matching code, its kind) or None for each list of candidate
+    (form, kinds) pairs in ``form_lists``. One indexed query for all of them;
+    uuid and id forms fall back to Asset itself, in one more query each, for
+    assets not yet covered by rebuild_asset_codes.
+    """
+    wanted = {form for forms in form_lists for form, _ in forms}
+    if not wanted:
+        return [None] * len(form_lists)
+    rows = {}
+    for kind, asset_id, code in AssetCode.objects.filter(code__in=wanted).values_list('kind', 'asset_id', 'code'):
+        rows[code, kind] = asset_id
+    found = []
+    for forms in form_lists:
+        match = next((
+            (rows[form, kind], form, kind)
+            for kind in KIND_PRIORITY for form, kinds in forms if kind in kinds and (form, kind) in rows
+        ), None)
+        found.append(match)
+    missing = [forms for forms, match in zip(form_lists, found) if match is None]
+    uuids = {form for forms in missing for form, kinds in forms if 'uuid' in kinds and parse_uuid(form) == form}
+    digits = {int(form) for forms in missing for form, kinds in forms if 'id' in kinds and form.isdigit() and len(form) < 19}
+    by_uuid = {str(value): pk for pk, value in Asset.objects.filter(uuid__in=uuids).values_list('pk', 'uuid')} if uuids else {}
+    by_pk = set(Asset.objects.filter(pk__in=digits).values_list('pk', flat=True)) if digits else set()
+    for index, forms in enumerate(form_lists):
+        if found[index] is not None:
+            continue
+        form = next((form for form, kinds in forms if 'uuid' in kinds and form in by_uuid), None)
+        if form:
+            found[index] = (by_uuid[form], form, 'uuid')
+            continue
+        form = next((form for form, kinds in forms if 'id' in kinds and form.isdigit() and len(form) < 19 and int(form) in by_pk), None)
+        if form:
+            found[index] = (int(form), form, 'id')
+    return found
+
+
+def lookup(forms):
+    """(asset id, matching code, its kind) for the candidate ``forms`` of a scanned code, or None"""
+    return lookup_many([forms])[0]
+
+
+def resolve(code):
+    """Asset id for a scanned code, or None, through the cache. Hits are cached under the stored code they matched."""
+    forms = candidates(code)
+    if not forms:
+        return None
+    keys = candidate_keys(forms)
+    cached = cache.get_many(keys)
+    for key in keys:
+        if key in cached:
+            return cached[key]
+    found = lookup(forms)
+    if found is None:
+        return None
+    asset_id, matched, kind = found
+    cache.set(code_key(matched, kind), asset_id, SCAN_CACHE_TTL)
+    return asset_id
+
+
+def resolve_many(codes):
+    """
+    Asset id (or None) for each of ``codes``, as a dict. Cached codes are
+    answered from one get_many; the rest share a single lookup_many. Cached
+    ids are checked against Asset, since a cache entry can outlive its asset.
+    """
+    forms = {code: candidates(code) for code in dict.fromkeys(codes)}
+    cached = cache.get_many({key for code_forms in forms.values() for key in candidate_keys(code_forms)})
+    result = {}
+    for code, code_forms in forms.items():
+        result[code] = next((cached[key] for key in candidate_keys(code_forms) if key in cached), None)
+    if cached:
+        alive = set(Asset.objects.filter(pk__in=set(cached.values())).values_list('pk', flat=True))
+        cache.delete_many([key for key, asset_id in cached.items() if asset_id not in alive])
+        result = {code: asset_id if asset_id in alive else None for code, asset_id in result.items()}
+    pending = [code for code, asset_id in result.items() if asset_id is None and forms[code]]
+    matches = {}
+    for code, found in zip(pending, lookup_many([forms[code] for code in pending])):
+        if found is not None:
+            result[code] = found[0]
+            matches[code_key(found[1], found[2])] = found[0]
+    if matches:
+        cache.set_many(matches, SCAN_CACHE_TTL)
+    return result
+
+
+def forget_code(code):
+    """Drop a cached resolution that led to a missing asset"""
+    cache.delete_many(candidate_keys(candidates(code)))
+
+
+def build_payload(asset):
+    return {
+        'id': asset.pk,
+        'dynamic_data': asset.dynamic_data,
+        'category_name': asset.category.name,
+        'status': asset.status,
+        'assigned_to': str(asset.assigned_to) if asset.assigned_to else '',
+        'created_at': asset.created_at.strftime('%Y-%m-%d %H:%M'),
+    }
+
+
+def scan_payload(asset_id):
+    """The serialized scan response for an asset, through the cache; None if it no longer exists"""
+    key = payload_key(asset_id)
+    payload = cache.get(key)
+    if payload is None:
+        asset = Asset.objects.select_related('category', 'assigned_to').filter(pk=asset_id).first()
+        if asset is None:
+            return None
+        payload = build_payload(asset)
+        cache.set(key, payload, SCAN_CACHE_TTL)
+    return payload
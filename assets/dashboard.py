@@ -0,0 +1,173 @@
+"""
+Dashboard data.
+
+The KPIs (``summary``) and the charts (``chart_data``) behind
+dashboard_summary_api, dashboard_chart_data_api and the consolidated
+dashboard_bundle endpoint. Users with role 'user' see only the assets
+assigned to them; admins and managers see everything.
+
+Bundles are cached per scope (the role, or the user for role 'user') under a
+data version token kept in the 'shared' cache, as with the schema registry
+(assets.schema). Signal handlers (assets.signals), the bulk importer and the
+statistics and depreciation commands call ``invalidate()`` whenever assets,
+categories or stored statistics change, which issues a new token again once
+the transaction commits. The bundle's ETag is derived from the token, the
+scope and the date alone, so a client revalidating an unchanged dashboard
+gets a 304 without any dashboard query. Writes that bypass those hooks show
+up after DASHBOARD_CACHE_TTL seconds at the latest.
+"""
+import datetime
+import hashlib
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import transaction
+from django.db.models import CharField, Count
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from . import buckets, depreciation, stats
+from .filters import warranty_expiring_q
+from .models import Asset
+
+VERSION_CACHE_KEY = 'assets:dashboard_version'
+DASHBOARD_CACHE_TTL = getattr(settings, 'DASHBOARD_CACHE_TTL', 300)
+CHARTS = ('category', 'acquisition', 'department', 'location', 'depreciation')
+
+
+def data_version():
+    """The current dashboard data version token (shared through the cache)"""
+    version = caches['shared'].get(VERSION_CACHE_KEY)
+    if version is None:
+        caches['shared'].add(VERSION_CACHE_KEY, uuid.uuid4().hex, timeout=None)
+        version = caches['shared'].get(VERSION_CACHE_KEY)
+    return version
+
+
+def _bump_version():
+    caches['shared'].set(VERSION_CACHE_KEY, uuid.uuid4().hex, timeout=None)
+
+
+def invalidate():
+    """Retire every cached bundle and ETag"""
+    _bump_version()
+    # A bundle built before the commit would otherwise be cached under the new token
+    transaction.on_commit(_bump_version)
+
+
+def scoped_assets(user, role):
+    qs = Asset.objects.all()
+    if role == 'user':
+        qs = qs.filter(assigned_to=user)
+    return qs
+
+
+def scope_key(user, role):
+    return f'user:{user.pk}' if role == 'user' else f'role:{role}'
+
+
+def summary(user, role):
+    qs = scoped_assets(user, role)
+    # Status, assignment and category counts come from the statistics table (assets.stats)
+    kpis, by_category = stats.summary(user if role == 'user' else None)
+    total_assets = kpis['total_assets']
+    # Date-dependent KPIs: indexed range counts over recent assets and warranty dates
+    kpis['warranty_expiring_soon'] = qs.filter(warranty_expiring_q()).count()
+    month_ago = timezone.now() - timedelta(days=30)
+    total_assets_month_ago = total_assets - qs.filter(created_at__gt=month_ago).count()
+    if total_assets_month_ago:
+        total_assets_monthly_change = f"{((total_assets - total_assets_month_ago) / total_assets_month_ago) * 100:.1f}%"
+    else:
+        total_assets_monthly_change = "N/A"
+    return {
+        'kpis': kpis,
+        'by_category': by_category,
+        'trends': {
+            'total_assets_monthly_change': total_assets_monthly_change,
+        },
+        'role': role,
+    }
+
+
+def field_counts(qs, key):
+    """(labels, counts) of assets per value of dynamic field ``key``, largest first"""
+    try:
+        agg = qs.annotate(value=Cast(f'dynamic_data__{key}', CharField())).values('value').annotate(count=Count('id')).order_by('-count')
+        return [a['value'] or 'Unspecified' for a in agg], [a['count'] for a in agg]
+    except Exception:
+        # Fallback to Python loop if ORM fails
+        counts = {}
+        for data in qs.values_list('dynamic_data', flat=True).iterator():
+            value = (data or {}).get(key, 'Unspecified')
+            counts[value] = counts.get(value, 0) + 1
+        return list(counts.keys()), list(counts.values())
+
+
+def acquisition_range(params):
+    """Granularity and bucket starts from ?granularity=, ?periods= or ?start=&end=; ValueError if invalid"""
+    granularity = params.get('granularity') or buckets.DEFAULT_GRANULARITY
+    if granularity not in buckets.GRANULARITIES:
+        raise ValueError('granularity must be week, month or quarter')
+    try:
+        periods = int(params.get('periods') or buckets.DEFAULT_PERIODS)
+        start = datetime.date.fromisoformat(params['start']) if params.get('start') else None
+        end = datetime.date.fromisoformat(params['end']) if params.get('end') else None
+        if periods < 1 or (start and end and start > end):
+            raise ValueError('Empty range')
+        return granularity, buckets.bucket_range(granularity, periods=periods, start=start, end=end)
+    except (ValueError, OverflowError) as e:
+        # OverflowError: a bucket before year 1 or after 9999
+        raise ValueError(f'Invalid range: {e}')
+
+
+def chart_data(chart, user, role, params=None):
+    """The payload of one dashboard chart. Raises ValueError for invalid parameters."""
+    params = params or {}
+    qs = scoped_assets(user, role)
+    # 1. Assets by Category
+    if chart == 'category':
+        agg = qs.values('category__name').annotate(count=Count('id')).order_by('-count')
+        return {'chart': 'assets_by_category', 'labels': [a['category__name'] for a in agg], 'data': [a['count'] for a in agg], 'role': role}
+    # 2. Asset Acquisition Over Time, bucketed in the database (assets.buckets)
+    if chart == 'acquisition':
+        granularity, starts = acquisition_range(params)
+        labels, data = buckets.count_by_bucket(qs, 'created_at', granularity, starts)
+        return {'chart': 'acquisition_over_time', 'labels': labels, 'data': data, 'role': role}
+    # 3. and 4. Assets by Department / Location (dynamic fields)
+    if chart == 'department':
+        labels, data = field_counts(qs, 'department')
+        return {'chart': 'assets_by_department', 'labels': labels, 'data': data, 'role': role}
+    if chart == 'location':
+        labels, data = field_counts(qs, 'location')
+        return {'chart': 'assets_by_location', 'labels': labels, 'data': data, 'role': role}
+    # 5. Depreciation/Value Trend: stored monthly book values (assets.depreciation)
+    if chart == 'depreciation':
+        months = buckets.bucket_range('month', periods=12)
+        totals = depreciation.monthly_totals(months, assets=qs if role == 'user' else None)
+        labels = [buckets.label(month, 'month') for month in months]
+        if not totals:
+            return {'chart': 'depreciation_trend', 'labels': labels, 'data': [], 'role': role, 'message': 'No depreciable asset data available for trend.'}
+        return {'chart': 'depreciation_trend', 'labels': labels, 'data': [totals.get(month, 0) for month in months], 'role': role}
+    raise ValueError('Invalid or missing chart type')
+
+
+def bundle_etag(user, role, charts):
+    """ETag of a user's bundle, computed without touching the database"""
+    key = f'{data_version()}|{scope_key(user, role)}|{user.pk}|{",".join(charts)}|{timezone.localdate()}'
+    return '"%s"' % hashlib.sha256(key.encode()).hexdigest()[:32]
+
+
+def bundle(user, role, charts):
+    """The summary and ``charts`` for the user's scope, from the snapshot cache when current"""
+    # The date is part of the key: several KPIs and charts are relative to today
+    key = f'assets:dashboard:{scope_key(user, role)}:{",".join(charts)}:{data_version()}:{timezone.localdate()}'
+    payload = cache.get(key)
+    if payload is None:
+        payload = {
+            'summary': summary(user, role),
+            'charts': {chart: chart_data(chart, user, role) for chart in charts},
+        }
+        cache.set(key, payload, DASHBOARD_CACHE_TTL)
+    return payload
@@ -0,0 +1,197 @@
+"""
+Depreciation engine.
+
+Book values are computed for many assets at once: the depreciation columns
+of a chunk of assets are loaded into NumPy arrays (``load``) and ``schedule``
+evaluates every method for every asset and month as whole-array operations.
+A book value is taken at the start of each month; an asset counts from the
+first month that starts on or after its purchase date.
+
+Methods, with the depreciable base being cost minus salvage value:
+
+- straight_line: the base spread evenly over the useful life,
+- declining_balance: DECLINING_BALANCE_FACTOR / life of the book value each
+  month (double declining balance), never below salvage and down to
+  salvage at the end of the life,
+- sum_of_years: year k of n takes (n - k + 1) / (n (n + 1) / 2) of the base,
+  evenly over its months,
+- units_of_production: the base times units used over total units, with
+  usage before and after today projected at the average monthly rate since
+  purchase.
+
+``snapshot`` stores the results as DepreciationSnapshot rows for a window of
+DEPRECIATION_SNAPSHOT_PAST months back and DEPRECIATION_SNAPSHOT_FUTURE
+months ahead, so the depreciation chart, exports and reports read stored
+values. Saving an asset refreshes its own rows (assets.signals); the window
+moves with the calendar, so ``manage.py snapshot_depreciation`` should run
+monthly. Migration 0021 fills the window once on upgrade.
+"""
+import datetime
+import logging
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import OuterRef, Subquery, Sum
+from django.utils import timezone
+
+from .models import Asset, DepreciationSnapshot
+
+logger = logging.getLogger(__name__)
+
+DEPRECIATION_SNAPSHOT_PAST = getattr(settings, 'DEPRECIATION_SNAPSHOT_PAST', 12)
+DEPRECIATION_SNAPSHOT_FUTURE = getattr(settings, 'DEPRECIATION_SNAPSHOT_FUTURE', 12)
+SNAPSHOT_CHUNK_SIZE = 5000
+DECLINING_BALANCE_FACTOR = 2
+# Asset fields the engine reads, in load() order
+FIELDS = ('pk', 'purchase_value', 'purchase_date', 'useful_life_years', 'depreciation_method', 'salvage_value', 'total_units', 'units_used')
+# Asset fields whose change invalidates an asset's snapshots
+INPUT_FIELDS = FIELDS[1:]
+METHOD_CODES = {method: code for code, (method, _) in enumerate(Asset.DEPRECIATION_METHOD_CHOICES)}
+
+
+def month_index(day):
+    return day.year * 12 + day.month - 1
+
+
+def month_start(index):
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def is_depreciable(row):
+    _, value, purchased, life = row[:4]
+    return bool(value and value > 0 and purchased and life)
+
+
+def load(rows, today=None):
+    """Column arrays of the depreciable ``rows``, tuples of FIELDS"""
+    rows = [row for row in rows if is_depreciable(row)]
+    today_index = month_index(today or timezone.localdate())
+    if not rows:
+        rows_by_column = [()] * len(FIELDS)
+    else:
+        rows_by_column = list(zip(*rows))
+    ids, values, purchased, life, methods, salvage, total_units, units_used = rows_by_column
+    cost = np.array([float(v) for v in values], dtype=float)
+    start = np.array([month_index(day) for day in purchased], dtype=np.int64)
+    return {
+        'ids': np.array(ids, dtype=np.int64),
+        'cost': cost,
+        'salvage': np.minimum(np.array([float(v or 0) for v in salvage], dtype=float), cost),
+        'start': start,
+        # Held from the first month starting on or after the purchase date
+        'first': start + np.array([day.day != 1 for day in purchased], dtype=np.int64),
+        'life': np.array(life, dtype=float) * 12,
+        'method': np.array([METHOD_CODES.get(m, 0) for m in methods], dtype=np.int64),
+        'total_units': np.array([float(v or 0) for v in total_units], dtype=float),
+        'units_used': np.array([float(v or 0) for v in units_used], dtype=float),
+        'months_in_use': np.maximum(today_index - start, 1).astype(float),
+    }
+
+
+def schedule(columns, first_month, months):
+    """
+    Book values of the loaded assets at the start of ``months`` consecutive
+    months from month index ``first_month``: an array of shape (assets,
+    months), NaN where the asset is not yet held.
+    """
+    month = first_month + np.arange(months)
+    age = np.maximum(month[None, :] - columns['start'][:, None], 0).astype(float)
+    cost = columns['cost'][:, None]
+    salvage = columns['salvage'][:, None]
+    life = columns['life'][:, None]
+    method = columns['method'][:, None]
+    base = cost - salvage
+    straight = np.minimum(age / life, 1)
+    years = life / 12
+    full_years = np.minimum(np.floor(age / 12), years)
+    partial = np.where(full_years < years, (age - full_years * 12) / 12, 0)
+    digits = full_years * years - full_years * (full_years - 1) / 2 + partial * (years - full_years)
+    sum_of_years = np.minimum(digits / (years * (years + 1) / 2), 1)
+    total_units = columns['total_units'][:, None]
+    rate = (columns['units_used'] / columns['months_in_use'])[:, None]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        units = np.where(total_units > 0, np.minimum(rate * age / total_units, 1), straight)
+    fraction = np.where(method == METHOD_CODES['sum_of_years'], sum_of_years, straight)
+    fraction = np.where(method == METHOD_CODES['units_of_production'], units, fraction)
+    value = cost - base * fraction
+    declining = np.maximum(cost * (1 - np.minimum(DECLINING_BALANCE_FACTOR / life, 1)) ** age, salvage)
+    declining = np.where(age >= life, salvage, declining)
+    value = np.where(method == METHOD_CODES['declining_balance'], declining, value)
+    held = month[None, :] >= columns['first'][:, None]
+    return np.where(held, value, np.nan)
+
+
+def default_window():
+    """(first month index, number of months) of the stored snapshots"""
+    current = month_index(timezone.localdate())
+    return current - DEPRECIATION_SNAPSHOT_PAST, DEPRECIATION_SNAPSHOT_PAST + DEPRECIATION_SNAPSHOT_FUTURE + 1
+
+
+def snapshot_rows(columns, first_month, months):
+    # One month more than stored, for the depreciation over the last one
+    values = np.round(schedule(columns, first_month, months + 1), 2)
+    depreciation = np.round(values[:, :-1] - values[:, 1:], 2)
+    dates = [month_start(first_month + j) for j in range(months)]
+    rows = []
+    for i, j in zip(*np.nonzero(~np.isnan(values[:, :-1]))):
+        rows.append(DepreciationSnapshot(
+            asset_id=int(columns['ids'][i]), month=dates[j],
+            book_value=round(float(values[i, j]), 2), depreciation=round(float(depreciation[i, j]), 2),
+        ))
+    return rows
+
+
+def snapshot(first_month=None, months=None, asset_ids=None, chunk_size=SNAPSHOT_CHUNK_SIZE):
+    """
+    Recompute and store the snapshots of ``asset_ids`` (all assets by
+    default) for ``months`` months from month index ``first_month`` (the
+    default window if omitted), a chunk of assets per transaction. Returns
+    rows written.
+    """
+    if first_month is None or months is None:
+        first_month, months = default_window()
+    window = {'month__gte': month_start(first_month), 'month__lt': month_start(first_month + months)}
+    qs = Asset.objects.order_by('pk')
+    if asset_ids is not None:
+        qs = qs.filter(pk__in=asset_ids)
+    last_pk = 0
+    written = 0
+    while True:
+        chunk = list(qs.filter(pk__gt=last_pk).values_list(*FIELDS)[:chunk_size])
+        if not chunk:
+            break
+        rows = snapshot_rows(load(chunk), first_month, months)
+        with transaction.atomic():
+            DepreciationSnapshot.objects.filter(asset_id__in=[row[0] for row in chunk], **window).delete()
+            DepreciationSnapshot.objects.bulk_create(rows, batch_size=2000)
+        written += len(rows)
+        last_pk = chunk[-1][0]
+    logger.info('Stored %s depreciation snapshots from %s', written, month_start(first_month))
+    return written
+
+
+def monthly_totals(months, assets=None):
+    """Total book value per month (first-of-month dates) across ``assets``, a queryset, or all assets"""
+    rows = DepreciationSnapshot.objects.filter(month__in=months)
+    if assets is not None:
+        rows = rows.filter(asset__in=assets)
+    totals = dict(rows.values_list('month').annotate(total=Sum('book_value')).order_by())
+    return {month: float(totals[month]) for month in months if month in totals}
+
+
+def book_values(month, by='category', assets=None):
+    """Book values at the start of ``month``, by category name or by asset id"""
+    rows = DepreciationSnapshot.objects.filter(month=month.replace(day=1))
+    if assets is not None:
+        rows = rows.filter(asset__in=assets)
+    if by == 'asset':
+        return {asset_id: float(value) for asset_id, value in rows.values_list('asset_id', 'book_value')}
+    totals = rows.values_list('asset__category__name').annotate(total=Sum('book_value')).order_by()
+    return {name: float(total) for name, total in totals}
+
+
+def current_book_value():
+    """Subquery of an asset's book value at the start of this month, for annotations"""
+    month = timezone.localdate().replace(day=1)
+    return Subquery(DepreciationSnapshot.objects.filter(asset=OuterRef('pk'), month=month).values('book_value')[:1])
@@ -0,0 +1,63 @@
+"""
+File downloads with HTTP Range support, so large artifacts can be resumed or
+fetched in parts. Only single byte ranges are honoured; anything else gets the
+whole file, which RFC 9110 allows.
+"""
+import re
+
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+READ_CHUNK_SIZE = 64 * 1024
+
+
+def parse_range(header, size):
+    """Return (start, end) inclusive for a single-range header, None to send everything, or False if unsatisfiable"""
+    match = RANGE_RE.match((header or '').strip())
+    if not match or match.groups() == ('', ''):
+        return None
+    start, end = match.groups()
+    if start:
+        start = int(start)
+        end = min(int(end), size - 1) if end else size - 1
+    else:
+        # Suffix range: the last N bytes
+        start = max(size - int(end), 0)
+        end = size - 1
+    if start > end or start >= size:
+        return False
+    return start, end
+
+
+def read_range(handle, length):
+    try:
+        while length > 0:
+            chunk = handle.read(min(READ_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        handle.close()
+
+
+def ranged_file_response(request, field_file, filename, content_type):
+    """Serve a FieldFile as an attachment, answering Range requests with 206"""
+    size = field_file.size
+    byte_range = parse_range(request.headers.get('Range'), size)
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+    handle = field_file.open('rb')
+    if byte_range is None:
+        response = FileResponse(handle, content_type=content_type, as_attachment=True, filename=filename)
+    else:
+        start, end = byte_range
+        handle.seek(start)
+        response = StreamingHttpResponse(read_range(handle, end - start + 1), status=206, content_type=content_type)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(end - start + 1)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response['Accept-Ranges'] = 'bytes'
+    return response
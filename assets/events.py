@@ -0,0 +1,244 @@
+"""
+Dashboard push events.
+
+Instead of polling, an open dashboard holds one server-sent events stream
+(dashboard_events) and is told what changed:
+
+- ``asset``: an asset was created, changed or deleted, with the category,
+  status and assignee it moved from and to, so the page adjusts its KPI
+  cards and category counts itself,
+- ``audit``: audit entries were written, so the matching activity feed is
+  reloaded,
+- ``refresh``: something the page cannot apply locally changed (a bulk
+  import, a category, another worker's writes), so it revalidates its
+  dashboard bundle,
+- ``session``: the user session the stream belongs to ended.
+
+Events go through an in-process broker: ``publish`` hands an event over once
+the current transaction commits, and the broker keeps the last
+EVENT_BUFFER_SIZE of them so a reconnecting client resumes from its
+Last-Event-ID. A client that fell further behind, or whose id comes from
+another process, gets ``resync`` and reloads everything. This is meant for
+single-node deployments: events only reach streams of the process that made
+the change, and streams of other workers learn about changes through the
+dashboard data version (assets.dashboard) on their next keepalive, every
+EVENT_STREAM_KEEPALIVE seconds. The keepalive also stands in for the session
+heartbeat, keeping the stream's UserSession active.
+
+Streams are coroutines, served only under ASGI (see DEPLOYMENT_GUIDE.md).
+Under WSGI each would hold a worker thread for up to EVENT_STREAM_MAX_AGE
+seconds, so there the endpoint answers 204 and the page keeps polling.
+"""
+import asyncio
+import itertools
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import deque, namedtuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+from users.models import UserSession
+
+from . import dashboard
+
+logger = logging.getLogger(__name__)
+
+EVENT_BUFFER_SIZE = getattr(settings, 'EVENT_BUFFER_SIZE', 1000)
+EVENT_STREAM_KEEPALIVE = getattr(settings, 'EVENT_STREAM_KEEPALIVE', 25)
+EVENT_STREAM_MAX_AGE = getattr(settings, 'EVENT_STREAM_MAX_AGE', 3600)
+# Milliseconds a disconnected EventSource waits before reconnecting
+RETRY_MS = 5000
+
+# ``users``: ids of users who may see the event, or None for everyone;
+# ``staff``: whether admins and managers see it regardless
+Event = namedtuple('Event', 'seq kind data users staff')
+
+
+class Broker:
+    """The recent events of this process, and the streams waiting for more"""
+
+    def __init__(self, size=EVENT_BUFFER_SIZE):
+        # Distinguishes this process's event ids from another's
+        self.boot = uuid.uuid4().hex[:8]
+        self._lock = threading.Lock()
+        self._events = deque(maxlen=size)
+        self._last = 0
+        self._waiters = set()
+
+    @property
+    def last(self):
+        return self._last
+
+    def publish(self, kind, data, users=None, staff=True):
+        with self._lock:
+            self._last += 1
+            self._events.append(Event(self._last, kind, data, users, staff))
+            waiters = list(self._waiters)
+        for wake in waiters:
+            wake()
+        return self._last
+
+    def since(self, seq):
+        """Events after sequence number ``seq``, or None if some of them were already dropped"""
+        with self._lock:
+            if seq > self._last:
+                return None
+            first = self._events[0].seq if self._events else self._last + 1
+            if seq < first - 1:
+                return None
+            return list(itertools.islice(self._events, seq - first + 1, None))
+
+    def subscribe(self, wake):
+        with self._lock:
+            self._waiters.add(wake)
+
+    def unsubscribe(self, wake):
+        with self._lock:
+            self._waiters.discard(wake)
+
+    def event_id(self, seq):
+        return f'{self.boot}-{seq}'
+
+    def parse_id(self, event_id):
+        """Sequence number of an id this process issued, else None"""
+        boot, _, seq = (event_id or '').partition('-')
+        if boot != self.boot or not seq.isdigit():
+            return None
+        return int(seq)
+
+
+broker = Broker()
+
+
+def publish(kind, data, users=None, staff=True):
+    """Publish an event once the current transaction commits, so no stream sees a rolled back change"""
+    transaction.on_commit(lambda: broker.publish(kind, data, users, staff))
+
+
+def asset_state(category_name, status, assignee):
+    return {'category': category_name, 'status': status, 'assignee': assignee or None}
+
+
+def publish_asset(asset_id, previous, current):
+    """An asset moving from state ``previous`` (None if new) to ``current`` (None if deleted)"""
+    users = {state['assignee'] for state in (previous, current) if state and state['assignee']}
+    publish('asset', {'id': asset_id, 'from': previous, 'to': current}, users=users)
+
+
+def publish_audit(logs):
+    """Audit entries written, by action, each visible to its own user"""
+    by_user = {}
+    for log in logs:
+        by_user.setdefault(log.user_id, set()).add(log.action)
+    for user_id, actions in by_user.items():
+        publish('audit', {'actions': sorted(actions)}, users={user_id} if user_id else set())
+
+
+def format_event(kind, data, event_id=None):
+    lines = [f'id: {event_id}'] if event_id else []
+    lines += [f'event: {kind}', f'data: {json.dumps(data, cls=DjangoJSONEncoder)}']
+    return '\n'.join(lines) + '\n\n'
+
+
+class Stream:
+    """The events one dashboard connection receives"""
+
+    def __init__(self, user, role, last_event_id=None, user_session=None):
+        self.user_id = user.pk
+        self.role = role
+        self.session_id = user_session.pk if user_session else None
+        self.version = dashboard.data_version()
+        self.opened = time.monotonic()
+        self.ended = False
+        self.cursor = broker.last
+        self.resync = False
+        if last_event_id:
+            seq = broker.parse_id(last_event_id)
+            if seq is None:
+                self.resync = True
+            else:
+                self.cursor = seq
+
+    def visible(self, event):
+        if event.kind == 'session':
+            return event.data['session'] == self.session_id
+        return event.users is None or self.user_id in event.users or (event.staff and self.role != 'user')
+
+    def hello(self):
+        return f'retry: {RETRY_MS}\n\n' + format_event('hello', {'user_id': self.user_id, 'role': self.role})
+
+    def pending(self):
+        """Chunks for the events published since the last call"""
+        events = None if self.resync else broker.since(self.cursor)
+        if events is None:
+            self.resync = False
+            self.cursor = broker.last
+            return [format_event('resync', {}, broker.event_id(self.cursor))]
+        chunks = []
+        for event in events:
+            self.cursor = event.seq
+            if self.visible(event):
+                chunks.append(format_event(event.kind, event.data, broker.event_id(event.seq)))
+                if event.kind == 'session':
+                    self.ended = True
+                    break
+        return chunks
+
+    def tick(self):
+        """Keepalive: touch the user session and catch up on other workers' changes"""
+        if self.session_id:
+            alive = UserSession.objects.filter(pk=self.session_id, is_active=True).update(last_activity=timezone.now())
+            if not alive:
+                self.ended = True
+                return [format_event('session', {'session': self.session_id, 'active': False})]
+        chunks = [': keepalive\n\n']
+        version = dashboard.data_version()
+        if version != self.version:
+            self.version = version
+            chunks.append(format_event('refresh', {}))
+        if time.monotonic() - self.opened > EVENT_STREAM_MAX_AGE:
+            # The client reconnects with its Last-Event-ID
+            self.ended = True
+        return chunks
+
+
+async def async_stream(stream):
+    """The stream as an asynchronous iterator"""
+    loop = asyncio.get_running_loop()
+    wakeup = asyncio.Event()
+
+    def wake():
+        try:
+            loop.call_soon_threadsafe(wakeup.set)
+        except RuntimeError:
+            # Event loop already closed
+            pass
+
+    broker.subscribe(wake)
+    try:
+        yield stream.hello()
+        deadline = time.monotonic() + EVENT_STREAM_KEEPALIVE
+        while not stream.ended:
+            wakeup.clear()
+            for chunk in stream.pending():
+                yield chunk
+            if stream.ended:
+                break
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    raise asyncio.TimeoutError
+                await asyncio.wait_for(wakeup.wait(), remaining)
+            except asyncio.TimeoutError:
+                for chunk in await sync_to_async(stream.tick)():
+                    yield chunk
+                deadline = time.monotonic() + EVENT_STREAM_KEEPALIVE
+    finally:
+        broker.unsubscribe(wake)
@@ -0,0 +1,194 @@
+"""
+Background export jobs.
+
+Excel and PDF exports of large result sets outlive the proxy timeout, so
+asset_export can queue them instead (``background=1``). The job record is the
+ExportLog row: queued -> running -> done/failed, with row progress, the
+output file in media storage (exports/), its size and the run duration. The
+run_export_jobs management command is the worker; it runs in its own process
+and claims queued jobs from the database. Clients poll export_job_status and
+fetch the file from export_job_download, which supports Range requests.
+
+Each job carries a fingerprint of its format, columns, filters and the state
+of the rows it covers (count and latest updated_at) plus the schema version
+and the current date, since book values and assignee names change without
+touching the assets. Submitting an export whose fingerprint matches a
+finished job with its file still in storage reuses that file instead of
+rendering it again.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db.models import Count, Max
+from django.urls import reverse
+from django.utils import timezone
+
+from . import pdf, schema, xlsx
+from .exports import column_types, export_columns, filtered_assets, iter_rows
+from .models import ExportLog
+
+logger = logging.getLogger(__name__)
+
+JOB_FORMATS = ('xlsx', 'pdf')
+ACTIVE_STATUSES = ('queued', 'running')
+# Running jobs older than this (seconds) are assumed to have lost their worker
+EXPORT_JOB_TIMEOUT = getattr(settings, 'EXPORT_JOB_TIMEOUT', 3600)
+
+CONTENT_TYPES = {
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'pdf': 'application/pdf',
+}
+
+
+def header_for(columns, filters):
+    return export_columns(columns, None if filters.get('selected_ids') else filters.get('category'))
+
+
+def fingerprint(format, columns, filters, qs):
+    """Identify an export by what it asks for and the state of the rows it covers"""
+    state = qs.order_by().aggregate(rows=Count('pk'), updated=Max('updated_at'))
+    payload = json.dumps({
+        'format': format,
+        'columns': list(columns),
+        'filters': filters,
+        'rows': state['rows'],
+        'updated': state['updated'],
+        'schema': schema.schema_version(),
+        'date': timezone.localdate(),
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def finished_artifact(fprint, exclude_pk=None):
+    """A finished job with this fingerprint whose file is still in storage"""
+    jobs = ExportLog.objects.filter(fingerprint=fprint, status='done').exclude(file='').order_by('-finished_at')
+    if exclude_pk:
+        jobs = jobs.exclude(pk=exclude_pk)
+    for job in jobs[:5]:
+        if default_storage.exists(job.file.name):
+            return job
+    return None
+
+
+def submit_export(user, format, columns, filters):
+    """Queue an export for ``user``, or hand back an equivalent job. Returns the job."""
+    qs = filtered_assets(filters)
+    fprint = fingerprint(format, columns, filters, qs)
+    # Same request from the same user still in flight: keep polling that one
+    pending = ExportLog.objects.filter(fingerprint=fprint, status__in=ACTIVE_STATUSES, user=user).first()
+    if pending:
+        return pending
+    job = ExportLog(user=user, format=format, columns=columns, filters=filters, status='queued', fingerprint=fprint)
+    reused = finished_artifact(fprint)
+    if reused:
+        copy_artifact(job, reused)
+    job.save()
+    return job
+
+
+def copy_artifact(job, source):
+    now = timezone.now()
+    job.status = 'done'
+    job.success = True
+    job.file = source.file.name
+    job.file_size = source.file_size
+    job.rows_total = job.rows_done = source.rows_total or 0
+    job.started_at = job.finished_at = now
+    job.duration = timedelta(0)
+
+
+def write_xlsx(rows, header, path, progress, total_rows=0):
+    return xlsx.write_rows(path, header, rows, column_types(header), progress=progress)
+
+
+def write_pdf(rows, header, path, progress, total_rows=0):
+    return pdf.render_pdf(rows, header, total_rows, path, progress=progress)
+
+
+WRITERS = {
+    'xlsx': write_xlsx,
+    'pdf': write_pdf,
+}
+
+
+def run_job(job):
+    """Render a claimed job to media storage and record the outcome"""
+    started = time.monotonic()
+    jobs = ExportLog.objects.filter(pk=job.pk)
+    try:
+        reused = finished_artifact(job.fingerprint, exclude_pk=job.pk) if job.fingerprint else None
+        if reused:
+            copy_artifact(job, reused)
+            job.save()
+            return job
+        qs = filtered_assets(job.filters)
+        header = header_for(job.columns, job.filters)
+        fd, temp_path = tempfile.mkstemp(suffix=f'.{job.format}')
+        os.close(fd)
+        try:
+            rows_total = qs.count()
+            jobs.update(rows_total=rows_total)
+            rows_done = WRITERS[job.format](iter_rows(qs, header), header, temp_path, lambda n: jobs.update(rows_done=n), rows_total)
+            with open(temp_path, 'rb') as f:
+                name = default_storage.save(f'exports/assets_{job.pk}_{timezone.now():%Y%m%d_%H%M%S}.{job.format}', File(f))
+        finally:
+            os.remove(temp_path)
+        jobs.update(
+            status='done', success=True, file=name, file_size=default_storage.size(name),
+            rows_done=rows_done, rows_total=rows_done, finished_at=timezone.now(),
+            duration=timedelta(seconds=time.monotonic() - started),
+        )
+        logger.info('Export job %s finished: %s rows in %.1fs', job.pk, rows_done, time.monotonic() - started)
+    except Exception as e:
+        logger.exception('Export job %s failed', job.pk)
+        jobs.update(
+            status='failed', success=False, error_message=str(e), finished_at=timezone.now(),
+            duration=timedelta(seconds=time.monotonic() - started),
+        )
+    job.refresh_from_db()
+    return job
+
+
+def claim_next_job():
+    """Atomically move the oldest queued job to running; None if there is none"""
+    for pk in ExportLog.objects.filter(status='queued').order_by('timestamp').values_list('pk', flat=True)[:10]:
+        # Conditional update: only one worker can win the row
+        if ExportLog.objects.filter(pk=pk, status='queued').update(status='running', started_at=timezone.now()):
+            return ExportLog.objects.get(pk=pk)
+    return None
+
+
+def fail_stale_jobs():
+    cutoff = timezone.now() - timedelta(seconds=EXPORT_JOB_TIMEOUT)
+    return ExportLog.objects.filter(status='running', started_at__lt=cutoff).update(
+        status='failed', success=False, error_message='Export worker stopped before finishing', finished_at=timezone.now()
+    )
+
+
+def job_status(job):
+    progress = None
+    if job.rows_total:
+        progress = round(100 * job.rows_done / job.rows_total, 1)
+    elif job.status == 'done':
+        progress = 100.0
+    return {
+        'id': job.pk,
+        'status': job.status,
+        'format': job.format,
+        'rows_done': job.rows_done,
+        'rows_total': job.rows_total,
+        'progress': progress,
+        'file_size': job.file_size,
+        'duration': job.duration.total_seconds() if job.duration is not None else None,
+        'error': job.error_message if job.status == 'failed' else '',
+        'status_url': reverse('export_job_status', args=[job.pk]),
+        'download_url': reverse('export_job_download', args=[job.pk]) if job.status == 'done' else None,
+    }
@@ -0,0 +1,125 @@
+"""
+Asset export rows.
+
+Shared by asset_export for every format. Columns are fixed before the first
+row is read: the core columns, followed by the dynamic fields from the
+category schema (assets.schema) -- the selected category's fields, or the
+union across categories. A ``columns`` selection projects rows onto just
+those names. CSV is streamed: rows are read from the database in chunks and
+written out as they arrive, so memory stays flat regardless of export size.
+"""
+import csv
+import logging
+
+from . import depreciation, schema
+from .filters import filter_assets
+from .models import Asset
+
+logger = logging.getLogger(__name__)
+
+CORE_COLUMNS = ['ID', 'Category', 'Status', 'Assigned To', 'Created', 'Updated']
+# Opt-in column (``columns`` selection): the stored book value at the start of this month
+BOOK_VALUE_COLUMN = 'Book Value'
+EXPORT_CHUNK_SIZE = 2000
+
+# Request parameters that do not change what an export contains
+NON_FILTER_PARAMS = {'page', 'page_size', 'cursor', 'after', 'before', 'count', 'format', 'columns', 'background', 'csrfmiddlewaretoken'}
+
+
+def export_filters(params, selected_ids=''):
+    """The filters an export was made with, as stored on ExportLog.filters"""
+    filters = {k: v for k, v in params.items() if k not in NON_FILTER_PARAMS and v}
+    if selected_ids:
+        filters['selected_ids'] = selected_ids
+    return filters
+
+
+def filtered_assets(filters):
+    """Assets an export covers: the ``selected_ids`` if given, otherwise the list filters"""
+    selected_ids = filters.get('selected_ids')
+    if selected_ids:
+        id_list = [int(pk) for pk in str(selected_ids).split(',') if pk.strip().isdigit()]
+        return Asset.objects.filter(pk__in=id_list)
+    return filter_assets(Asset.objects.all(), filters)
+
+
+def export_queryset(qs):
+    return qs.select_related('category', 'assigned_to').order_by('pk')
+
+
+def dynamic_columns(category_id=None):
+    """Dynamic field keys for the export header, in schema order"""
+    fields = schema.category_fields(category_id) if category_id else schema.all_fields()
+    keys = []
+    for field in fields:
+        if field.key not in keys and field.key not in CORE_COLUMNS:
+            keys.append(field.key)
+    return keys
+
+
+def export_columns(columns=None, category_id=None):
+    """The header: the requested ``columns``, or every core and dynamic column"""
+    if columns:
+        return list(columns)
+    return CORE_COLUMNS + dynamic_columns(category_id)
+
+
+def column_types(columns):
+    """Spreadsheet cell types for ``columns``: number/date dynamic fields typed the same in every category"""
+    types = {'ID': 'number', BOOK_VALUE_COLUMN: 'number'}
+    for column in columns:
+        if column in CORE_COLUMNS or column == BOOK_VALUE_COLUMN:
+            continue
+        field_types = {f.type for f in schema.fields_for_key(column)}
+        if len(field_types) == 1 and field_types & {'number', 'date'}:
+            types[column] = field_types.pop()
+    return types
+
+
+def asset_row(asset, columns):
+    """Values of ``asset`` for ``columns``, in order"""
+    core = {
+        'ID': asset.pk,
+        'Category': asset.category.name,
+        'Status': asset.status,
+        'Assigned To': str(asset.assigned_to) if asset.assigned_to else '',
+        'Created': asset.created_at.strftime('%Y-%m-%d %H:%M'),
+        'Updated': asset.updated_at.strftime('%Y-%m-%d %H:%M'),
+        BOOK_VALUE_COLUMN: getattr(asset, 'book_value', None),
+    }
+    data = asset.dynamic_data or {}
+    row = []
+    for column in columns:
+        value = core[column] if column in core else data.get(column)
+        row.append('' if value is None else value)
+    return row
+
+
+def iter_rows(qs, columns, chunk_size=EXPORT_CHUNK_SIZE):
+    qs = export_queryset(qs)
+    if BOOK_VALUE_COLUMN in columns:
+        qs = qs.annotate(book_value=depreciation.current_book_value())
+    for asset in qs.iterator(chunk_size=chunk_size):
+        yield asset_row(asset, columns)
+
+
+class Echo:
+    """File-like object whose write() hands the line back to csv.writer's caller"""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(qs, columns, on_error=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield the CSV export of ``qs`` line by line"""
+    writer = csv.writer(Echo())
+    yield writer.writerow(columns)
+    try:
+        for row in iter_rows(qs, columns, chunk_size):
+            yield writer.writerow(row)
+    except Exception as e:
+        # Headers are already sent, so the failure can only be recorded
+        logger.exception('CSV export failed mid-stream')
+        if on_error:
+            on_error(e)
+        raise
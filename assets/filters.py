@@ -0,0 +1,69 @@
+"""
+Asset list filters, shared by the list view, exports (including background
+export jobs) and the dashboard.
+"""
+import datetime
+from datetime import timedelta
+
+from django.utils import timezone
+
+from . import schema
+from .promoted import field_q
+from .search import search_assets
+
+
+def parse_filter_date(val):
+    """Accept the list filter's mm/dd/yyyy format as well as ISO dates."""
+    for fmt in ('%m/%d/%Y', '%Y-%m-%d'):
+        try:
+            return datetime.datetime.strptime(val, fmt).date().isoformat()
+        except ValueError:
+            continue
+    return None
+
+def filter_assets(qs, params):
+    """Apply the asset list filters in ``params`` (shared by the list view and export)."""
+    category = params.get('category')
+    status = params.get('status')
+    location = params.get('location')
+    search = params.get('search')
+    assigned = params.get('assigned')
+    warranty = params.get('warranty')
+    if category:
+        qs = qs.filter(category__id=category)
+        # Dynamic field filters for this category; promoted keys use the indexed shadow table
+        for field in schema.category_fields(category):
+            val = params.get(f'dyn_{field.key}')
+            if not val:
+                continue
+            if field.type == 'text':
+                qs = qs.filter(field_q(field.key, category_id=category, icontains=val))
+            elif field.type == 'number':
+                try:
+                    qs = qs.filter(field_q(field.key, category_id=category, exact=float(val)))
+                except ValueError:
+                    pass
+            elif field.type == 'date':
+                iso_val = parse_filter_date(val)
+                if iso_val:
+                    qs = qs.filter(field_q(field.key, category_id=category, exact=iso_val))
+                # Invalid date format, ignore filter
+    if status:
+        qs = qs.filter(status=status)
+    if assigned == 'yes':
+        qs = qs.filter(assigned_to__isnull=False)
+    elif assigned == 'no':
+        qs = qs.filter(assigned_to__isnull=True)
+    if warranty == 'expiring':
+        qs = qs.filter(warranty_expiring_q())
+    if location:
+        qs = qs.filter(field_q('location', icontains=location))
+    if search:
+        # Full-text index (prefix matching, ranked); see assets.search
+        qs = search_assets(qs, search)
+    return qs
+
+def warranty_expiring_q(days=30):
+    today = timezone.now().date()
+    soon = today + timedelta(days=days)
+    return field_q('warranty_expiry', lte=soon.isoformat(), gte=today.isoformat())
@@ -1,10 +1,29 @@
 from django import forms
 from .models import Asset, AssetCategory, AssetCategoryField
 from django.core.exceptions import ValidationError
-from django.apps import apps
+from . import promoted, schema
 import json
 
-class AssetForm(forms.ModelForm):
+class NaturalKeyFormMixin:
+    """For asset forms: natural_key is not editable, so ModelForm skips its unique constraint"""
+
+    def check_natural_key(self, category, dynamic_data):
+        """The category's natural key must be unique (assets_asset_natural_key_uniq)"""
+        category = schema.get_category(category.pk) if category else None
+        if category is None or not category.natural_key:
+            return
+        value = promoted.natural_key_value(dynamic_data.get(category.natural_key))
+        if value is None:
+            return
+        others = Asset.objects.filter(category_id=category.pk, natural_key=value)
+        if self.instance.pk:
+            others = others.exclude(pk=self.instance.pk)
+        if others.exists():
+            fname = f'dyn_{category.natural_key}'
+            self.add_error(fname if fname in self.fields else None, f'Another {category.name} asset already has this value.')
+
+
+class AssetForm(NaturalKeyFormMixin, forms.ModelForm):
     def __init__(self, *args, **kwargs):
         self.request = kwargs.pop('request', None)
         # Get category from POST, GET, or initial
@@ -16,18 +35,12 @@ class AssetForm(forms.ModelForm):
         super().__init__(*args, **kwargs)
         # Add dynamic fields from category
         self.dynamic_field_names = []
-        AssetCategoryModel = apps.get_model('assets', 'AssetCategory')
-        AssetCategoryFieldModel = apps.get_model('assets', 'AssetCategoryField')
         if category_id:
-            try:
-                category = AssetCategoryModel.objects.get(pk=category_id)
-                for f in AssetCategoryFieldModel.objects.filter(category=category):
-                    fname = f"dyn_{f.key}"
-                    # Force all dynamic fields to be optional
-                    self.fields[fname] = self._make_field({'key': f.key, 'label': f.label, 'type': f.type, 'required': False})
-                    self.dynamic_field_names.append(fname)
-            except AssetCategoryModel.DoesNotExist:
-                pass
+            for f in schema.category_fields(category_id):
+                fname = f"dyn_{f.key}"
+                # Force all dynamic fields to be optional
+                self.fields[fname] = self._make_field({'key': f.key, 'label': f.label, 'type': f.type, 'required': False})
+                self.dynamic_field_names.append(fname)
 
     def _make_field(self, field):
         label = field['label']
@@ -46,6 +59,7 @@ class AssetForm(forms.ModelForm):
         fields = [
             'category', 'status', 'assigned_to', 'description',
             'purchase_value', 'purchase_date', 'depreciation_method', 'useful_life_years',
+            'salvage_value', 'total_units', 'units_used',
             'qr_code', 'images', 'documents'
         ]
         widgets = {
@@ -96,6 +110,7 @@ class AssetForm(forms.ModelForm):
             dynamic_data[key] = value
         # No required field validation for dynamic fields
         cleaned_data['dynamic_data'] = dynamic_data
+        self.check_natural_key(cleaned_data.get('category'), dynamic_data)
         # Depreciation validation
         purchase_value = cleaned_data.get('purchase_value')
         purchase_date = cleaned_data.get('purchase_date')
@@ -108,6 +123,11 @@ class AssetForm(forms.ModelForm):
                 raise forms.ValidationError('Purchase value must be positive.')
             if useful_life_years <= 0:
                 raise forms.ValidationError('Useful life must be positive.')
+            salvage_value = cleaned_data.get('salvage_value')
+            if salvage_value is not None and not 0 <= salvage_value < purchase_value:
+                raise forms.ValidationError('Salvage value must be at least zero and below the purchase value.')
+            if depreciation_method == 'units_of_production' and not cleaned_data.get('total_units'):
+                raise forms.ValidationError('Total units are required for units of production depreciation.')
         return cleaned_data
 
     def save(self, commit=True):
@@ -0,0 +1,299 @@
+"""
+Batched bulk import.
+
+Rows come from the import staging store (assets.staging) and are imported in
+batches of IMPORT_BATCH_SIZE. Each batch is one transaction: a bulk_create of
+its assets, one bulk insert of its audit entries, and the checkpoint on the
+import's ExportLog (rows_done). A failing batch is retried row by row so a
+single bad row cannot sink its neighbours, and batches already committed stay
+committed. Usernames in ``assigned_to`` are resolved per batch in one query.
+
+In a category with a ``natural_key`` field the import is an upsert: rows are
+matched to existing assets on Asset.natural_key and written with a single
+INSERT ... ON CONFLICT (category, natural_key) DO UPDATE per batch. A matched
+row only changes the columns the upload has; the asset keeps its other
+fields and dynamic values. Rows whose
+content hash equals the stored asset's are skipped, and only inserted or
+changed assets get audit entries, so re-sending a full register touches
+just the rows that differ. A natural key repeated within the import fails
+every row after the first that carries it.
+
+bulk_create skips model signals, so each batch also refreshes the
+promoted-field shadow rows, the search index, the scan codes and the
+dashboard statistics and cache itself.
+
+Confirming the same staged upload again after an interrupted import resumes
+from the checkpoint instead of importing the committed rows again.
+"""
+import hashlib
+import itertools
+import json
+import logging
+import time
+from collections import Counter, namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+
+from audit.models import AuditLog
+from audit.utils import ASSIGN_ACTION
+
+from . import codes, dashboard, events, promoted, schema, search, stats
+from .models import Asset, ExportLog
+
+logger = logging.getLogger(__name__)
+
+IMPORT_BATCH_SIZE = getattr(settings, 'IMPORT_BATCH_SIZE', 500)
+# Columns an upsert overwrites on an existing asset
+UPSERT_FIELDS = ['status', 'description', 'assigned_to', 'dynamic_data', 'content_hash', 'updated_at']
+
+# The stored asset an upserted row matches
+Stored = namedtuple('Stored', 'pk content_hash assigned_to_id status description dynamic_data')
+
+
+def content_hash(asset):
+    """Hash of the fields an import sets, blank dynamic values ignored"""
+    payload = json.dumps({
+        'status': asset.status,
+        'description': asset.description or '',
+        'assigned_to': asset.assigned_to_id,
+        'dynamic_data': {key: value for key, value in (asset.dynamic_data or {}).items() if value not in (None, '')},
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def prefetch_users(rows):
+    """Map every username referenced in ``assigned_to`` to its user, in as few queries as possible"""
+    usernames = sorted({str(row['assigned_to']).strip() for row in rows if row.get('assigned_to')})
+    users = {}
+    for start in range(0, len(usernames), 500):
+        for user in get_user_model().objects.filter(username__in=usernames[start:start + 500]):
+            users[user.username] = user
+    return users
+
+
+def row_key(row, category):
+    """The natural key of ``row``, or None outside upsert categories"""
+    return promoted.natural_key_value(row.get(category.natural_key)) if category.natural_key else None
+
+
+def build_asset(row, category, fields, users, stored=None):
+    """The asset for ``row``; over a ``stored`` match, columns missing from the row keep their stored values"""
+    dynamic_data = dict(stored.dynamic_data or {}) if stored else {}
+    dynamic_data.update({field.key: row.get(field.key) for field in fields if not stored or field.key in row})
+    for field in fields:
+        if field.required and dynamic_data.get(field.key) in (None, ''):
+            raise ValueError(f'Missing required field {field.label}')
+    asset = Asset(
+        category=category,
+        status=row.get('status') or 'active',
+        description=row.get('description') or '',
+        dynamic_data=dynamic_data,
+    )
+    if stored:
+        if 'status' not in row:
+            asset.status = stored.status
+        if 'description' not in row:
+            asset.description = stored.description
+    assigned_to = row.get('assigned_to')
+    if stored and 'assigned_to' not in row:
+        asset.assigned_to_id = stored.assigned_to_id
+    elif assigned_to:
+        asset.assigned_to = users.get(str(assigned_to).strip())
+    # bulk_create skips the pre_save handler that normally sets these
+    if category.natural_key:
+        asset.natural_key = promoted.natural_key_value(asset.dynamic_data.get(category.natural_key))
+    asset.content_hash = content_hash(asset)
+    return asset
+
+
+def existing_assets(category, keys):
+    """Stored assets of the category with these natural keys, by key"""
+    keys = [key for key in keys if key is not None]
+    if not keys:
+        return {}
+    rows = Asset.objects.filter(category=category, natural_key__in=keys).values_list('natural_key', *Stored._fields)
+    return {key: Stored(*values) for key, *values in rows}
+
+
+def stat_deltas(assets, existing):
+    """Dashboard statistics deltas for writing ``assets``, updating the ``existing`` ones"""
+    deltas = Counter()
+    for asset in assets:
+        prior = existing.get(asset.natural_key)
+        previous = (asset.category_id, prior.status, prior.assigned_to_id or 0) if prior else None
+        deltas.update(stats.moved(previous, stats.stat_key(asset)))
+    return deltas
+
+
+def start_import(user, category_id, token, columns, rows_total):
+    """The ExportLog tracking this import and the position to start from (resuming an interrupted run)"""
+    log = ExportLog.objects.filter(
+        format='import', user=user, status__in=('running', 'failed'),
+        filters__category=str(category_id), filters__import_token=str(token),
+        rows_total=rows_total, rows_done__lt=rows_total,
+    ).order_by('-timestamp').first()
+    if log:
+        ExportLog.objects.filter(pk=log.pk).update(status='running')
+        logger.info('Resuming import %s after %s rows', log.pk, log.rows_done)
+        return log, log.rows_done
+    log = ExportLog.objects.create(
+        user=user,
+        format='import',
+        columns=columns,
+        filters={'category': str(category_id), 'import_token': str(token)},
+        status='running',
+        rows_total=rows_total,
+        started_at=timezone.now(),
+    )
+    return log, 0
+
+
+def save_batch(assets, upsert=False, existing=None):
+    """
+    Write ``assets``; on a database error fall back to one savepoint per row.
+    With ``upsert``, assets whose natural key exists update that asset.
+    Dashboard statistics are adjusted with the write, by signals where the
+    row is written with save(). Returns failures.
+    """
+    options = {}
+    if upsert:
+        options = {'update_conflicts': True, 'unique_fields': ['category', 'natural_key'], 'update_fields': UPSERT_FIELDS}
+    returning = connection.features.can_return_rows_from_bulk_insert
+    if returning and (not upsert or connection.features.supports_update_conflicts_with_target):
+        try:
+            with transaction.atomic():
+                Asset.objects.bulk_create(assets, **options)
+                stats.apply(stat_deltas(assets, existing or {}))
+            return {}
+        except DatabaseError:
+            for asset in assets:
+                asset.pk = None
+    failures = {}
+    for asset in assets:
+        prior = (existing or {}).get(asset.natural_key) if upsert else None
+        try:
+            with transaction.atomic():
+                if prior:
+                    asset.pk = prior.pk
+                    asset.save(update_fields=UPSERT_FIELDS)
+                elif returning:
+                    Asset.objects.bulk_create([asset])
+                    stats.apply(stats.moved(None, stats.stat_key(asset)))
+                else:
+                    # No RETURNING on this database: save() to get the primary key
+                    asset.save()
+        except DatabaseError as e:
+            asset.pk = None
+            failures[id(asset)] = str(e)
+    return failures
+
+
+def import_rows(rows, category_id, user, log, start=0, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Import ``rows``, (sheet row number, row dict, error) triples continuing
+    from position ``start``, into the category. Rows with an error, which
+    failed validation when staged, are reported as failed without importing
+    them, as are rows repeating an earlier row's natural key. Returns (counts, fail_rows), where counts has the number of assets
+    created, updated and left unchanged.
+    """
+    category = schema.get_category(category_id)
+    fields = schema.category_fields(category_id)
+    upsert = bool(category.natural_key)
+    rows = iter(rows)
+    done = start
+    counts = {'created': 0, 'updated': 0, 'unchanged': 0}
+    fail_rows = []
+    seen_keys = set()
+    while True:
+        batch = list(itertools.islice(rows, max(batch_size, 1)))
+        if not batch:
+            break
+        users = prefetch_users(row for _, row, error in batch if not error)
+        existing = existing_assets(category, (row_key(row, category) for _, row, error in batch if not error)) if upsert else {}
+        assets, lines = [], []
+        for line, row, error in batch:
+            if error:
+                fail_rows.append({'row': line, 'error': error})
+                continue
+            try:
+                asset = build_asset(row, category, fields, users, existing.get(row_key(row, category)))
+            except Exception as e:
+                fail_rows.append({'row': line, 'error': str(e)})
+                continue
+            if upsert and asset.natural_key is not None:
+                # One upsert statement cannot write the same key twice
+                if asset.natural_key in seen_keys:
+                    fail_rows.append({'row': line, 'error': f'Duplicate {category.natural_key} in this upload'})
+                    continue
+                seen_keys.add(asset.natural_key)
+            assets.append(asset)
+            lines.append(line)
+        done += len(batch)
+        changed, changed_lines = [], []
+        for asset, line in zip(assets, lines):
+            prior = existing.get(asset.natural_key)
+            if prior and prior.content_hash == asset.content_hash:
+                counts['unchanged'] += 1
+                continue
+            changed.append(asset)
+            changed_lines.append(line)
+        with transaction.atomic():
+            failures = save_batch(changed, upsert=upsert, existing=existing)
+            saved = []
+            audit_rows = []
+            for asset, line in zip(changed, changed_lines):
+                if id(asset) in failures:
+                    fail_rows.append({'row': line, 'error': failures[id(asset)]})
+                    continue
+                saved.append(asset)
+                prior = existing.get(asset.natural_key)
+                if prior:
+                    counts['updated'] += 1
+                    audit_rows.append(AuditLog(user=user, action='edit', asset=asset, details=f'Asset updated via bulk import (row {line})'))
+                else:
+                    counts['created'] += 1
+                    audit_rows.append(AuditLog(user=user, action='create', asset=asset, details=f'Asset imported via bulk import (row {line})'))
+                if asset.assigned_to_id and (not prior or prior.assigned_to_id != asset.assigned_to_id):
+                    audit_rows.append(AuditLog(
+                        user=user, action=ASSIGN_ACTION, asset=asset, related_user=asset.assigned_to,
+                        details=f'Asset assigned to {asset.assigned_to.username} via bulk import (row {line})',
+                    ))
+            AuditLog.objects.bulk_create(audit_rows)
+            # Signals do not fire for bulk_create
+            promoted.sync_assets(saved)
+            search.index_assets(saved)
+            # Upserted rows hold a fresh uuid and no qr_code in memory; codes come from the stored ones
+            codes.sync_assets(Asset.objects.filter(pk__in=[asset.pk for asset in saved]).only('pk', 'uuid', 'qr_code'))
+            events.publish_audit(audit_rows)
+            if saved:
+                dashboard.invalidate()
+                events.publish('refresh', {})
+            # Checkpoint: committed together with the batch it describes
+            ExportLog.objects.filter(pk=log.pk).update(
+                rows_done=done,
+                error_message=format_failures(log.error_message, fail_rows),
+            )
+    return counts, fail_rows
+
+
+def format_failures(previous, fail_rows):
+    lines = '; '.join(f"Row {r['row']}: {r['error']}" for r in fail_rows)
+    return '; '.join(part for part in (previous, lines) if part)
+
+
+def finish_import(log, fail_rows, started):
+    ExportLog.objects.filter(pk=log.pk).update(
+        status='done',
+        success=not fail_rows and not log.error_message,
+        finished_at=timezone.now(),
+        duration=timedelta(seconds=time.monotonic() - started),
+    )
+
+
+def fail_import(log, error):
+    ExportLog.objects.filter(pk=log.pk).update(status='failed', success=False, finished_at=timezone.now())
+    logger.error('Import %s stopped: %s', log.pk, error)
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from assets.models import Asset, AssetCategoryField
+from assets import promoted, schema
+
+class Command(BaseCommand):
+    help = 'Backfill the indexed shadow table for dynamic fields marked as indexed.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--category', type=int, help='Only backfill this category id')
+        parser.add_argument('--rebuild', action='store_true', help='Also rebuild fields whose index is already built')
+        parser.add_argument('--batch-size', type=int, default=promoted.SYNC_CHUNK_SIZE, help='Assets per batch')
+
+    def handle(self, *args, **options):
+        fields = AssetCategoryField.objects.filter(indexed=True)
+        if options['category']:
+            fields = fields.filter(category_id=options['category'])
+        if not options['rebuild']:
+            fields = fields.filter(index_built_at__isnull=True)
+        category_ids = sorted(set(fields.values_list('category_id', flat=True)))
+        if not category_ids:
+            self.stdout.write('No promoted fields need a backfill.')
+            return
+        batch_size = max(options['batch_size'], 1)
+        total_assets = 0
+        total_rows = 0
+        for category_id in category_ids:
+            # Walk the category by primary key so memory stays flat on large tables
+            last_pk = 0
+            while True:
+                batch = list(
+                    Asset.objects.filter(category_id=category_id, pk__gt=last_pk)
+                    .only('id', 'category_id', 'dynamic_data')
+                    .order_by('pk')[:batch_size]
+                )
+                if not batch:
+                    break
+                total_rows += promoted.sync_assets(batch)
+                total_assets += len(batch)
+                last_pk = batch[-1].pk
+            # update() skips the pre_save hook that would reset the marker
+            fields.filter(category_id=category_id).update(index_built_at=timezone.now())
+            schema.invalidate()
+            self.stdout.write(f'Category {category_id}: backfilled.')
+        self.stdout.write(self.style.SUCCESS(f'Backfilled {total_rows} values across {total_assets} assets.'))
@@ -0,0 +1,86 @@
+import io
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+from django.core.management.base import BaseCommand
+from assets import xlsx
+
+HEADER = ['ID', 'Category', 'Status', 'Assigned To', 'Created', 'Updated', 'serial', 'price', 'warranty_expiry']
+COLUMN_TYPES = {'ID': 'number', 'price': 'number', 'warranty_expiry': 'date'}
+
+
+def synthetic_rows(count):
+    """Rows shaped like assets.exports.asset_row output"""
+    for i in range(count):
+        yield [i + 1, 'Laptops', 'active', f'user{i % 50}', '2024-01-01 10:00', '2024-06-01 09:30',
+               f'SN{i:09d}', str(800 + i % 700), f'2026-{i % 12 + 1:02d}-15']
+
+
+def current_rss_kb():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+    return 0
+
+
+def run_streaming(count, path):
+    return xlsx.write_rows(path, HEADER, synthetic_rows(count), COLUMN_TYPES)
+
+
+def run_dataframe(count, path):
+    # The previous export path: list of dicts -> DataFrame -> ExcelWriter into memory
+    import pandas as pd
+    df = pd.DataFrame([dict(zip(HEADER, row)) for row in synthetic_rows(count)])
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
+        df.to_excel(writer, index=False, sheet_name='Assets')
+    with open(path, 'wb') as f:
+        f.write(buffer.getvalue())
+    return len(df)
+
+
+MODES = {'streaming': run_streaming, 'dataframe': run_dataframe}
+
+
+def measure(mode, count, conn):
+    start_rss = current_rss_kb()
+    fd, path = tempfile.mkstemp(suffix='.xlsx')
+    os.close(fd)
+    try:
+        started = time.monotonic()
+        MODES[mode](count, path)
+        elapsed = time.monotonic() - started
+        size = os.path.getsize(path)
+    finally:
+        os.remove(path)
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    conn.send((start_rss, peak_rss, elapsed, size))
+    conn.close()
+
+
+class Command(BaseCommand):
+    help = 'Measure peak RSS of the streaming XLSX writer (and optionally the old DataFrame path) on synthetic rows.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[100_000, 1_000_000], help='Row counts to benchmark')
+        parser.add_argument('--dataframe', action='store_true', help='Also measure the previous pandas DataFrame path')
+
+    def handle(self, *args, **options):
+        modes = ['streaming'] + (['dataframe'] if options['dataframe'] else [])
+        # Each run gets a fresh process so peak RSS is not inherited from the previous one
+        context = multiprocessing.get_context('fork')
+        self.stdout.write(f"{'mode':<10} {'rows':>10} {'peak RSS MB':>12} {'growth MB':>10} {'seconds':>8} {'file MB':>8}")
+        for count in options['rows']:
+            for mode in modes:
+                parent, child = context.Pipe(duplex=False)
+                process = context.Process(target=measure, args=(mode, count, child))
+                process.start()
+                start_rss, peak_rss, elapsed, size = parent.recv()
+                process.join()
+                self.stdout.write(
+                    f'{mode:<10} {count:>10} {peak_rss / 1024:>12.1f} {(peak_rss - start_rss) / 1024:>10.1f} '
+                    f'{elapsed:>8.1f} {size / 1048576:>8.1f}'
+                )
@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from assets import staging
+
+class Command(BaseCommand):
+    help = 'Delete expired bulk-import staging data and abandoned uploads under tmp/. Safe to run from cron.'
+
+    def handle(self, *args, **options):
+        batches, files = staging.purge_expired()
+        self.stdout.write(self.style.SUCCESS(f'Removed {batches} expired import(s) and {files} stale upload(s).'))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from assets import codes
+
+class Command(BaseCommand):
+    help = 'Rebuild the scan code lookup table (UUIDs, QR file names and ids) for every asset.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=codes.SYNC_CHUNK_SIZE, help='Assets per batch')
+
+    def handle(self, *args, **options):
+        count = codes.rebuild(batch_size=max(options['batch_size'], 1))
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt scan codes for {count} assets.'))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime, parse_date
+from django.utils import timezone
+from assets.models import Asset
+from assets import search
+
+class Command(BaseCommand):
+    help = 'Rebuild the asset full-text search index, or refresh part of it incrementally.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='Only reindex assets updated at or after this ISO date/datetime')
+        parser.add_argument('--category', type=int, help='Only reindex assets in this category id')
+        parser.add_argument('--batch-size', type=int, default=search.INDEX_CHUNK_SIZE, help='Assets per batch')
+
+    def handle(self, *args, **options):
+        backend = search.get_backend()
+        if backend.name == search.FallbackBackend.name:
+            self.stdout.write(self.style.WARNING('No full-text index on this database; search uses the LIKE fallback.'))
+            return
+        batch_size = max(options['batch_size'], 1)
+        if not options['since'] and not options['category']:
+            count = search.rebuild_index(batch_size=batch_size)
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt {backend.name} search index for {count} assets.'))
+            return
+        qs = Asset.objects.all()
+        if options['since']:
+            since = parse_datetime(options['since'])
+            if since is None:
+                day = parse_date(options['since'])
+                if day is None:
+                    raise CommandError('--since must be an ISO date or datetime')
+                since = timezone.datetime(day.year, day.month, day.day)
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+            qs = qs.filter(updated_at__gte=since)
+        if options['category']:
+            qs = qs.filter(category_id=options['category'])
+        count = search.index_queryset(qs, batch_size=batch_size)
+        self.stdout.write(self.style.SUCCESS(f'Reindexed {count} assets.'))
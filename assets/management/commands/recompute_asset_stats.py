@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from assets import dashboard, stats
+
+class Command(BaseCommand):
+    help = 'Recompute the dashboard asset statistics from the asset table, correcting any drift. Meant to run periodically (e.g. nightly from cron).'
+
+    def handle(self, *args, **options):
+        drift = stats.recompute()
+        if drift:
+            dashboard.invalidate()
+            self.stdout.write(self.style.WARNING(f'Corrected {drift} statistics rows.'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Asset statistics are up to date.'))
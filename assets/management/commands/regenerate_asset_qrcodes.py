@@ -1,22 +1,59 @@
-from django.core.management.base import BaseCommand
-from assets.models import Asset
-import qrcode
-from io import BytesIO
 from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from assets import codes, qr
+from assets.models import Asset
 
 class Command(BaseCommand):
-    help = 'Regenerate QR codes for all assets using the direct URL format.'
+    help = 'Regenerate asset QR codes (direct URL format) in parallel, optionally only where the encoded URL changed.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=qr.default_workers(), help='Rendering processes (default: one per CPU)')
+        parser.add_argument('--only-changed', action='store_true', help='Skip assets whose code already encodes the current URL')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Assets read, rendered and updated per round')
+        parser.add_argument('--base-url', default='', help='Base URL to encode (default: the ASSET_QR_BASE_URL setting)')
 
     def handle(self, *args, **options):
-        updated = 0
-        # You may need to set your base URL here if not running in a request context
-        base_url = 'https://yourdomain.com'  # TODO: Set your actual domain here
-        for asset in Asset.objects.all():
-            qr_url = f"{base_url}/assets/{asset.uuid}/"
-            qr = qrcode.make(qr_url)
-            buffer = BytesIO()
-            qr.save(buffer, 'PNG')
-            asset.qr_code.save(f"asset_{asset.uuid}.png", ContentFile(buffer.getvalue()), save=False)
-            asset.save()
-            updated += 1
-        self.stdout.write(self.style.SUCCESS(f'Regenerated QR codes for {updated} assets.')) 
\ No newline at end of file
+        base_url = options['base_url'] or qr.QR_BASE_URL
+        if not base_url:
+            raise CommandError('Set ASSET_QR_BASE_URL or pass --base-url, e.g. https://assets.example.com')
+        field = Asset._meta.get_field('qr_code')
+        chunk_size = max(options['chunk_size'], 1)
+        updated = skipped = 0
+        last_pk = 0
+        with qr.renderer(options['workers']) as render:
+            while True:
+                # Keyset over pk, so rows updated behind the cursor are never re-read
+                chunk = list(
+                    Asset.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', 'uuid', 'qr_hash', 'qr_code')[:chunk_size]
+                )
+                if not chunk:
+                    break
+                last_pk = chunk[-1][0]
+                jobs = []
+                for pk, uuid, old_hash, name in chunk:
+                    url = qr.asset_url(base_url, uuid)
+                    if options['only_changed'] and (name or not qr.STORE_FILES) and old_hash == qr.url_hash(url):
+                        skipped += 1
+                        continue
+                    jobs.append(((pk, uuid), url))
+                if not qr.STORE_FILES:
+                    # Codes are served on demand (asset_qr): only the hash of the encoded URL is kept
+                    assets = [Asset(pk=pk, qr_hash=qr.url_hash(url)) for (pk, uuid), url in jobs]
+                    Asset.objects.bulk_update(assets, ['qr_hash'])
+                    updated += len(assets)
+                    self.stdout.write(f'{updated} regenerated, {skipped} unchanged (through asset #{last_pk})')
+                    continue
+                assets = []
+                for (pk, uuid), digest, png in render(jobs):
+                    name = field.generate_filename(None, qr.file_name(uuid))
+                    # Replace in place; save() would otherwise pick a new name
+                    if default_storage.exists(name):
+                        default_storage.delete(name)
+                    assets.append(Asset(pk=pk, uuid=uuid, qr_code=default_storage.save(name, ContentFile(png)), qr_hash=digest))
+                Asset.objects.bulk_update(assets, ['qr_code', 'qr_hash'])
+                # bulk_update skips signals: file names are scan codes too
+                codes.sync_assets(assets)
+                updated += len(assets)
+                self.stdout.write(f'{updated} regenerated, {skipped} unchanged (through asset #{last_pk})')
+        self.stdout.write(self.style.SUCCESS(f'Regenerated QR codes for {updated} assets; {skipped} were already current.'))
@@ -0,0 +1,28 @@
+import time
+from django.core.management.base import BaseCommand
+from assets import export_jobs
+
+class Command(BaseCommand):
+    help = 'Run queued background exports (Excel/PDF). Keep one or more of these running next to the web workers.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Process the jobs queued right now, then exit')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds to wait between polls when idle')
+
+    def handle(self, *args, **options):
+        stale = export_jobs.fail_stale_jobs()
+        if stale:
+            self.stdout.write(self.style.WARNING(f'Marked {stale} abandoned job(s) as failed.'))
+        while True:
+            job = export_jobs.claim_next_job()
+            if job is None:
+                if options['once']:
+                    return
+                time.sleep(options['interval'])
+                export_jobs.fail_stale_jobs()
+                continue
+            job = export_jobs.run_job(job)
+            if job.status == 'done':
+                self.stdout.write(self.style.SUCCESS(f'Export job {job.pk} done: {job.rows_done} rows, {job.file_size} bytes.'))
+            else:
+                self.stdout.write(self.style.ERROR(f'Export job {job.pk} failed: {job.error_message}'))
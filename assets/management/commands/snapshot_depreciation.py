@@ -0,0 +1,27 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from assets import dashboard, depreciation
+
+class Command(BaseCommand):
+    help = 'Recompute stored monthly book values (depreciation snapshots) for every asset. Run monthly to move the window along.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='First month, yyyy-mm (default: DEPRECIATION_SNAPSHOT_PAST months back)')
+        parser.add_argument('--months', type=int, help='Number of months (default: the configured window)')
+        parser.add_argument('--chunk-size', type=int, default=depreciation.SNAPSHOT_CHUNK_SIZE, help='Assets per transaction')
+
+    def handle(self, *args, **options):
+        first_month, months = depreciation.default_window()
+        if options['start']:
+            try:
+                first_month = depreciation.month_index(datetime.datetime.strptime(options['start'], '%Y-%m').date())
+            except ValueError:
+                raise CommandError('--start must be yyyy-mm')
+        if options['months']:
+            months = options['months']
+        if months < 1:
+            raise CommandError('--months must be positive')
+        written = depreciation.snapshot(first_month, months, chunk_size=max(options['chunk_size'], 1))
+        dashboard.invalidate()
+        self.stdout.write(self.style.SUCCESS(f'Stored {written} depreciation snapshots from {depreciation.month_start(first_month):%Y-%m} over {months} months.'))
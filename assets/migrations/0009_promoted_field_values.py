@@ -0,0 +1,39 @@
+# Generated by Django 5.2.4 on 2026-10-18 01:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0008_asset_depreciation_method_asset_purchase_date_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='assetcategoryfield',
+            name='index_built_at',
+            field=models.DateTimeField(blank=True, editable=False, help_text='Set once existing assets have been backfilled (see backfill_promoted_fields)', null=True),
+        ),
+        migrations.AddField(
+            model_name='assetcategoryfield',
+            name='indexed',
+            field=models.BooleanField(default=False, help_text='Keep a typed, indexed copy of this value for fast filtering'),
+        ),
+        migrations.CreateModel(
+            name='AssetFieldValue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=50)),
+                ('text_value', models.CharField(blank=True, max_length=255, null=True)),
+                ('number_value', models.FloatField(blank=True, null=True)),
+                ('date_value', models.DateField(blank=True, null=True)),
+                ('asset', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='field_values', to='assets.asset')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['key', 'text_value'], name='assets_fv_key_text_idx'), models.Index(fields=['key', 'number_value'], name='assets_fv_key_number_idx'), models.Index(fields=['key', 'date_value'], name='assets_fv_key_date_idx')],
+                'unique_together': {('asset', 'key')},
+            },
+        ),
+    ]
@@ -0,0 +1,62 @@
+from django.db import migrations
+from django.db.utils import OperationalError
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        try:
+            schema_editor.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS assets_search "
+                "USING fts5(document, tokenize='unicode61', prefix='2 3')"
+            )
+        except OperationalError:
+            # SQLite built without FTS5: search keeps using the LIKE fallback
+            return
+    elif connection.vendor == 'postgresql':
+        schema_editor.execute(
+            "CREATE TABLE IF NOT EXISTS assets_search ("
+            "asset_id bigint PRIMARY KEY REFERENCES assets_asset(id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+            "document tsvector NOT NULL)"
+        )
+        schema_editor.execute("CREATE INDEX IF NOT EXISTS assets_search_document_idx ON assets_search USING GIN (document)")
+    else:
+        return
+    # Seed the index so search keeps working right after the upgrade
+    Asset = apps.get_model('assets', 'Asset')
+    AssetCategoryField = apps.get_model('assets', 'AssetCategoryField')
+    text_keys = {}
+    for category_id, key in AssetCategoryField.objects.filter(type='text').values_list('category_id', 'key'):
+        text_keys.setdefault(category_id, []).append(key)
+    if connection.vendor == 'sqlite':
+        sql = "INSERT INTO assets_search (rowid, document) VALUES (%s, %s)"
+    else:
+        sql = "INSERT INTO assets_search (asset_id, document) VALUES (%s, to_tsvector('simple', %s))"
+    rows = []
+    with connection.cursor() as cursor:
+        for asset in Asset.objects.select_related('category').iterator(chunk_size=2000):
+            data = asset.dynamic_data or {}
+            parts = [asset.category.name, asset.description or '']
+            parts += [str(data[k]) for k in text_keys.get(asset.category_id, ()) if data.get(k) not in (None, '')]
+            rows.append((asset.pk, ' '.join(p for p in parts if p)))
+            if len(rows) >= 2000:
+                cursor.executemany(sql, rows)
+                rows = []
+        if rows:
+            cursor.executemany(sql, rows)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        schema_editor.execute("DROP TABLE IF EXISTS assets_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0009_promoted_field_values'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
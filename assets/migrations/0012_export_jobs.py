@@ -0,0 +1,68 @@
+# Generated by Django 5.2.4 on 2026-10-18 01:28
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0011_keyset_pagination_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exportlog',
+            name='duration',
+            field=models.DurationField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='exportlog',
+            name='file',
+            field=models.FileField(blank=True, upload_to='exports/'),
+        ),
+        migrations.AddField(
+            model_name='exportlog',
+            name='file_size',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='exportlog',
+            name='fingerprint',
+            field=models.CharField(blank=True, help_text='Hash of format, columns, filters and dataset state; equal fingerprints share the file', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='exportlog',
+            name='finished_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='exportlog',
+            name='rows_done',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='exportlog',
+            name='rows_total',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='exportlog',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='exportlog',
+            name='status',
+            field=models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='done', max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='exportlog',
+            index=models.Index(fields=['status', 'timestamp'], name='assets_export_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='exportlog',
+            index=models.Index(fields=['fingerprint', 'status'], name='assets_export_fprint_idx'),
+        ),
+    ]
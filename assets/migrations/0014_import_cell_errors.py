@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 01:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0013_import_staging'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importrow',
+            name='cell_errors',
+            field=models.JSONField(blank=True, default=dict, help_text='Validation errors by column'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.4 on 2026-10-18 01:56
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0014_import_cell_errors'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='asset',
+            name='content_hash',
+            field=models.CharField(blank=True, editable=False, help_text='Hash of the importable content, to skip unchanged rows on re-import', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='asset',
+            name='natural_key',
+            field=models.CharField(blank=True, editable=False, help_text="Value of the category's natural key field", max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='assetcategory',
+            name='natural_key',
+            field=models.CharField(blank=True, help_text='Key of the dynamic field that identifies an asset in this category (e.g. serial_number). Bulk imports update the asset with a matching value instead of adding a duplicate.', max_length=50),
+        ),
+        migrations.AddConstraint(
+            model_name='asset',
+            constraint=models.UniqueConstraint(fields=('category', 'natural_key'), name='assets_asset_natural_key_uniq'),
+        ),
+    ]
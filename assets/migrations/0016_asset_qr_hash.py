@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 01:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0015_natural_key_upsert'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='asset',
+            name='qr_hash',
+            field=models.CharField(blank=True, editable=False, help_text='SHA-256 of the URL encoded in qr_code (see assets.qr)', max_length=64),
+        ),
+    ]
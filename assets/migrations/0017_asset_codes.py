@@ -0,0 +1,26 @@
+# Generated by Django 5.2.4 on 2026-10-18 02:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0016_asset_qr_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AssetCode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=255)),
+                ('kind', models.CharField(choices=[('uuid', 'UUID'), ('file', 'QR file name'), ('id', 'Asset ID')], max_length=10)),
+                ('asset', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='codes', to='assets.asset')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('code', 'kind'), name='assets_code_code_kind_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.4 on 2026-10-18 02:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def seed_stats(apps, schema_editor):
+    # Start from the real counts; deltas keep them current from here on
+    Asset = apps.get_model('assets', 'Asset')
+    AssetStat = apps.get_model('assets', 'AssetStat')
+    rows = Asset.objects.values_list('category_id', 'status', 'assigned_to_id').annotate(count=Count('pk')).order_by()
+    AssetStat.objects.bulk_create([
+        AssetStat(category_id=category_id, status=status, assignee=assignee or 0, count=count)
+        for category_id, status, assignee, count in rows
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0018_scan_receipts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AssetStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(max_length=20)),
+                ('assignee', models.PositiveIntegerField(default=0, help_text='Id of the assigned user, 0 when unassigned')),
+                ('count', models.IntegerField(default=0)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='assets.assetcategory')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['assignee'], name='assets_stat_assignee_idx')],
+                'constraints': [models.UniqueConstraint(fields=('category', 'status', 'assignee'), name='assets_stat_key_uniq')],
+            },
+        ),
+        migrations.RunPython(seed_stats, migrations.RunPython.noop),
+    ]
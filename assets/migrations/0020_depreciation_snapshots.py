@@ -0,0 +1,48 @@
+# Generated by Django 5.2.4 on 2026-10-18 02:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0019_asset_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='asset',
+            name='salvage_value',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Residual value at the end of the useful life', max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='asset',
+            name='total_units',
+            field=models.PositiveIntegerField(blank=True, help_text='Expected lifetime output, for units of production', null=True),
+        ),
+        migrations.AddField(
+            model_name='asset',
+            name='units_used',
+            field=models.PositiveIntegerField(blank=True, help_text='Output so far, for units of production', null=True),
+        ),
+        migrations.AlterField(
+            model_name='asset',
+            name='depreciation_method',
+            field=models.CharField(choices=[('straight_line', 'Straight Line'), ('declining_balance', 'Double Declining Balance'), ('sum_of_years', "Sum of the Years' Digits"), ('units_of_production', 'Units of Production')], default='straight_line', help_text='Depreciation method', max_length=32),
+        ),
+        migrations.CreateModel(
+            name='DepreciationSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month')),
+                ('book_value', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('depreciation', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('asset', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='depreciation_snapshots', to='assets.asset')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['month'], name='assets_depreciation_month_idx')],
+                'constraints': [models.UniqueConstraint(fields=('asset', 'month'), name='assets_depreciation_asset_month_uniq')],
+            },
+        ),
+    ]
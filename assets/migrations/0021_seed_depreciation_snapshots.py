@@ -0,0 +1,31 @@
+from django.db import migrations
+
+
+def seed_snapshots(apps, schema_editor):
+    # Fill the default window so the chart, exports and reports have values
+    # before the first `manage.py snapshot_depreciation` run
+    from assets import depreciation
+    Asset = apps.get_model('assets', 'Asset')
+    DepreciationSnapshot = apps.get_model('assets', 'DepreciationSnapshot')
+    first_month, months = depreciation.default_window()
+    last_pk = 0
+    while True:
+        chunk = list(Asset.objects.filter(pk__gt=last_pk).order_by('pk').values_list(*depreciation.FIELDS)[:depreciation.SNAPSHOT_CHUNK_SIZE])
+        if not chunk:
+            break
+        DepreciationSnapshot.objects.bulk_create([
+            DepreciationSnapshot(asset_id=row.asset_id, month=row.month, book_value=row.book_value, depreciation=row.depreciation)
+            for row in depreciation.snapshot_rows(depreciation.load(chunk), first_month, months)
+        ], batch_size=2000, ignore_conflicts=True)
+        last_pk = chunk[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0020_depreciation_snapshots'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_snapshots, migrations.RunPython.noop),
+    ]
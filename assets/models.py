@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.contrib.postgres.fields import JSONField
 import uuid
 
@@ -16,6 +17,8 @@ class AssetCategoryField(models.Model):
     label = models.CharField(max_length=100, help_text='Field label (e.g., Serial Number)')
     type = models.CharField(max_length=20, choices=FIELD_TYPES, default='text')
     required = models.BooleanField()
+    indexed = models.BooleanField(default=False, help_text='Keep a typed, indexed copy of this value for fast filtering')
+    index_built_at = models.DateTimeField(null=True, blank=True, editable=False, help_text='Set once existing assets have been backfilled (see backfill_promoted_fields)')
 
     class Meta:
         unique_together = ('category', 'key')
@@ -28,6 +31,14 @@ class AssetCategoryField(models.Model):
 class AssetCategory(models.Model):
     name = models.CharField(max_length=100, unique=True)
     dynamic_fields = models.JSONField(blank=True, default=dict, help_text="JSON schema for dynamic fields (auto-managed)")
+    natural_key = models.CharField(max_length=50, blank=True, help_text="Key of the dynamic field that identifies an asset in this category (e.g. serial_number). Bulk imports update the asset with a matching value instead of adding a duplicate.")
+
+    def clean(self):
+        if self.natural_key and self.pk:
+            from .promoted import duplicate_natural_keys
+            duplicates = duplicate_natural_keys(self.pk, self.natural_key)
+            if duplicates:
+                raise ValidationError({'natural_key': f"Existing assets share values of {self.natural_key}: {', '.join(duplicates[:5])}"})
 
     def __str__(self):
         return self.name
@@ -45,6 +56,7 @@ class Asset(models.Model):
     dynamic_data = models.JSONField(default=dict, blank=True, help_text="Values for dynamic fields")
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active')
     qr_code = models.ImageField(upload_to='qr_codes/', blank=True, null=True)
+    qr_hash = models.CharField(max_length=64, blank=True, editable=False, help_text="SHA-256 of the URL encoded in qr_code (see assets.qr)")
     images = models.ImageField(upload_to='asset_images/', blank=True, null=True)
     documents = models.FileField(upload_to='asset_docs/', blank=True, null=True)
     assigned_to = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
@@ -56,15 +68,134 @@ class Asset(models.Model):
     purchase_date = models.DateField(null=True, blank=True, help_text="Date of purchase/acquisition")
     DEPRECIATION_METHOD_CHOICES = [
         ('straight_line', 'Straight Line'),
-        # Add more methods as needed
+        ('declining_balance', 'Double Declining Balance'),
+        ('sum_of_years', "Sum of the Years' Digits"),
+        ('units_of_production', 'Units of Production'),
     ]
     depreciation_method = models.CharField(max_length=32, choices=DEPRECIATION_METHOD_CHOICES, default='straight_line', help_text="Depreciation method")
     useful_life_years = models.PositiveIntegerField(null=True, blank=True, help_text="Useful life in years for depreciation")
+    salvage_value = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True, help_text="Residual value at the end of the useful life")
+    total_units = models.PositiveIntegerField(null=True, blank=True, help_text="Expected lifetime output, for units of production")
+    units_used = models.PositiveIntegerField(null=True, blank=True, help_text="Output so far, for units of production")
+    # Maintained on save and by the bulk importer (assets.importer)
+    natural_key = models.CharField(max_length=255, null=True, blank=True, editable=False, help_text="Value of the category's natural key field")
+    content_hash = models.CharField(max_length=64, blank=True, editable=False, help_text="Hash of the importable content, to skip unchanged rows on re-import")
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of the asset list (assets.pagination)
+            models.Index(fields=['created_at', 'id'], name='assets_asset_created_id_idx'),
+        ]
+        constraints = [
+            # Conflict target of the bulk import upsert; NULL keys never collide
+            models.UniqueConstraint(fields=['category', 'natural_key'], name='assets_asset_natural_key_uniq'),
+        ]
 
     def __str__(self):
         return f"{self.category.name} Asset #{self.pk}"
 
+class AssetFieldValue(models.Model):
+    """Typed, indexed copy of a promoted dynamic_data key (see assets.promoted)."""
+    asset = models.ForeignKey(Asset, on_delete=models.CASCADE, related_name='field_values')
+    key = models.CharField(max_length=50)
+    text_value = models.CharField(max_length=255, null=True, blank=True)
+    number_value = models.FloatField(null=True, blank=True)
+    date_value = models.DateField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ('asset', 'key')
+        indexes = [
+            models.Index(fields=['key', 'text_value'], name='assets_fv_key_text_idx'),
+            models.Index(fields=['key', 'number_value'], name='assets_fv_key_number_idx'),
+            models.Index(fields=['key', 'date_value'], name='assets_fv_key_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.key} for asset #{self.asset_id}"
+
+class AssetCode(models.Model):
+    """A scannable code that identifies an asset: its UUID, its id or its QR file name (see assets.codes)."""
+    KIND_CHOICES = [
+        ('uuid', 'UUID'),
+        ('file', 'QR file name'),
+        ('id', 'Asset ID'),
+    ]
+    code = models.CharField(max_length=255)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    asset = models.ForeignKey(Asset, on_delete=models.CASCADE, related_name='codes')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['code', 'kind'], name='assets_code_code_kind_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.code} -> asset #{self.asset_id}"
+
+class AssetStat(models.Model):
+    """Number of assets with one category, status and assignee, kept current by deltas (see assets.stats)."""
+    category = models.ForeignKey(AssetCategory, on_delete=models.CASCADE, related_name='stats')
+    status = models.CharField(max_length=20)
+    # Not a foreign key: 0 stands for unassigned, which keeps the combination unique
+    assignee = models.PositiveIntegerField(default=0, help_text='Id of the assigned user, 0 when unassigned')
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['category', 'status', 'assignee'], name='assets_stat_key_uniq'),
+        ]
+        indexes = [
+            # Per-user dashboards
+            models.Index(fields=['assignee'], name='assets_stat_assignee_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.count} {self.status} assets in category #{self.category_id} for user #{self.assignee}"
+
+class DepreciationSnapshot(models.Model):
+    """An asset's book value at the start of a month and its depreciation over that month (see assets.depreciation)."""
+    asset = models.ForeignKey(Asset, on_delete=models.CASCADE, related_name='depreciation_snapshots')
+    month = models.DateField(help_text='First day of the month')
+    book_value = models.DecimalField(max_digits=14, decimal_places=2)
+    depreciation = models.DecimalField(max_digits=14, decimal_places=2)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['asset', 'month'], name='assets_depreciation_asset_month_uniq'),
+        ]
+        indexes = [
+            # Totals per month across assets
+            models.Index(fields=['month'], name='assets_depreciation_month_idx'),
+        ]
+
+    def __str__(self):
+        return f"Asset #{self.asset_id} book value {self.book_value} on {self.month}"
+
+class ScanReceipt(models.Model):
+    """A batch of device scans, kept under its idempotency key so a retried upload is answered from here (see assets.scans)."""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='scan_receipts')
+    key = models.CharField(max_length=255)
+    records = models.PositiveIntegerField(default=0)
+    results = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='assets_scan_receipt_user_key_uniq'),
+        ]
+
+    def __str__(self):
+        return f"Scan batch {self.key} from {self.user} ({self.records} scans)"
+
 class ExportLog(models.Model):
+    """An export or import; background exports also use it as their job record (assets.export_jobs)."""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
     timestamp = models.DateTimeField(auto_now_add=True)
     format = models.CharField(max_length=10)
@@ -72,5 +203,52 @@ class ExportLog(models.Model):
     filters = models.JSONField()
     success = models.BooleanField(default=True)
     error_message = models.TextField(blank=True)
+    # Background job state
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='done')
+    rows_total = models.PositiveIntegerField(null=True, blank=True)
+    rows_done = models.PositiveIntegerField(default=0)
+    file = models.FileField(upload_to='exports/', blank=True)
+    file_size = models.BigIntegerField(null=True, blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    duration = models.DurationField(null=True, blank=True)
+    fingerprint = models.CharField(max_length=64, blank=True, help_text="Hash of format, columns, filters and dataset state; equal fingerprints share the file")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'timestamp'], name='assets_export_status_idx'),
+            models.Index(fields=['fingerprint', 'status'], name='assets_export_fprint_idx'),
+        ]
+
     def __str__(self):
         return f"Export by {self.user} on {self.timestamp:%Y-%m-%d %H:%M} ({self.format})"
+
+class ImportBatch(models.Model):
+    """A parsed bulk-import upload awaiting confirmation; its rows live in ImportRow (see assets.staging)."""
+    token = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='import_batches')
+    category = models.ForeignKey(AssetCategory, on_delete=models.CASCADE, related_name='import_batches')
+    file_name = models.CharField(max_length=255)
+    columns = models.JSONField(default=list)
+    rows_total = models.PositiveIntegerField(default=0)
+    error_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"Import of {self.file_name} by {self.user} ({self.rows_total} rows)"
+
+class ImportRow(models.Model):
+    """One normalized row of an ImportBatch, in sheet order."""
+    batch = models.ForeignKey(ImportBatch, on_delete=models.CASCADE, related_name='rows')
+    position = models.PositiveIntegerField(help_text='0-based index among the staged rows')
+    row_number = models.PositiveIntegerField(help_text='Row number in the uploaded sheet')
+    data = models.JSONField(default=dict)
+    error = models.TextField(blank=True)
+    cell_errors = models.JSONField(default=dict, blank=True, help_text='Validation errors by column')
+
+    class Meta:
+        unique_together = ('batch', 'position')
+
+    def __str__(self):
+        return f"Row {self.row_number} of import {self.batch_id}"
@@ -0,0 +1,153 @@
+"""
+Chunked, parallel PDF export.
+
+Rendering a whole export as one HTML document with a single WeasyPrint
+write_pdf() is single-core and holds the full layout in memory. Instead rows
+are laid out a fixed number per page (cells never wrap, see export_pdf.css),
+so page numbers are known before anything is rendered: page 1 holds
+FIRST_PAGE_ROWS rows under the title block, every later page ROWS_PER_PAGE.
+Pages are grouped into chunks of PAGES_PER_CHUNK, each chunk is rendered to
+PDF in a process pool whose workers parse the stylesheet and fonts once, and
+the chunks are merged in order with pypdf. Every page carries its own
+"Page N of M" label, so numbering is continuous across chunks.
+
+With a single worker, or when the export fits in one chunk, the document is
+rendered in-process in one pass; so is a larger one, with a warning, when
+pypdf (a requirement) is missing.
+"""
+import collections
+import io
+import itertools
+import logging
+import math
+import multiprocessing
+import os
+import pathlib
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.template.loader import render_to_string
+
+try:
+    from pypdf import PdfWriter
+except ImportError:
+    PdfWriter = None
+
+logger = logging.getLogger(__name__)
+
+FIRST_PAGE_ROWS = 22
+ROWS_PER_PAGE = 28
+PAGES_PER_CHUNK = 20
+
+# Per-process WeasyPrint state: stylesheet and fonts parsed once per worker
+_worker = {}
+
+
+def pdf_workers():
+    return getattr(settings, 'PDF_EXPORT_WORKERS', min(4, os.cpu_count() or 1))
+
+
+def page_count(total_rows):
+    if total_rows <= FIRST_PAGE_ROWS:
+        return 1
+    return 1 + math.ceil((total_rows - FIRST_PAGE_ROWS) / ROWS_PER_PAGE)
+
+
+def iter_pages(rows):
+    """Group ``rows`` into numbered pages; page 1 is always produced, even when empty"""
+    rows = iter(rows)
+    yield {'number': 1, 'rows': list(itertools.islice(rows, FIRST_PAGE_ROWS))}
+    for number in itertools.count(2):
+        page = list(itertools.islice(rows, ROWS_PER_PAGE))
+        if not page:
+            return
+        yield {'number': number, 'rows': page}
+
+
+def iter_chunks(rows):
+    pages = iter_pages(rows)
+    while True:
+        chunk = list(itertools.islice(pages, PAGES_PER_CHUNK))
+        if not chunk:
+            return
+        yield chunk
+
+
+def logo_url():
+    path = finders.find('img/logo.png')
+    return pathlib.Path(path).as_uri() if path else ''
+
+
+def init_worker(css_text):
+    from weasyprint import CSS
+    from weasyprint.text.fonts import FontConfiguration
+    font_config = FontConfiguration()
+    _worker['css_text'] = css_text
+    _worker['font_config'] = font_config
+    _worker['stylesheets'] = [CSS(string=css_text, font_config=font_config)]
+
+
+def render_chunk(html_string, target=None):
+    from weasyprint import HTML
+    return HTML(string=html_string).write_pdf(target, stylesheets=_worker['stylesheets'], font_config=_worker['font_config'])
+
+
+def render_pdf(rows, columns, total_rows, target, progress=None):
+    """
+    Write the PDF export of ``rows`` (sequences ordered like ``columns``) to
+    ``target``, a path or binary file. ``total_rows`` sizes the page count.
+    ``progress`` is called with the number of rows rendered so far. Returns
+    the number of rows written.
+    """
+    css_text = render_to_string('assets/export_pdf.css')
+    context = {
+        'columns': columns,
+        'total_pages': page_count(total_rows),
+        'logo_url': logo_url(),
+        'export_date': datetime.now(),
+    }
+    workers = pdf_workers()
+    one_chunk = total_rows <= FIRST_PAGE_ROWS + (PAGES_PER_CHUNK - 1) * ROWS_PER_PAGE
+    if PdfWriter is None and workers > 1 and not one_chunk:
+        logger.warning('pypdf is not installed; rendering the %s row PDF export in one pass', total_rows)
+    if PdfWriter is None or workers <= 1 or one_chunk:
+        if _worker.get('css_text') != css_text:
+            init_worker(css_text)
+        pages = list(iter_pages(rows))
+        render_chunk(render_to_string('assets/export_pdf.html', {**context, 'pages': pages}), target)
+        written = sum(len(page['rows']) for page in pages)
+        if progress:
+            progress(written)
+        return written
+    writer = PdfWriter()
+    written = 0
+    pending = collections.deque()
+
+    def merge_next():
+        nonlocal written
+        future, row_count = pending.popleft()
+        writer.append(io.BytesIO(future.result()))
+        written += row_count
+        if progress:
+            progress(written)
+
+    # Spawned workers: forking a threaded web process is not safe
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=init_worker,
+        initargs=(css_text,),
+    ) as pool:
+        for chunk in iter_chunks(rows):
+            html_string = render_to_string('assets/export_pdf.html', {**context, 'pages': chunk})
+            pending.append((pool.submit(render_chunk, html_string), sum(len(page['rows']) for page in chunk)))
+            # Keep at most two chunks per worker in flight so memory stays bounded
+            while len(pending) >= workers * 2:
+                merge_next()
+        while pending:
+            merge_next()
+    writer.write(target)
+    logger.info('Rendered PDF export: %s rows, %s pages, %s workers', written, len(writer.pages), workers)
+    return written
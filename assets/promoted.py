@@ -0,0 +1,185 @@
+"""
+Promoted dynamic fields.
+
+Dynamic values live in Asset.dynamic_data, which no index can serve. Keys an
+admin marks as ``indexed`` on AssetCategoryField are mirrored into
+AssetFieldValue with one typed column per FIELD_TYPES entry, so list, export
+and dashboard filters can use the (key, value) indexes instead of parsing
+JSON for every row.
+
+A promoted key is only used for filtering once its existing rows have been
+backfilled (``index_built_at`` is set by the backfill_promoted_fields
+command); until then filters keep going through dynamic_data.
+
+A category's ``natural_key`` field is promoted onto Asset.natural_key itself,
+where a unique (category, natural_key) constraint backs the bulk import
+upsert.
+"""
+import collections
+import datetime
+import decimal
+import logging
+
+from django.db import transaction
+from django.db.models import Q
+
+from . import schema
+from .models import Asset, AssetFieldValue
+
+logger = logging.getLogger(__name__)
+
+VALUE_COLUMNS = {
+    'text': 'text_value',
+    'number': 'number_value',
+    'date': 'date_value',
+}
+
+# Keep IN (...) lists well under SQLite's bound-parameter limit
+SYNC_CHUNK_SIZE = 500
+
+
+def coerce_value(field_type, value):
+    """Convert a raw dynamic_data value to its shadow column type (None if empty or invalid)."""
+    if value is None or value == '':
+        return None
+    try:
+        if field_type == 'number':
+            return float(value)
+        if field_type == 'date':
+            if isinstance(value, datetime.datetime):
+                return value.date()
+            if isinstance(value, datetime.date):
+                return value
+            return datetime.date.fromisoformat(str(value)[:10])
+    except (TypeError, ValueError):
+        return None
+    return str(value)[:255]
+
+
+def promoted_type(key, category_id=None):
+    """
+    Return the field type if ``key`` can be filtered through the shadow table.
+
+    With ``category_id`` only that category's definition counts; otherwise the
+    key must be indexed (and backfilled) with the same type in every category
+    that defines it, so no asset is left without a shadow row.
+    """
+    definitions = schema.fields_for_key(key)
+    if category_id:
+        definitions = [f for f in definitions if str(f.category_id) == str(category_id)]
+    if not definitions:
+        return None
+    if any(not f.indexed or f.index_built_at is None for f in definitions):
+        return None
+    types = {f.type for f in definitions}
+    return types.pop() if len(types) == 1 else None
+
+
+def field_q(key, category_id=None, **lookups):
+    """
+    Build a Q filtering ``dynamic_data[key]`` with the given lookups.
+
+    ``lookups`` use ORM lookup names, e.g. ``field_q('location', icontains='HQ')``
+    or ``field_q('warranty_expiry', lte=..., gte=...)``. All lookups apply to
+    the same value. Promoted keys compile to an indexed subquery on
+    AssetFieldValue; other keys fall back to the JSON lookup.
+    """
+    field_type = promoted_type(key, category_id)
+    if field_type is None:
+        return Q(**{
+            f'dynamic_data__{key}' if lookup == 'exact' else f'dynamic_data__{key}__{lookup}': value
+            for lookup, value in lookups.items()
+        })
+    column = VALUE_COLUMNS[field_type]
+    shadow_filters = {}
+    for lookup, value in lookups.items():
+        value = coerce_value(field_type, value)
+        if value is None:
+            # Mirrors JSON behaviour: an unparseable value matches nothing
+            return Q(pk__in=[])
+        shadow_filters[column if lookup == 'exact' else f'{column}__{lookup}'] = value
+    return Q(pk__in=AssetFieldValue.objects.filter(key=key, **shadow_filters).values('asset_id'))
+
+
+def build_rows(assets, fields_by_category):
+    rows = []
+    for asset in assets:
+        data = asset.dynamic_data or {}
+        for field in fields_by_category.get(asset.category_id, ()):
+            value = coerce_value(field.type, data.get(field.key))
+            if value is None:
+                continue
+            rows.append(AssetFieldValue(asset_id=asset.pk, key=field.key, **{VALUE_COLUMNS[field.type]: value}))
+    return rows
+
+
+def sync_assets(assets):
+    """Rewrite the shadow rows of ``assets`` from their dynamic_data. Returns rows written."""
+    assets = [a for a in assets if a.pk]
+    if not assets:
+        return 0
+    fields_by_category = {}
+    for category_id in {a.category_id for a in assets}:
+        fields_by_category[category_id] = [f for f in schema.category_fields(category_id) if f.indexed]
+    written = 0
+    for start in range(0, len(assets), SYNC_CHUNK_SIZE):
+        chunk = assets[start:start + SYNC_CHUNK_SIZE]
+        rows = build_rows(chunk, fields_by_category)
+        with transaction.atomic():
+            AssetFieldValue.objects.filter(asset_id__in=[a.pk for a in chunk]).delete()
+            AssetFieldValue.objects.bulk_create(rows, batch_size=SYNC_CHUNK_SIZE)
+        written += len(rows)
+    return written
+
+
+def drop_key(category_id, key):
+    """Remove shadow rows for ``key`` on every asset of a category."""
+    return AssetFieldValue.objects.filter(asset__category_id=category_id, key=key).delete()[0]
+
+
+def natural_key_value(value):
+    """Normalize a natural key value: integral numbers lose their decimals, text is stripped, blanks are None"""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float, decimal.Decimal)) and value == int(value):
+        return str(int(value))
+    value = str(value).strip()[:255]
+    return value or None
+
+
+def natural_key_for(asset):
+    category = schema.get_category(asset.category_id)
+    if category is None or not category.natural_key:
+        return None
+    return natural_key_value((asset.dynamic_data or {}).get(category.natural_key))
+
+
+def duplicate_natural_keys(category_id, key):
+    """Values of ``key`` held by more than one asset of the category"""
+    counts = collections.Counter(
+        natural_key_value((data or {}).get(key))
+        for data in Asset.objects.filter(category_id=category_id).values_list('dynamic_data', flat=True).iterator()
+    )
+    return sorted(value for value, count in counts.items() if value is not None and count > 1)
+
+
+def refresh_natural_keys(category_id):
+    """Recompute Asset.natural_key for a category after its natural_key field changed. Returns assets updated."""
+    category = schema.get_category(category_id)
+    key = category.natural_key if category else ''
+    with transaction.atomic():
+        # Clear first so values moving between assets never collide mid-update
+        Asset.objects.filter(category_id=category_id).exclude(natural_key=None).update(natural_key=None)
+        if not key:
+            return 0
+        updated = 0
+        pending = []
+        for asset in Asset.objects.filter(category_id=category_id).only('pk', 'dynamic_data').iterator(chunk_size=SYNC_CHUNK_SIZE):
+            asset.natural_key = natural_key_value((asset.dynamic_data or {}).get(key))
+            if asset.natural_key is not None:
+                pending.append(asset)
+            if len(pending) >= SYNC_CHUNK_SIZE:
+                updated += Asset.objects.bulk_update(pending, ['natural_key'])
+                pending = []
+        updated += Asset.objects.bulk_update(pending, ['natural_key'])
+    return updated
@@ -0,0 +1,120 @@
+"""
+Asset QR codes.
+
+Each code encodes the asset's detail URL, ``<base>/assets/<uuid>/``. The
+SHA-256 of that URL is kept on Asset.qr_hash, so bulk regeneration can tell
+which codes are already current and skip them.
+
+Codes are deterministic: the same URL, format, module size and error
+correction level always give the same bytes. The asset_qr view serves them
+on demand from ``cached_render`` (an LRU cache of ASSET_QR_CACHE_SIZE
+entries) with a strong ETag computed from those inputs and an immutable
+Cache-Control, so storing a PNG per asset under qr_codes/ is optional
+(ASSET_QR_STORE_FILES).
+
+Rendering a code is pure CPU work (about 10 ms per PNG), so ``renderer``
+spreads bulk regeneration over a process pool. The workers only run
+``render_job``; they touch neither the database nor storage, which stay in
+the calling process.
+"""
+import contextlib
+import functools
+import hashlib
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+import qrcode
+import qrcode.image.svg
+from django.conf import settings
+
+# Base URL encoded in QR codes; empty means the current request's host
+QR_BASE_URL = getattr(settings, 'ASSET_QR_BASE_URL', '')
+# Also keep a PNG per asset in media storage (qr_codes/)
+STORE_FILES = getattr(settings, 'ASSET_QR_STORE_FILES', True)
+# Rendered codes kept in memory per process
+QR_CACHE_SIZE = getattr(settings, 'ASSET_QR_CACHE_SIZE', 1024)
+# Jobs handed to a worker at a time
+POOL_CHUNK_SIZE = 64
+# Bump when rendering changes, so ETags change with it
+RENDER_VERSION = 1
+# Served codes never change for a given URL: let browsers keep them a year
+CACHE_MAX_AGE = 365 * 24 * 3600
+
+CONTENT_TYPES = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+}
+ERROR_CORRECTION = {
+    'L': qrcode.constants.ERROR_CORRECT_L,
+    'M': qrcode.constants.ERROR_CORRECT_M,
+    'Q': qrcode.constants.ERROR_CORRECT_Q,
+    'H': qrcode.constants.ERROR_CORRECT_H,
+}
+# Pixels per module; the defaults match qrcode.make()
+DEFAULT_BOX_SIZE = 10
+MAX_BOX_SIZE = 40
+DEFAULT_ERROR_CORRECTION = 'M'
+
+
+def asset_url(base_url, uuid):
+    return f"{base_url.rstrip('/')}/assets/{uuid}/"
+
+
+def url_hash(url):
+    return hashlib.sha256(url.encode()).hexdigest()
+
+
+def file_name(uuid):
+    return f"asset_{uuid}.png"
+
+
+def render(url, format='png', box_size=DEFAULT_BOX_SIZE, error_correction=DEFAULT_ERROR_CORRECTION):
+    code = qrcode.QRCode(box_size=box_size, border=4, error_correction=ERROR_CORRECTION[error_correction])
+    code.add_data(url)
+    code.make(fit=True)
+    buffer = BytesIO()
+    if format == 'svg':
+        code.make_image(image_factory=qrcode.image.svg.SvgPathImage).save(buffer)
+    else:
+        code.make_image().save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+cached_render = functools.lru_cache(maxsize=QR_CACHE_SIZE)(render)
+
+
+def render_png(url):
+    return render(url)
+
+
+def etag(url, format, box_size, error_correction):
+    """Strong ETag of a rendering, known without rendering it"""
+    key = f'{RENDER_VERSION}|{url}|{format}|{box_size}|{error_correction}'
+    return '"%s"' % hashlib.sha256(key.encode()).hexdigest()[:32]
+
+
+def render_job(job):
+    """(key, url) -> (key, url hash, PNG bytes); runs in pool workers"""
+    key, url = job
+    return key, url_hash(url), render_png(url)
+
+
+@contextlib.contextmanager
+def renderer(workers):
+    """
+    Yield a function that renders a list of (key, url) jobs into render_job
+    results, in order, using ``workers`` processes. One pool serves every
+    call, so callers can feed it chunk by chunk.
+    """
+    if workers <= 1:
+        yield lambda jobs: [render_job(job) for job in jobs]
+        return
+    # Spawned workers, as for PDF exports (assets.pdf): forking a process with threads is not safe
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        yield lambda jobs: list(pool.map(render_job, jobs, chunksize=POOL_CHUNK_SIZE))
+
+
+def default_workers():
+    return os.cpu_count() or 1
@@ -0,0 +1,131 @@
+"""
+Batch scan ingestion.
+
+Hardware scanners and offline devices buffer scans and upload them together
+to ``asset_scan_batch`` as ``{code, scanned_at, device}`` records. A batch
+is resolved with one set-based lookup (codes.resolve_many) and its scan
+audit entries are written with a single bulk insert, stamped with the time
+each code was scanned rather than the time of the upload.
+
+Every batch carries an idempotency key chosen by the device. The per-code
+results are stored under it in ScanReceipt, in the same transaction as the
+audit entries, so a retried upload gets the original results back and is
+not counted twice. Receipts expire after SCAN_RECEIPT_TTL seconds and are
+purged whenever a new batch is recorded.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from audit.models import AuditLog
+from audit.utils import SCAN_ACTION
+
+from . import codes, events
+from .models import ScanReceipt
+
+logger = logging.getLogger(__name__)
+
+SCAN_BATCH_MAX = getattr(settings, 'SCAN_BATCH_MAX', 1000)
+SCAN_RECEIPT_TTL = getattr(settings, 'SCAN_RECEIPT_TTL', 7 * 86400)
+MAX_KEY_LENGTH = 255
+MAX_DEVICE_LENGTH = 100
+
+
+def scan_time(value, now):
+    """Parse a record's ``scanned_at``; missing means now, and times in the future are clamped to now"""
+    if not value:
+        return now
+    try:
+        scanned_at = parse_datetime(str(value))
+    except ValueError:
+        scanned_at = None
+    if scanned_at is None:
+        raise ValueError('scanned_at must be an ISO 8601 date and time')
+    if timezone.is_naive(scanned_at):
+        scanned_at = timezone.make_aware(scanned_at)
+    return min(scanned_at, now)
+
+
+def parse_records(records):
+    """
+    Validate uploaded records. Returns a list with, per record, either
+    (code, scanned_at, device) or an error message.
+    """
+    if not isinstance(records, list):
+        raise ValueError('scans must be a list')
+    if len(records) > SCAN_BATCH_MAX:
+        raise ValueError(f'At most {SCAN_BATCH_MAX} scans per batch')
+    now = timezone.now()
+    parsed = []
+    for record in records:
+        if not isinstance(record, dict) or not isinstance(record.get('code'), str) or not record['code'].strip():
+            parsed.append('code is required')
+            continue
+        try:
+            scanned_at = scan_time(record.get('scanned_at'), now)
+        except ValueError as e:
+            parsed.append(str(e))
+            continue
+        parsed.append((record['code'], scanned_at, str(record.get('device') or '')[:MAX_DEVICE_LENGTH]))
+    return parsed
+
+
+def find_receipt(user, key):
+    return ScanReceipt.objects.filter(user=user, key=key, expires_at__gt=timezone.now()).first()
+
+
+def ingest(user, key, records):
+    """
+    Record a batch of scans for ``user`` under idempotency ``key``. Returns
+    (results, replayed): one result per record, in order, and whether they
+    come from an earlier upload with the same key.
+    """
+    receipt = find_receipt(user, key)
+    if receipt is not None:
+        return receipt.results, True
+    parsed = parse_records(records)
+    found = codes.resolve_many(record[0] for record in parsed if isinstance(record, tuple))
+    results, audit_rows = [], []
+    for record in parsed:
+        if not isinstance(record, tuple):
+            results.append({'success': False, 'error': record})
+            continue
+        code, scanned_at, device = record
+        asset_id = found.get(code)
+        if asset_id is None:
+            results.append({'code': code, 'success': False, 'error': 'Unknown code'})
+            continue
+        results.append({'code': code, 'success': True, 'asset_id': asset_id})
+        audit_rows.append(AuditLog(
+            user=user, action=SCAN_ACTION, asset_id=asset_id, timestamp=scanned_at,
+            details=f'QR code scanned: {code}',
+            metadata={'device': device, 'batch': key, 'scanned_at': scanned_at.isoformat()},
+        ))
+    now = timezone.now()
+    try:
+        with transaction.atomic():
+            purge_expired()
+            # Inserted first: a concurrent upload with the same key waits here, then fails on the constraint
+            ScanReceipt.objects.create(
+                user=user, key=key, records=len(results), results=results,
+                expires_at=now + timedelta(seconds=SCAN_RECEIPT_TTL),
+            )
+            AuditLog.objects.bulk_create(audit_rows)
+            events.publish_audit(audit_rows)
+    except IntegrityError:
+        receipt = find_receipt(user, key)
+        if receipt is None:
+            raise
+        return receipt.results, True
+    logger.info('Scan batch %s from %s: %s scans, %s recorded', key, user, len(results), len(audit_rows))
+    return results, False
+
+
+def purge_expired():
+    """Delete expired receipts. Returns how many."""
+    _, deleted = ScanReceipt.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted.get(ScanReceipt._meta.label, 0)
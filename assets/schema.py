@@ -0,0 +1,140 @@
+"""
+Category schema registry.
+
+The asset list, forms, admin form, export, importer and the promoted-field and
+search helpers all need the same few things: the category list, each
+category's dynamic fields, and the de-duplicated union of fields across
+categories. Instead of querying AssetCategory/AssetCategoryField on every use,
+they read a per-process snapshot built from two queries.
+
+Snapshots are tagged with a schema version token kept in the 'shared' cache
+(CACHES), which every worker reads. Signal handlers (assets.signals) call
+``invalidate()`` on every category or field write -- the field APIs, the
+admin and anything else going through the ORM -- which drops this process's
+snapshot and issues a new token, again once the transaction commits. Every
+other worker sees the new token on its next lookup and rebuilds.
+``SCHEMA_REGISTRY_TTL`` (seconds) bounds how long a snapshot is trusted
+regardless, for writes that bypass signals such as queryset.update().
+"""
+import logging
+import threading
+import time
+import uuid
+from typing import NamedTuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from .models import AssetCategory, AssetCategoryField
+
+logger = logging.getLogger(__name__)
+
+VERSION_CACHE_KEY = 'assets:schema_version'
+SCHEMA_REGISTRY_TTL = getattr(settings, 'SCHEMA_REGISTRY_TTL', 300)
+
+
+class SchemaField(NamedTuple):
+    """Read-only copy of an AssetCategoryField row"""
+    id: int
+    category_id: int
+    key: str
+    label: str
+    type: str
+    required: bool
+    indexed: bool
+    index_built_at: object
+
+
+class Snapshot:
+
+    def __init__(self, version):
+        self.version = version
+        self.built_at = time.monotonic()
+        self.categories = list(AssetCategory.objects.order_by('name'))
+        self.categories_by_id = {c.pk: c for c in self.categories}
+        self.fields_by_category = {}
+        self.fields_by_key = {}
+        self.union = []
+        seen = set()
+        for row in AssetCategoryField.objects.order_by('id').values_list(*SchemaField._fields):
+            field = SchemaField(*row)
+            self.fields_by_category.setdefault(field.category_id, []).append(field)
+            self.fields_by_key.setdefault(field.key, []).append(field)
+            # Same key and label in several categories is shown once
+            dedup_key = (field.key.lower().strip(), field.label.lower().strip())
+            if dedup_key not in seen:
+                seen.add(dedup_key)
+                self.union.append(field)
+
+
+_local = {'snapshot': None}
+_lock = threading.Lock()
+
+
+def schema_version():
+    """The current schema version token (shared through the cache)"""
+    version = caches['shared'].get(VERSION_CACHE_KEY)
+    if version is None:
+        # First use, or the key was evicted: start a new version
+        caches['shared'].add(VERSION_CACHE_KEY, uuid.uuid4().hex, timeout=None)
+        version = caches['shared'].get(VERSION_CACHE_KEY)
+    return version
+
+
+def _bump_version():
+    caches['shared'].set(VERSION_CACHE_KEY, uuid.uuid4().hex, timeout=None)
+
+
+def invalidate():
+    """Drop cached schemas here and, through the version token, in every worker"""
+    _local['snapshot'] = None
+    _bump_version()
+    # Workers that rebuilt before the commit would otherwise keep pre-commit rows
+    transaction.on_commit(_bump_version)
+
+
+def snapshot():
+    version = schema_version()
+    current = _local['snapshot']
+    if current is not None and current.version == version and time.monotonic() - current.built_at < SCHEMA_REGISTRY_TTL:
+        return current
+    with _lock:
+        current = _local['snapshot']
+        if current is None or current.version != version or time.monotonic() - current.built_at >= SCHEMA_REGISTRY_TTL:
+            current = Snapshot(version)
+            _local['snapshot'] = current
+            logger.debug('Rebuilt asset schema registry (version %s)', version)
+    return current
+
+
+def _category_id(category_id):
+    try:
+        return int(category_id)
+    except (TypeError, ValueError):
+        return None
+
+
+def categories():
+    """All categories, ordered by name"""
+    return list(snapshot().categories)
+
+
+def get_category(category_id):
+    """The category with this id (accepts query-string values), or None"""
+    return snapshot().categories_by_id.get(_category_id(category_id))
+
+
+def category_fields(category_id):
+    """Dynamic fields of one category, in definition order"""
+    return list(snapshot().fields_by_category.get(_category_id(category_id), ()))
+
+
+def all_fields():
+    """Union of dynamic fields across categories, de-duplicated by key and label (case-insensitive)"""
+    return list(snapshot().union)
+
+
+def fields_for_key(key):
+    """Every category's definition of ``key``"""
+    return list(snapshot().fields_by_key.get(key, ()))
@@ -0,0 +1,202 @@
+"""
+Full-text search over assets.
+
+The list/export ``search`` box used to compile to leading-wildcard LIKE
+predicates over dynamic_data. Each asset now has a search document built from
+its description, its text-typed dynamic fields and its category name, kept in
+a full-text index named ``assets_search``:
+
+* SQLite: an FTS5 virtual table (rowid = asset id), ranked with bm25()
+* PostgreSQL: a tsvector column with a GIN index, ranked with ts_rank()
+* other backends, or SQLite builds without FTS5: the previous icontains filter
+
+Every search term is matched as a prefix, and all terms must match. The index
+is updated by signals (assets.signals) and can be rebuilt or refreshed
+incrementally with the rebuild_search_index management command.
+"""
+import logging
+import re
+
+from django.db import connection, transaction
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from . import schema
+from .models import Asset
+from .promoted import field_q
+
+logger = logging.getLogger(__name__)
+
+SEARCH_TABLE = 'assets_search'
+INDEX_CHUNK_SIZE = 500
+
+_backends = {}
+
+
+def tokenize(query):
+    return re.findall(r'\w+', (query or '').lower())
+
+
+class FallbackBackend:
+    """No full-text index available: keep the original LIKE-based search"""
+    name = 'fallback'
+
+    def index(self, rows):
+        pass
+
+    def remove(self, asset_ids):
+        pass
+
+    def clear(self):
+        pass
+
+    def search(self, qs, query):
+        return qs.filter(
+            field_q('name', icontains=query) |
+            field_q('model', icontains=query) |
+            Q(description__icontains=query)
+        )
+
+
+class SQLiteFTSBackend(FallbackBackend):
+    name = 'sqlite_fts5'
+
+    def index(self, rows):
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', [(pk,) for pk, _ in rows])
+            cursor.executemany(f'INSERT INTO {SEARCH_TABLE} (rowid, document) VALUES (%s, %s)', rows)
+
+    def remove(self, asset_ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', [(pk,) for pk in asset_ids])
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+
+    def search(self, qs, query):
+        terms = tokenize(query)
+        if not terms:
+            return super().search(qs, query)
+        match = ' '.join(f'"{term}"*' for term in terms)
+        table = Asset._meta.db_table
+        return qs.filter(
+            pk__in=RawSQL(f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s', [match])
+        ).annotate(
+            # bm25() is negative; lower is a better match
+            search_rank=RawSQL(
+                f'SELECT bm25({SEARCH_TABLE}) FROM {SEARCH_TABLE} '
+                f'WHERE {SEARCH_TABLE} MATCH %s AND rowid = "{table}"."id"',
+                [match],
+            )
+        )
+
+
+class PostgresFTSBackend(FallbackBackend):
+    name = 'postgres_tsvector'
+
+    def index(self, rows):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {SEARCH_TABLE} (asset_id, document) VALUES (%s, to_tsvector('simple', %s)) "
+                f"ON CONFLICT (asset_id) DO UPDATE SET document = EXCLUDED.document",
+                rows,
+            )
+
+    def remove(self, asset_ids):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE asset_id = ANY(%s)', [list(asset_ids)])
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'TRUNCATE {SEARCH_TABLE}')
+
+    def search(self, qs, query):
+        terms = tokenize(query)
+        if not terms:
+            return super().search(qs, query)
+        tsquery = ' & '.join(f'{term}:*' for term in terms)
+        table = Asset._meta.db_table
+        return qs.filter(
+            pk__in=RawSQL(
+                f"SELECT asset_id FROM {SEARCH_TABLE} WHERE document @@ to_tsquery('simple', %s)", [tsquery]
+            )
+        ).annotate(
+            # Negated so that, as with bm25(), ascending order puts the best match first
+            search_rank=RawSQL(
+                f"SELECT -ts_rank(document, to_tsquery('simple', %s)) FROM {SEARCH_TABLE} "
+                f'WHERE asset_id = "{table}"."id"',
+                [tsquery],
+            )
+        )
+
+
+def get_backend():
+    """Pick the search backend for the default database (cached per database name)"""
+    db_name = str(connection.settings_dict.get('NAME'))
+    backend = _backends.get(db_name)
+    if backend is None:
+        backend = FallbackBackend()
+        if SEARCH_TABLE in connection.introspection.table_names():
+            if connection.vendor == 'sqlite':
+                backend = SQLiteFTSBackend()
+            elif connection.vendor == 'postgresql':
+                backend = PostgresFTSBackend()
+        _backends[db_name] = backend
+    return backend
+
+
+def build_document(asset, text_keys):
+    parts = [asset.category.name if asset.category_id else '', asset.description or '']
+    data = asset.dynamic_data or {}
+    for key in text_keys:
+        value = data.get(key)
+        if value not in (None, ''):
+            parts.append(str(value))
+    return ' '.join(p for p in parts if p)
+
+
+def index_assets(assets):
+    """(Re)index ``assets``; they should come with select_related('category')."""
+    backend = get_backend()
+    if backend.name == FallbackBackend.name:
+        return 0
+    assets = [a for a in assets if a.pk]
+    text_keys = {
+        category_id: [f.key for f in schema.category_fields(category_id) if f.type == 'text']
+        for category_id in {a.category_id for a in assets}
+    }
+    for start in range(0, len(assets), INDEX_CHUNK_SIZE):
+        chunk = assets[start:start + INDEX_CHUNK_SIZE]
+        rows = [(a.pk, build_document(a, text_keys.get(a.category_id, ()))) for a in chunk]
+        with transaction.atomic():
+            backend.index(rows)
+    return len(assets)
+
+
+def index_queryset(qs, batch_size=INDEX_CHUNK_SIZE):
+    """Index every asset in ``qs``, walking it by primary key in batches"""
+    qs = qs.select_related('category').order_by('pk')
+    last_pk = 0
+    total = 0
+    while True:
+        batch = list(qs.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            return total
+        total += index_assets(batch)
+        last_pk = batch[-1].pk
+
+
+def remove_assets(asset_ids):
+    get_backend().remove(list(asset_ids))
+
+
+def rebuild_index(batch_size=INDEX_CHUNK_SIZE):
+    backend = get_backend()
+    backend.clear()
+    return index_queryset(Asset.objects.all(), batch_size=batch_size)
+
+
+def search_assets(qs, query):
+    """Filter ``qs`` to assets matching ``query``, annotated with ``search_rank`` when indexed"""
+    return get_backend().search(qs, query)
@@ -0,0 +1,210 @@
+from django.conf import settings
+from django.db.models.signals import post_save, pre_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from .models import Asset, AssetCategory, AssetCategoryField
+from . import codes, dashboard, depreciation, events, importer, promoted, schema, search, stats
+from audit.buffer import audit_flushed
+from audit.models import AuditLog
+from users.models import UserSession
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Registered first so the handlers below already see the new schema
+@receiver(post_save, sender=AssetCategory)
+@receiver(post_delete, sender=AssetCategory)
+@receiver(post_save, sender=AssetCategoryField)
+@receiver(post_delete, sender=AssetCategoryField)
+def invalidate_schema_registry(sender, **kwargs):
+    schema.invalidate()
+
+@receiver(pre_save, sender=Asset)
+def set_import_keys(sender, instance, raw=False, **kwargs):
+    """Natural key and content hash, as the bulk importer matches and compares them"""
+    if raw:
+        return
+    instance.natural_key = promoted.natural_key_for(instance)
+    instance.content_hash = importer.content_hash(instance)
+
+@receiver(post_save, sender=Asset)
+def sync_promoted_fields(sender, instance, raw=False, **kwargs):
+    """Keep the indexed shadow of promoted dynamic fields in step with dynamic_data"""
+    if raw:
+        return
+    promoted.sync_assets([instance])
+
+@receiver(post_save, sender=Asset)
+def index_asset_for_search(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    search.index_assets([instance])
+
+@receiver(post_delete, sender=Asset)
+def remove_asset_from_search(sender, instance, **kwargs):
+    search.remove_assets([instance.pk])
+
+@receiver(post_save, sender=Asset)
+def sync_scan_codes(sender, instance, raw=False, **kwargs):
+    """Keep the scan lookup table and cached scan payloads in step with the asset"""
+    if raw:
+        return
+    codes.sync_assets([instance])
+
+@receiver(post_delete, sender=Asset)
+def forget_scan_codes(sender, instance, **kwargs):
+    codes.forget_asset(instance)
+
+@receiver(pre_save, sender=Asset)
+def remember_previous_state(sender, instance, raw=False, **kwargs):
+    """The statistics key and depreciation inputs the stored row had"""
+    instance._previous_stat_key = instance._previous_depreciation = None
+    if not raw and instance.pk:
+        previous = Asset.objects.filter(pk=instance.pk).values_list('category_id', 'status', 'assigned_to_id', *depreciation.INPUT_FIELDS).first()
+        if previous:
+            instance._previous_stat_key = (previous[0], previous[1], previous[2] or 0)
+            instance._previous_depreciation = tuple(previous[3:])
+
+@receiver(post_save, sender=Asset)
+def count_saved_asset(sender, instance, raw=False, **kwargs):
+    """Move the asset between dashboard statistics rows"""
+    if raw:
+        return
+    previous = getattr(instance, '_previous_stat_key', None)
+    current = stats.stat_key(instance)
+    if previous != current:
+        stats.apply(stats.moved(previous, current))
+
+@receiver(post_delete, sender=Asset)
+def count_deleted_asset(sender, instance, **kwargs):
+    stats.apply(stats.moved(stats.stat_key(instance), None))
+
+@receiver(post_save, sender=Asset)
+def refresh_depreciation_snapshots(sender, instance, created=False, raw=False, **kwargs):
+    """Recompute the asset's stored book values when its depreciation inputs change"""
+    if raw:
+        return
+    current = tuple(getattr(instance, field) for field in depreciation.INPUT_FIELDS)
+    previous = getattr(instance, '_previous_depreciation', None)
+    if created and not depreciation.is_depreciable((instance.pk,) + current):
+        return
+    if previous != current:
+        depreciation.snapshot(asset_ids=[instance.pk])
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def unassign_deleted_user_stats(sender, instance, **kwargs):
+    stats.merge_assignee(instance.pk)
+    dashboard.invalidate()
+
+@receiver(post_save, sender=Asset)
+@receiver(post_delete, sender=Asset)
+@receiver(post_save, sender=AssetCategory)
+@receiver(post_delete, sender=AssetCategory)
+def invalidate_dashboards(sender, raw=False, **kwargs):
+    if not raw:
+        dashboard.invalidate()
+
+@receiver(post_save, sender=Asset)
+def publish_saved_asset(sender, instance, raw=False, **kwargs):
+    """Push the asset's move between categories, statuses and assignees to open dashboards"""
+    if raw:
+        return
+    previous = getattr(instance, '_previous_stat_key', None)
+    current = stats.stat_key(instance)
+    names = {instance.category_id: instance.category.name}
+    if previous and previous[0] not in names:
+        names[previous[0]] = AssetCategory.objects.filter(pk=previous[0]).values_list('name', flat=True).first()
+    events.publish_asset(
+        instance.pk,
+        events.asset_state(names[previous[0]], *previous[1:]) if previous else None,
+        events.asset_state(names[current[0]], *current[1:]),
+    )
+
+@receiver(post_delete, sender=Asset)
+def publish_deleted_asset(sender, instance, **kwargs):
+    category = AssetCategory.objects.filter(pk=instance.category_id).values_list('name', flat=True).first()
+    events.publish_asset(instance.pk, events.asset_state(category, instance.status, instance.assigned_to_id), None)
+
+@receiver(post_save, sender=AssetCategory)
+@receiver(post_delete, sender=AssetCategory)
+def publish_category_change(sender, raw=False, **kwargs):
+    if not raw:
+        events.publish('refresh', {})
+
+@receiver(post_save, sender=AuditLog)
+def publish_audit_entry(sender, instance, created=False, raw=False, **kwargs):
+    if created and not raw:
+        events.publish_audit([instance])
+
+@receiver(audit_flushed)
+def publish_buffered_audit_entries(sender, logs, **kwargs):
+    events.publish_audit(logs)
+
+@receiver(post_save, sender=UserSession)
+def publish_ended_session(sender, instance, raw=False, **kwargs):
+    """Close the session's event streams; sessions ended with a queryset update are noticed on keepalive"""
+    if not raw and not instance.is_active:
+        events.publish('session', {'session': instance.pk, 'active': False, 'reason': instance.logout_reason}, users={instance.user_id}, staff=False)
+
+@receiver(pre_save, sender=AssetCategory)
+def remember_category_name(sender, instance, raw=False, **kwargs):
+    instance._previous_name = instance._previous_natural_key = None
+    if not raw and instance.pk:
+        previous = AssetCategory.objects.filter(pk=instance.pk).values('name', 'natural_key').first()
+        if previous:
+            instance._previous_name = previous['name']
+            instance._previous_natural_key = previous['natural_key']
+
+@receiver(post_save, sender=AssetCategory)
+def reindex_renamed_category(sender, instance, created=False, raw=False, **kwargs):
+    """Category names are part of every search document in the category"""
+    if raw or created or getattr(instance, '_previous_name', None) in (None, instance.name):
+        return
+    search.index_queryset(Asset.objects.filter(category=instance))
+
+@receiver(post_save, sender=AssetCategory)
+def refresh_natural_keys(sender, instance, created=False, raw=False, **kwargs):
+    if raw or created or getattr(instance, '_previous_natural_key', None) in (None, instance.natural_key):
+        return
+    promoted.refresh_natural_keys(instance.pk)
+
+@receiver(pre_save, sender=AssetCategoryField)
+def reset_promoted_index(sender, instance, raw=False, **kwargs):
+    """A newly indexed, retyped or renamed field needs a backfill before filters can trust it"""
+    instance._previous = None
+    if raw:
+        return
+    if instance.pk:
+        instance._previous = AssetCategoryField.objects.filter(pk=instance.pk).values('indexed', 'type', 'key', 'index_built_at').first()
+    previous = instance._previous
+    if not instance.indexed:
+        instance.index_built_at = None
+    elif previous and previous['indexed'] and previous['type'] == instance.type and previous['key'] == instance.key:
+        instance.index_built_at = previous['index_built_at']
+    elif not Asset.objects.filter(category_id=instance.category_id).exists():
+        # Nothing to backfill in an empty category
+        instance.index_built_at = timezone.now()
+    else:
+        instance.index_built_at = None
+
+@receiver(post_save, sender=AssetCategoryField)
+def refresh_field_indexes(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # Unindexed or retyped fields lose their shadow rows; backfill rebuilds them
+    if not instance.indexed or instance.index_built_at is None:
+        promoted.drop_key(instance.category_id, instance.key)
+    # A renamed field's rows are stored under the old key
+    previous = getattr(instance, '_previous', None)
+    if previous is not None and previous['key'] != instance.key:
+        promoted.drop_key(instance.category_id, previous['key'])
+    # Text-typed fields feed the search documents of their category
+    was_text = previous is not None and previous['type'] == 'text'
+    if was_text != (instance.type == 'text'):
+        search.index_queryset(Asset.objects.filter(category_id=instance.category_id))
+
+@receiver(post_delete, sender=AssetCategoryField)
+def drop_deleted_field_values(sender, instance, **kwargs):
+    promoted.drop_key(instance.category_id, instance.key)
+    if instance.type == 'text':
+        search.index_queryset(Asset.objects.filter(category_id=instance.category_id))
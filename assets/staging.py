@@ -0,0 +1,165 @@
+"""
+Bulk-import staging.
+
+An upload is parsed exactly once, when it is previewed: an .xlsx workbook is
+read row by row in openpyxl's read_only mode, a .csv file through a streaming
+csv reader. Blank rows are dropped, and the rest are validated and coerced a
+chunk at a time by assets.validation, then written to ImportRow under an
+ImportBatch identified by a random token, each with its per-cell errors. The
+preview pages through the staged rows and the confirm step imports straight
+from them; the upload itself is never stored.
+
+Staged batches expire after IMPORT_STAGING_TTL seconds. ``purge_expired``
+removes them together with leftover files under tmp/ in media storage; it
+runs whenever a new upload is staged and from ``manage.py
+purge_import_staging``.
+"""
+import contextlib
+import csv
+import io
+import itertools
+import logging
+from datetime import timedelta
+
+import openpyxl
+import pandas as pd
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from . import schema, validation
+from .models import ImportBatch, ImportRow
+
+logger = logging.getLogger(__name__)
+
+IMPORT_STAGING_TTL = getattr(settings, 'IMPORT_STAGING_TTL', 86400)
+STAGE_CHUNK_SIZE = 1000
+PREVIEW_PAGE_SIZE = 50
+# Preview lists at most this many row errors
+PREVIEW_ERROR_LIMIT = 100
+UPLOAD_DIR = 'tmp'
+
+
+def is_blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+@contextlib.contextmanager
+def open_upload(upload):
+    """Iterate the rows (tuples of cell values) of an .xlsx or .csv upload, header first"""
+    if getattr(upload, 'name', '').lower().endswith('.csv'):
+        text = io.TextIOWrapper(upload, encoding='utf-8-sig', newline='')
+        try:
+            yield csv.reader(text)
+        finally:
+            # Leave the upload itself open for its owner
+            text.detach()
+    else:
+        workbook = openpyxl.load_workbook(upload, read_only=True, data_only=True)
+        try:
+            yield workbook.active.iter_rows(values_only=True)
+        finally:
+            workbook.close()
+
+
+def stage_upload(user, category_id, upload, key=None):
+    """
+    Parse ``upload`` into a new ImportBatch and return it. ``key`` names a
+    column whose values must be unique within the upload.
+    """
+    category = schema.get_category(category_id)
+    if category is None:
+        raise ValueError('Unknown category')
+    fields = schema.category_fields(category.pk)
+    with open_upload(upload) as sheet_rows:
+        header = next(sheet_rows, None)
+        if not header:
+            raise ValueError('The file has no header row')
+        # Named columns, first occurrence of each name
+        positions = {}
+        for index, name in enumerate(header):
+            name = str(name).strip() if name is not None else ''
+            if name and name not in positions:
+                positions[name] = index
+        columns = list(positions)
+        if key and key not in positions:
+            raise ValueError(f'The file needs a {key} column to match existing assets')
+        rows = (
+            (row_number, [values[i] if i < len(values) else None for i in positions.values()])
+            for row_number, values in enumerate(sheet_rows, 2)
+            if not all(is_blank(value) for value in values)
+        )
+        with transaction.atomic():
+            batch = ImportBatch.objects.create(
+                user=user,
+                category=category,
+                file_name=getattr(upload, 'name', '')[:255],
+                columns=columns,
+                expires_at=timezone.now() + timedelta(seconds=IMPORT_STAGING_TTL),
+            )
+            seen_keys = set()
+            position = error_count = 0
+            while True:
+                chunk = list(itertools.islice(rows, STAGE_CHUNK_SIZE))
+                if not chunk:
+                    break
+                frame = pd.DataFrame([values for _, values in chunk], columns=columns, dtype=object)
+                values, errors = validation.validate_frame(frame, fields, key=key, seen_keys=seen_keys)
+                staged = []
+                for (row_number, _), data, cell_errors in zip(chunk, values.to_dict('records'), validation.row_errors(errors)):
+                    error = '; '.join(cell_errors.values())
+                    error_count += bool(error)
+                    staged.append(ImportRow(
+                        batch=batch, position=position, row_number=row_number,
+                        data=data, error=error, cell_errors=cell_errors,
+                    ))
+                    position += 1
+                ImportRow.objects.bulk_create(staged)
+            batch.rows_total = position
+            batch.error_count = error_count
+            batch.save(update_fields=['rows_total', 'error_count'])
+    logger.info('Staged import %s: %s rows, %s with errors', batch.token, batch.rows_total, batch.error_count)
+    return batch
+
+
+def get_batch(token, user):
+    """The user's unexpired batch for ``token``, or None"""
+    try:
+        return ImportBatch.objects.select_related('category').get(token=token, user=user, expires_at__gt=timezone.now())
+    except (ImportBatch.DoesNotExist, ValidationError, ValueError):
+        return None
+
+
+def error_messages(batch, limit=PREVIEW_ERROR_LIMIT):
+    rows = batch.rows.exclude(error='').order_by('position').values_list('row_number', 'error')[:limit]
+    return [f'Row {row_number}: {error}' for row_number, error in rows]
+
+
+def iter_staged(batch, start=0):
+    """(row number, row dict, validation error) triples of ``batch`` from position ``start`` on, read in chunks"""
+    rows = batch.rows.filter(position__gte=start).order_by('position').values_list('row_number', 'data', 'error')
+    yield from rows.iterator(chunk_size=STAGE_CHUNK_SIZE)
+
+
+def purge_expired():
+    """Delete expired batches and tmp/ uploads older than the staging TTL. Returns (batches, files)."""
+    now = timezone.now()
+    _, deleted = ImportBatch.objects.filter(expires_at__lte=now).delete()
+    batches = deleted.get(ImportBatch._meta.label, 0)
+    cutoff = now - timedelta(seconds=IMPORT_STAGING_TTL)
+    files = 0
+    try:
+        _, names = default_storage.listdir(UPLOAD_DIR)
+    except (FileNotFoundError, NotImplementedError):
+        names = []
+    for name in names:
+        path = f'{UPLOAD_DIR}/{name}'
+        try:
+            if default_storage.get_modified_time(path) < cutoff:
+                default_storage.delete(path)
+                files += 1
+        except (FileNotFoundError, NotImplementedError):
+            continue
+    return batches, files
@@ -0,0 +1,125 @@
+"""
+Asset statistics for the dashboards.
+
+AssetStat holds the number of assets for every (category, status, assignee)
+combination that has any, so the dashboard KPIs and the settings dashboard
+totals are sums over a handful of rows instead of scans of the asset table.
+
+The counts are kept current by deltas: saving or deleting an asset moves it
+between combinations (assets.signals), and the bulk importer, which bypasses
+signals, applies one delta per combination for each batch in the batch's own
+transaction. A delta updates its row in place, so concurrent writers only
+serialize on the row they touch. Writes that bypass both (queryset updates,
+raw SQL, users deleted while assets were assigned to them) can leave the table
+off; ``manage.py recompute_asset_stats`` rebuilds it from the asset table and
+reports what it corrected, and is meant to run periodically.
+"""
+import logging
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce
+
+from .models import Asset, AssetCategory, AssetStat
+
+logger = logging.getLogger(__name__)
+
+# KPI name for each status count, e.g. 'active_assets'
+STATUS_KPIS = {value: f'{value}_assets' for value, _ in Asset.STATUS_CHOICES}
+
+
+def stat_key(asset):
+    """(category id, status, assignee id or 0) of an asset"""
+    return asset.category_id, asset.status, asset.assigned_to_id or 0
+
+
+def apply(deltas):
+    """Add ``deltas``, a mapping of stat_key to count change, to the table"""
+    with transaction.atomic():
+        # Sorted so concurrent writers lock rows in the same order
+        for (category_id, status, assignee), delta in sorted(deltas.items()):
+            if not delta:
+                continue
+            rows = AssetStat.objects.filter(category_id=category_id, status=status, assignee=assignee)
+            if rows.update(count=F('count') + delta) or delta < 0:
+                # A missing row on decrement is drift for the recompute to fix
+                continue
+            try:
+                with transaction.atomic():
+                    AssetStat.objects.create(category_id=category_id, status=status, assignee=assignee, count=delta)
+            except IntegrityError:
+                # Created concurrently
+                rows.update(count=F('count') + delta)
+
+
+def moved(previous, current):
+    """Deltas for an asset going from key ``previous`` (None if new) to ``current`` (None if deleted)"""
+    deltas = Counter()
+    if previous is not None:
+        deltas[previous] -= 1
+    if current is not None:
+        deltas[current] += 1
+    return deltas
+
+
+def actual_counts():
+    rows = Asset.objects.values_list('category_id', 'status', 'assigned_to_id').annotate(count=Count('pk')).order_by()
+    return {(category_id, status, assignee or 0): count for category_id, status, assignee, count in rows}
+
+
+def recompute():
+    """Rebuild the table from the asset table. Returns the number of combinations that were off."""
+    with transaction.atomic():
+        # Lock the stat rows so deltas committed meanwhile are not lost
+        stored = {
+            (category_id, status, assignee): count
+            for category_id, status, assignee, count in AssetStat.objects.select_for_update().values_list('category_id', 'status', 'assignee', 'count')
+        }
+        actual = actual_counts()
+        drift = {key for key in stored.keys() | actual.keys() if stored.get(key, 0) != actual.get(key, 0)}
+        if drift:
+            AssetStat.objects.all().delete()
+            AssetStat.objects.bulk_create([
+                AssetStat(category_id=category_id, status=status, assignee=assignee, count=count)
+                for (category_id, status, assignee), count in actual.items()
+            ])
+    if drift:
+        logger.warning('Recomputed asset statistics: %s combinations were off', len(drift))
+    return len(drift)
+
+
+def merge_assignee(user_id):
+    """Move the counts of a deleted user's assets to unassigned, as the database did with the assets"""
+    rows = list(AssetStat.objects.filter(assignee=user_id).values_list('category_id', 'status', 'count'))
+    deltas = Counter()
+    for category_id, status, count in rows:
+        deltas[category_id, status, user_id] -= count
+        deltas[category_id, status, 0] += count
+    apply(deltas)
+    AssetStat.objects.filter(assignee=user_id, count=0).delete()
+
+
+def summary(user=None):
+    """
+    Dashboard KPIs and per-category counts, for the assets assigned to
+    ``user`` or, without one, for all assets. Returns (kpis, by_category).
+    """
+    rows = AssetStat.objects.all()
+    if user is not None:
+        rows = rows.filter(assignee=user.pk)
+    aggregates = {
+        'total_assets': Sum('count'),
+        'assigned_assets': Sum('count', filter=~Q(assignee=0)),
+        'unassigned_assets': Sum('count', filter=Q(assignee=0)),
+    }
+    for status, name in STATUS_KPIS.items():
+        aggregates[name] = Sum('count', filter=Q(status=status))
+    kpis = {name: value or 0 for name, value in rows.aggregate(**aggregates).items()}
+    scope = Q(stats__assignee=user.pk) if user is not None else None
+    categories = AssetCategory.objects.annotate(asset_count=Coalesce(Sum('stats__count', filter=scope), 0))
+    return kpis, dict(categories.values_list('name', 'asset_count'))
+
+
+def total_assets():
+    return AssetStat.objects.aggregate(total=Sum('count'))['total'] or 0
@@ -1,3 +1,865 @@
-from django.test import TestCase
+import datetime
+import json
+import math
+import os
+import re
+import shutil
+import tempfile
+import uuid
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+import openpyxl
+
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.http import QueryDict
+from django.urls import reverse
+from django.utils import timezone
+from io import BytesIO, StringIO
+
+from .models import Asset, AssetCategory, AssetCategoryField, AssetFieldValue, AssetStat, ExportLog, ImportBatch, ImportRow
+from . import buckets, codes, dashboard, depreciation, events, importer, pdf, qr, scans, schema, staging, stats
+from .exports import BOOK_VALUE_COLUMN, iter_rows
+from .admin import AssetAdminForm
+from .forms import AssetForm
+from .pagination import cursor_paginate
+from .views import filter_assets
+from audit.models import AuditLog
+
+
+class PromotedFieldTest(TestCase):
+    """Filters must return the same rows through the shadow table as through dynamic_data"""
+
+    def setUp(self):
+        self.category = AssetCategory.objects.create(name='Laptops')
+        self.location = AssetCategoryField.objects.create(category=self.category, key='location', label='Location', type='text', required=False)
+        self.price = AssetCategoryField.objects.create(category=self.category, key='price', label='Price', type='number', required=False)
+        self.hq = Asset.objects.create(category=self.category, dynamic_data={'location': 'HQ Office', 'price': 1200})
+        self.branch = Asset.objects.create(category=self.category, dynamic_data={'location': 'Branch', 'price': 800})
+
+    def filtered(self, query):
+        return set(filter_assets(Asset.objects.all(), QueryDict(query)).values_list('pk', flat=True))
+
+    def test_filters_match_before_and_after_promotion(self):
+        queries = ['location=hq', f'category={self.category.pk}&dyn_price=800']
+        before = [self.filtered(q) for q in queries]
+        self.assertEqual(before, [{self.hq.pk}, {self.branch.pk}])
+        for field in (self.location, self.price):
+            field.indexed = True
+            field.save()
+        call_command('backfill_promoted_fields', stdout=StringIO())
+        self.assertEqual(AssetFieldValue.objects.count(), 4)
+        self.assertEqual([self.filtered(q) for q in queries], before)
+
+    def test_save_keeps_shadow_in_sync(self):
+        self.location.indexed = True
+        self.location.save()
+        call_command('backfill_promoted_fields', stdout=StringIO())
+        self.branch.dynamic_data['location'] = 'HQ Annex'
+        self.branch.save()
+        self.assertEqual(self.filtered('location=hq'), {self.hq.pk, self.branch.pk})
+        self.location.indexed = False
+        self.location.save()
+        self.assertFalse(AssetFieldValue.objects.filter(key='location').exists())
+
+    def test_renamed_key_needs_backfill(self):
+        self.price.indexed = True
+        self.price.save()
+        call_command('backfill_promoted_fields', stdout=StringIO())
+        for asset in (self.hq, self.branch):
+            asset.dynamic_data['cost'] = asset.dynamic_data.pop('price')
+            asset.save()
+        self.price.key = 'cost'
+        self.price.save()
+        self.price.refresh_from_db()
+        self.assertIsNone(self.price.index_built_at)
+        self.assertFalse(AssetFieldValue.objects.filter(key='price').exists())
+        # Served from dynamic_data until the backfill, then from the shadow rows
+        self.assertEqual(self.filtered(f'category={self.category.pk}&dyn_cost=800'), {self.branch.pk})
+        call_command('backfill_promoted_fields', stdout=StringIO())
+        self.assertEqual(self.filtered(f'category={self.category.pk}&dyn_cost=800'), {self.branch.pk})
+
+
+class AssetSearchTest(TestCase):
+    """Full-text search covers description, text fields and category name with prefix matching"""
+
+    def setUp(self):
+        self.category = AssetCategory.objects.create(name='Laptops')
+        AssetCategoryField.objects.create(category=self.category, key='model', label='Model', type='text', required=False)
+        self.dell = Asset.objects.create(category=self.category, dynamic_data={'model': 'Latitude E6440'}, description='Dell laptop for finance')
+        self.camera = Asset.objects.create(category=AssetCategory.objects.create(name='Cameras'), description='Hikvision ColorVu')
+
+    def searched(self, query):
+        return list(filter_assets(Asset.objects.all(), QueryDict(f'search={query}')).values_list('pk', flat=True))
+
+    def test_prefix_and_category_match(self):
+        self.assertEqual(self.searched('latit'), [self.dell.pk])
+        self.assertEqual(self.searched('camera'), [self.camera.pk])
+        self.assertEqual(self.searched('dell fin'), [self.dell.pk])
+        self.assertEqual(self.searched('dell camera'), [])
+        ranked = filter_assets(Asset.objects.all(), QueryDict('search=laptop')).order_by('search_rank')
+        self.assertEqual([a.pk for a in ranked], [self.dell.pk])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.dell.description = 'Spare unit'
+        self.dell.save()
+        self.assertEqual(self.searched('finance'), [])
+        self.camera.category.name = 'Surveillance'
+        self.camera.category.save()
+        self.assertEqual(self.searched('surveil'), [self.camera.pk])
+        self.camera.delete()
+        self.assertEqual(self.searched('surveil'), [])
+
+
+class CursorPaginationTest(TestCase):
+    """Walking a feed by cursor visits every row once, in order, in both directions"""
+
+    def setUp(self):
+        AuditLog.objects.bulk_create([AuditLog(action='scan', details=str(i)) for i in range(7)])
+        # Identical timestamps force the id tie-breaker
+        AuditLog.objects.update(timestamp=AuditLog.objects.first().timestamp)
+        self.expected = list(AuditLog.objects.order_by('-timestamp', '-id').values_list('pk', flat=True))
+
+    def test_forward_and_back(self):
+        qs = AuditLog.objects.all()
+        seen, pages, params = [], [], {'cursor': '1', 'count': 'exact'}
+        while True:
+            page = cursor_paginate(qs, params, 'timestamp', 3)
+            self.assertEqual(page.total, 7)
+            pages.append(page)
+            seen += [log.pk for log in page]
+            if not page.has_next():
+                break
+            params = {'after': page.next_cursor, 'count': 'exact'}
+        self.assertEqual(seen, self.expected)
+        self.assertEqual([len(p) for p in pages], [3, 3, 1])
+        back = cursor_paginate(qs, {'before': pages[-1].previous_cursor}, 'timestamp', 3)
+        self.assertEqual([log.pk for log in back], self.expected[3:6])
+        first = cursor_paginate(qs, {'before': back.previous_cursor}, 'timestamp', 3)
+        self.assertEqual([log.pk for log in first], self.expected[:3])
+        self.assertFalse(first.has_previous())
+
+
+class SchemaRegistryTest(TestCase):
+    """Schema lookups are served from the registry until a category or field is written"""
+
+    def setUp(self):
+        self.category = AssetCategory.objects.create(name='Printers')
+        AssetCategoryField.objects.create(category=self.category, key='model', label='Model', type='text', required=False)
+        other = AssetCategory.objects.create(name='Scanners')
+        AssetCategoryField.objects.create(category=other, key='Model', label='model ', type='text', required=False)
+
+    def test_cached_until_write(self):
+        schema.category_fields(self.category.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual([f.key for f in schema.category_fields(str(self.category.pk))], ['model'])
+            self.assertEqual(len(schema.all_fields()), 1)
+            self.assertEqual(schema.get_category(self.category.pk).name, 'Printers')
+            self.assertIsNone(schema.get_category('bogus'))
+        version = schema.schema_version()
+        field = AssetCategoryField.objects.create(category=self.category, key='toner', label='Toner', type='text', required=False)
+        self.assertNotEqual(schema.schema_version(), version)
+        self.assertEqual([f.key for f in schema.category_fields(self.category.pk)], ['model', 'toner'])
+        field.delete()
+        self.category.name = 'Copiers'
+        self.category.save()
+        self.assertEqual([f.key for f in schema.category_fields(self.category.pk)], ['model'])
+        self.assertEqual([c.name for c in schema.categories()], ['Copiers', 'Scanners'])
+
+
+class StreamingExportTest(TestCase):
+    """CSV exports stream rows with a header fixed from the category schema"""
+
+    def setUp(self):
+        self.category = AssetCategory.objects.create(name='Monitors')
+        AssetCategoryField.objects.create(category=self.category, key='serial', label='Serial', type='text', required=False)
+        for i in range(3):
+            Asset.objects.create(category=self.category, dynamic_data={'serial': f'SN{i}', 'stale': 'x'})
+        self.client.force_login(get_user_model().objects.create_user(username='exporter', password='x', role='manager'))
+
+    def test_csv_streams_projected_columns(self):
+        response = self.client.get(reverse('asset_export'), {'format': 'csv', 'category': self.category.pk})
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'ID,Category,Status,Assigned To,Created,Updated,serial')
+        self.assertEqual(len(lines), 4)
+        response = self.client.get(reverse('asset_export'), {'format': 'csv', 'columns': ['serial', 'Status']})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines, ['serial,Status', 'SN0,active', 'SN1,active', 'SN2,active'])
+
+
+class ExportJobTest(TestCase):
+    """Background exports run in the worker, report status, serve ranges and reuse artifacts"""
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        category = AssetCategory.objects.create(name='Phones')
+        for i in range(3):
+            Asset.objects.create(category=category, description=f'Phone {i}')
+        self.client.force_login(get_user_model().objects.create_user(username='exporter', password='x', role='manager'))
+
+    def submit(self):
+        response = self.client.post(reverse('asset_export'), {'format': 'xlsx', 'background': '1', 'columns': ['ID', 'Status']})
+        self.assertEqual(response.status_code, 202)
+        return response.json()['job']
+
+    def test_job_lifecycle(self):
+        with override_settings(MEDIA_ROOT=self.media):
+            job = self.submit()
+            self.assertEqual(job['status'], 'queued')
+            call_command('run_export_jobs', '--once', stdout=StringIO())
+            job = self.client.get(job['status_url']).json()['job']
+            self.assertEqual((job['status'], job['rows_done'], job['progress']), ('done', 3, 100.0))
+            response = self.client.get(job['download_url'], HTTP_RANGE='bytes=0-3')
+            self.assertEqual(response.status_code, 206)
+            self.assertEqual(b''.join(response.streaming_content), b'PK\x03\x04')
+            self.assertEqual(response['Content-Range'], f'bytes 0-3/{job["file_size"]}')
+            again = self.submit()
+            self.assertEqual(again['status'], 'done')
+            self.assertNotEqual(again['id'], job['id'])
+            self.assertEqual(ExportLog.objects.get(pk=again['id']).file, ExportLog.objects.get(pk=job['id']).file)
+            Asset.objects.first().save()
+            self.assertEqual(self.submit()['status'], 'queued')
+
+    def test_fingerprint_changes_with_the_date(self):
+        from . import export_jobs
+        today = timezone.localdate()
+        with mock.patch('django.utils.timezone.localdate', return_value=today):
+            first = export_jobs.fingerprint('xlsx', ['ID', 'Book Value'], {}, Asset.objects.all())
+            self.assertEqual(export_jobs.fingerprint('xlsx', ['ID', 'Book Value'], {}, Asset.objects.all()), first)
+        with mock.patch('django.utils.timezone.localdate', return_value=today + datetime.timedelta(days=1)):
+            self.assertNotEqual(export_jobs.fingerprint('xlsx', ['ID', 'Book Value'], {}, Asset.objects.all()), first)
+
+    def test_anonymous_cannot_queue(self):
+        self.client.logout()
+        response = self.client.post(reverse('asset_export'), {'format': 'xlsx', 'background': '1'})
+        self.assertEqual(response.status_code, 401)
+        self.assertFalse(ExportLog.objects.exists())
+
+    def test_xlsx_cells_are_typed(self):
+        import openpyxl
+        category = AssetCategory.objects.get()
+        AssetCategoryField.objects.create(category=category, key='price', label='Price', type='number', required=False)
+        AssetCategoryField.objects.create(category=category, key='bought', label='Bought', type='date', required=False)
+        Asset.objects.update(dynamic_data={'price': '12.5', 'bought': '2024-03-01'})
+        response = self.client.get(reverse('asset_export'), {'format': 'xlsx', 'columns': ['ID', 'price', 'bought', 'Status']})
+        sheet = openpyxl.load_workbook(BytesIO(b''.join(response.streaming_content))).active
+        self.assertEqual([cell.value for cell in sheet[2]][1:], [12.5, datetime.datetime(2024, 3, 1), 'active'])
+        self.assertEqual(sheet.max_row, 4)
+
+    def test_non_finite_numbers_stay_text(self):
+        import openpyxl
+        from . import xlsx
+        with tempfile.TemporaryFile() as f:
+            xlsx.write_rows(f, ['Price', 'Note'], [['inf', float('nan')], ['1e400', Decimal('Infinity')], ['2.5', float('-inf')]], {'Price': 'number'})
+            f.seek(0)
+            sheet = openpyxl.load_workbook(f).active
+            self.assertEqual([[cell.value for cell in row] for row in sheet.iter_rows(min_row=2)], [['inf', 'nan'], ['1e400', 'Infinity'], [2.5, '-inf']])
+
+
+class BulkImportTest(TestCase):
+    """Uploads are staged once; the batched import reads the staged rows and checkpoints every batch"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('importer', password='x', role='admin')
+        self.assignee = get_user_model().objects.create_user('jdoe', password='x')
+        self.category = AssetCategory.objects.create(name='Printers')
+        AssetCategoryField.objects.create(category=self.category, key='serial', label='Serial', type='text', required=True, indexed=True)
+        AssetCategoryField.objects.create(category=self.category, key='pages', label='Pages', type='number', required=False)
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+        sheet.append([' serial ', 'status', 'assigned_to', 'pages'])
+        for i in range(5):
+            sheet.append([None if i == 2 else f'SN{i}', 'Active', 'jdoe' if i % 2 else None, f'{i}00'])
+        sheet.append([None, None, None, None])
+        self.upload = BytesIO()
+        workbook.save(self.upload)
+        self.upload.seek(0)
+        self.upload.name = 'printers.xlsx'
+
+    def test_stage_and_import_in_batches(self):
+        batch = staging.stage_upload(self.user, self.category.pk, self.upload)
+        self.assertEqual((batch.rows_total, batch.error_count), (5, 1))
+        self.assertEqual(staging.error_messages(batch), ['Row 4: Missing required field Serial'])
+        self.assertEqual(batch.rows.get(position=1).data, {'serial': 'SN1', 'status': 'active', 'assigned_to': 'jdoe', 'pages': 100})
+        log, start = importer.start_import(self.user, self.category.pk, batch.token, batch.columns, batch.rows_total)
+        counts, fail_rows = importer.import_rows(staging.iter_staged(batch, start), self.category.pk, self.user, log, start=start, batch_size=2)
+        self.assertEqual((counts['created'], fail_rows), (4, [{'row': 4, 'error': 'Missing required field Serial'}]))
+        self.assertEqual(Asset.objects.filter(assigned_to=self.assignee).count(), 2)
+        self.assertEqual(AuditLog.objects.filter(action='create').count(), 4)
+        self.assertEqual(AuditLog.objects.filter(action='assign', related_user=self.assignee).count(), 2)
+        self.assertEqual(AssetFieldValue.objects.filter(key='serial').count(), 4)
+        self.assertEqual(list(filter_assets(Asset.objects.all(), QueryDict('search=SN3')).values_list('dynamic_data__serial', flat=True)), ['SN3'])
+        log.refresh_from_db()
+        self.assertEqual(log.rows_done, 5)
+        self.assertIn('Row 4', log.error_message)
+
+    def test_csv_cell_validation(self):
+        AssetCategoryField.objects.create(category=self.category, key='bought', label='Bought', type='date', required=False)
+        upload = BytesIO(
+            'serial,status,pages,bought\n'
+            'SN1,active,1.5,01/31/2024\n'
+            'SN1,broken,many,2024-13-01\n'
+            ',,7,2024-02-03\n'
+            'SN4,active,1e400,\n'
+            'SN5,active,-inf,\n'.encode()
+        )
+        upload.name = 'printers.csv'
+        batch = staging.stage_upload(self.user, self.category.pk, upload, key='serial')
+        rows = list(batch.rows.order_by('position').values_list('data', 'cell_errors'))
+        self.assertEqual(rows[0], ({'serial': 'SN1', 'status': 'active', 'pages': 1.5, 'bought': '2024-01-31'}, {}))
+        self.assertEqual(sorted(rows[1][1]), ['bought', 'pages', 'serial', 'status'])
+        self.assertEqual(rows[1][1]['serial'], 'Duplicate value in this upload')
+        self.assertEqual(rows[2][1], {'serial': 'Missing required field Serial'})
+        self.assertEqual(rows[3][1], {'pages': 'Pages must be a number'})
+        self.assertEqual(rows[4][1], {'pages': 'Pages must be a number'})
+        self.assertEqual(batch.error_count, 4)
+        log, start = importer.start_import(self.user, self.category.pk, batch.token, batch.columns, batch.rows_total)
+        counts, fail_rows = importer.import_rows(staging.iter_staged(batch, start), self.category.pk, self.user, log, start=start)
+        self.assertEqual(counts['created'], 1)
+        self.assertEqual([row['row'] for row in fail_rows], [3, 4, 5, 6])
+        self.assertIn('Pages must be a number', fail_rows[0]['error'])
+        self.assertEqual(list(Asset.objects.values_list('dynamic_data__pages', flat=True)), [1.5])
+
+    def test_resume_from_checkpoint(self):
+        batch = staging.stage_upload(self.user, self.category.pk, self.upload)
+        log, _ = importer.start_import(self.user, self.category.pk, batch.token, batch.columns, batch.rows_total)
+        importer.import_rows(list(staging.iter_staged(batch))[:2], self.category.pk, self.user, log)
+        importer.fail_import(log, 'worker restarted')
+        resumed, start = importer.start_import(self.user, self.category.pk, batch.token, batch.columns, batch.rows_total)
+        self.assertEqual((resumed.pk, start), (log.pk, 2))
+        importer.import_rows(staging.iter_staged(batch, start), self.category.pk, self.user, resumed, start=start)
+        importer.finish_import(resumed, [], 0)
+        self.assertEqual(Asset.objects.count(), 4)
+        _, start = importer.start_import(self.user, self.category.pk, batch.token, batch.columns, batch.rows_total)
+        self.assertEqual(start, 0)
+
+    def test_preview_and_confirm_from_staging(self):
+        self.client.force_login(self.user)
+        url = reverse('asset_bulk_import')
+        response = self.client.post(url, {'category': self.category.pk, 'step': '2', 'import_file': self.upload})
+        batch = ImportBatch.objects.get()
+        self.assertRedirects(response, f'{url}?token={batch.token}')
+        with mock.patch.object(staging, 'PREVIEW_PAGE_SIZE', 2):
+            response = self.client.get(url, {'token': batch.token, 'page': 3})
+        self.assertEqual([row['serial'] for row, _ in response.context['preview_data']], ['SN4'])
+        response = self.client.post(url, {'step': '3', 'import_token': batch.token})
+        self.assertEqual(response.context['success_count'], 4)
+        self.assertFalse(ImportBatch.objects.exists())
+        response = self.client.post(url, {'step': '3', 'import_token': batch.token})
+        self.assertRedirects(response, url)
+        self.assertEqual(Asset.objects.count(), 4)
+
+    def test_expired_staging_is_purged(self):
+        batch = staging.stage_upload(self.user, self.category.pk, self.upload)
+        ImportBatch.objects.filter(pk=batch.pk).update(expires_at=timezone.now())
+        self.assertIsNone(staging.get_batch(batch.token, self.user))
+        call_command('purge_import_staging', stdout=StringIO())
+        self.assertFalse(ImportRow.objects.exists())
+
+
+class UpsertImportTest(TestCase):
+    """With a natural key, re-imports update matching assets and skip unchanged ones"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('importer', password='x', role='admin')
+        self.category = AssetCategory.objects.create(name='Scanners')
+        AssetCategoryField.objects.create(category=self.category, key='serial', label='Serial', type='text', required=True)
+        AssetCategoryField.objects.create(category=self.category, key='location', label='Location', type='text', required=False)
+
+    def import_rows(self, rows):
+        log, _ = importer.start_import(self.user, self.category.pk, uuid.uuid4(), ['serial', 'location'], len(rows))
+        return importer.import_rows(((line, row, '') for line, row in enumerate(rows, 2)), self.category.pk, self.user, log)
+
+    def test_reimport_updates_only_changed_rows(self):
+        self.category.natural_key = 'serial'
+        self.category.save()
+        counts, _ = self.import_rows([{'serial': f'S{i}', 'location': 'HQ'} for i in range(3)])
+        self.assertEqual(counts, {'created': 3, 'updated': 0, 'unchanged': 0})
+        first = Asset.objects.get(natural_key='S1')
+        AuditLog.objects.all().delete()
+        counts, fail_rows = self.import_rows([
+            {'serial': 'S0', 'location': 'HQ'},
+            {'serial': 'S1', 'location': 'Branch', 'status': 'maintenance'},
+            {'serial': 'S3', 'location': 'HQ'},
+        ])
+        self.assertEqual((counts, fail_rows), ({'created': 1, 'updated': 1, 'unchanged': 1}, []))
+        self.assertEqual(Asset.objects.count(), 4)
+        updated = Asset.objects.get(natural_key='S1')
+        self.assertEqual((updated.pk, updated.uuid, updated.status, updated.dynamic_data['location']), (first.pk, first.uuid, 'maintenance', 'Branch'))
+        self.assertEqual(sorted(AuditLog.objects.values_list('action', flat=True)), ['create', 'edit'])
+        self.assertEqual(list(filter_assets(Asset.objects.all(), QueryDict('search=branch')).values_list('pk', flat=True)), [first.pk])
+
+    def test_reimport_changes_only_uploaded_columns(self):
+        self.category.natural_key = 'serial'
+        self.category.save()
+        owner = get_user_model().objects.create_user('owner', password='x')
+        asset = Asset.objects.create(
+            category=self.category, status='maintenance', assigned_to=owner, description='keep',
+            dynamic_data={'serial': 'S1', 'location': 'HQ', 'room': '4B'},
+        )
+        counts, _ = self.import_rows([{'serial': 'S1', 'location': 'Branch'}])
+        self.assertEqual(counts['updated'], 1)
+        asset.refresh_from_db()
+        self.assertEqual((asset.status, asset.assigned_to, asset.description), ('maintenance', owner, 'keep'))
+        self.assertEqual(asset.dynamic_data, {'serial': 'S1', 'location': 'Branch', 'room': '4B'})
+        self.assertEqual(asset.content_hash, importer.content_hash(asset))
+        self.assertEqual(self.import_rows([{'serial': 'S1'}])[0]['unchanged'], 1)
+
+    def test_repeated_key_fails_later_rows(self):
+        self.category.natural_key = 'serial'
+        self.category.save()
+        counts, fail_rows = self.import_rows([
+            {'serial': 'S1', 'location': 'HQ'},
+            {'serial': 'S1', 'location': 'Branch'},
+            {'serial': 'S2', 'location': 'HQ'},
+        ])
+        self.assertEqual(counts, {'created': 2, 'updated': 0, 'unchanged': 0})
+        self.assertEqual(fail_rows, [{'row': 3, 'error': 'Duplicate serial in this upload'}])
+        self.assertEqual(Asset.objects.get(natural_key='S1').dynamic_data['location'], 'HQ')
+        self.assertEqual(AuditLog.objects.filter(action='create').count(), 2)
+        self.assertEqual(AssetStat.objects.get(category=self.category).count, 2)
+
+    def test_reimport_keeps_scan_codes(self):
+        self.category.natural_key = 'serial'
+        self.category.save()
+        self.import_rows([{'serial': 'S1', 'location': 'HQ'}])
+        asset = Asset.objects.get(natural_key='S1')
+        Asset.objects.filter(pk=asset.pk).update(qr_code='qr_codes/s1-code.png')
+        codes.sync_assets([Asset.objects.get(pk=asset.pk)])
+        counts, _ = self.import_rows([{'serial': 'S1', 'location': 'Branch'}])
+        self.assertEqual(counts['updated'], 1)
+        for code in (str(asset.uuid), str(asset.pk), 's1-code.png', 's1-code'):
+            self.assertEqual(codes.resolve(code), asset.pk, code)
+
+    def test_natural_key_follows_category_setting(self):
+        Asset.objects.create(category=self.category, dynamic_data={'serial': 'S1'})
+        Asset.objects.create(category=self.category, dynamic_data={'serial': 'S1'})
+        self.assertFalse(Asset.objects.exclude(natural_key=None).exists())
+        self.category.natural_key = 'serial'
+        with self.assertRaises(ValidationError):
+            self.category.full_clean()
+        Asset.objects.filter(pk=Asset.objects.last().pk).update(dynamic_data={'serial': 'S2'})
+        self.category.full_clean()
+        self.category.save()
+        self.assertEqual(sorted(Asset.objects.values_list('natural_key', flat=True)), ['S1', 'S2'])
+
+    def test_form_rejects_duplicate_natural_key(self):
+        self.category.natural_key = 'serial'
+        self.category.save()
+        first = Asset.objects.create(category=self.category, dynamic_data={'serial': 'S1'})
+        data = {'category': self.category.pk, 'status': 'active', 'depreciation_method': 'straight_line', 'dyn_serial': ' S1 '}
+        form = AssetForm(data=data)
+        self.assertFalse(form.is_valid())
+        self.assertIn('dyn_serial', form.errors)
+        self.assertTrue(AssetForm(data=data, instance=first).is_valid())
+        second = Asset.objects.create(category=self.category, dynamic_data={'serial': 'S2'})
+        form = AssetAdminForm(data={**data, 'dynamic_data': '{}'}, instance=second)
+        self.assertFalse(form.is_valid())
+        self.assertIn('dyn_serial', form.errors)
+
+
+class QrCodeRegenerationTest(TestCase):
+    """regenerate_asset_qrcodes rewrites codes whose URL changed and skips current ones"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        category = AssetCategory.objects.create(name='Radios')
+        self.assets = [Asset.objects.create(category=category) for _ in range(3)]
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def regenerate(self, *args):
+        out = StringIO()
+        call_command('regenerate_asset_qrcodes', '--workers', '1', '--chunk-size', '2', '--only-changed', *args, stdout=out)
+        return out.getvalue().strip().splitlines()[-1]
+
+    def test_only_changed(self):
+        self.assertIn('for 3 assets; 0 were', self.regenerate('--base-url', 'https://assets.example.com'))
+        asset = Asset.objects.get(pk=self.assets[0].pk)
+        self.assertEqual(asset.qr_code.name, f'qr_codes/asset_{asset.uuid}.png')
+        self.assertEqual(asset.qr_hash, qr.url_hash(f'https://assets.example.com/assets/{asset.uuid}/'))
+        self.assertIn('for 0 assets; 3 were', self.regenerate('--base-url', 'https://assets.example.com'))
+        self.assertIn('for 3 assets; 0 were', self.regenerate('--base-url', 'https://scan.example.com'))
+        self.assertEqual(Asset.objects.get(pk=asset.pk).qr_code.name, asset.qr_code.name)
+
+    def test_without_stored_files(self):
+        with mock.patch.object(qr, 'STORE_FILES', False):
+            self.assertIn('for 3 assets; 0 were', self.regenerate('--base-url', 'https://assets.example.com'))
+            self.assertIn('for 0 assets; 3 were', self.regenerate('--base-url', 'https://assets.example.com'))
+        asset = Asset.objects.get(pk=self.assets[0].pk)
+        self.assertEqual(asset.qr_hash, qr.url_hash(f'https://assets.example.com/assets/{asset.uuid}/'))
+        self.assertFalse(asset.qr_code)
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, 'qr_codes')))
+
+
+class QrEndpointTest(TestCase):
+    """QR codes render on demand with strong ETags and immutable caching"""
+
+    def setUp(self):
+        self.client.force_login(get_user_model().objects.create_user('viewer', password='x'))
+        self.asset = Asset.objects.create(category=AssetCategory.objects.create(name='Tablets'))
+        self.url = reverse('asset_qr', args=[self.asset.uuid, 'png'])
+
+    def test_png_with_etag(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertEqual(response.content, qr.render_png(f'http://testserver/assets/{self.asset.uuid}/'))
+        self.assertIn('immutable', response['Cache-Control'])
+        etag = response['ETag']
+        self.assertFalse(etag.startswith('W/'))
+        cached = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(cached.status_code, 304)
+        self.assertIn('immutable', cached['Cache-Control'])
+        larger = self.client.get(self.url, {'size': 20, 'ecc': 'h'})
+        self.assertNotEqual(larger['ETag'], etag)
+
+    def test_svg_and_bad_requests(self):
+        response = self.client.get(reverse('asset_qr', args=[self.asset.uuid, 'svg']))
+        self.assertEqual(response['Content-Type'], 'image/svg+xml')
+        self.assertIn(b'<svg', response.content)
+        self.assertEqual(self.client.get(self.url, {'size': 99}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('asset_qr', args=[self.asset.uuid, 'gif'])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('asset_qr', args=[uuid.uuid4(), 'png'])).status_code, 404)
+
+
+class ScanLookupTest(TestCase):
+    """asset_by_code resolves every code form through the lookup table and caches the payload"""
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(get_user_model().objects.create_user('scanner', password='x'))
+        self.asset = Asset.objects.create(category=AssetCategory.objects.create(name='Pallets'))
+        self.asset.qr_code = f'qr_codes/asset_{self.asset.uuid}.png'
+        self.asset.save()
+        self.url = reverse('asset_by_code')
+
+    def scan(self, code):
+        return self.client.get(self.url, {'code': code}).json()
+
+    def test_code_forms(self):
+        uuid_code = str(self.asset.uuid)
+        for code in (f'ASSET|v1|{uuid_code}', f'https://assets.example.com/assets/{uuid_code}/', f'qr_codes/asset_{uuid_code}.png',
+                     f'asset_{uuid_code}', uuid_code.upper(), str(self.asset.pk)):
+            self.assertEqual(self.scan(code)['asset']['id'], self.asset.pk, code)
+        self.assertFalse(self.scan('not-a-code')['success'])
+        self.assertEqual(AuditLog.objects.filter(action='scan', asset=self.asset).count(), 6)
+        # Digits at the end of a foreign code are not an asset id, cached or not
+        for code in (f'https://example.com/p/{self.asset.pk}', f'{self.asset.pk}.png', f'x/{self.asset.pk}'):
+            self.assertFalse(self.scan(code)['success'], code)
+
+    def test_cached_scan_and_invalidation(self):
+        code = f'ASSET|v1|{self.asset.uuid}'
+        self.scan(code)
+        with self.assertNumQueries(0):
+            self.assertEqual(codes.scan_payload(codes.resolve(code))['status'], 'active')
+        self.asset.status = 'maintenance'
+        self.asset.save()
+        self.assertEqual(self.scan(code)['asset']['status'], 'maintenance')
+        self.asset.delete()
+        self.assertFalse(self.scan(code)['success'])
+
+
+class ScanBatchTest(TestCase):
+    """Batched scans resolve together, keep their scan times and are recorded once per idempotency key"""
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(get_user_model().objects.create_user('scanner', password='x'))
+        category = AssetCategory.objects.create(name='Bins')
+        self.assets = [Asset.objects.create(category=category) for _ in range(3)]
+        self.url = reverse('asset_scan_batch')
+
+    def upload(self, records, key='batch-1'):
+        return self.client.post(self.url, {'scans': records}, content_type='application/json', headers={'Idempotency-Key': key})
+
+    def test_batch_and_retry(self):
+        records = [{'code': f'ASSET|v1|{asset.uuid}', 'scanned_at': '2026-01-05T08:30:00Z', 'device': 'dock-3'} for asset in self.assets]
+        records += [{'code': 'nope'}, {'scanned_at': 'x'}]
+        user = get_user_model().objects.get(username='scanner')
+        with self.assertNumQueries(7):
+            # Receipt check, code lookup, then receipt purge and insert and one audit insert in a savepoint
+            results, replayed = scans.ingest(user, 'batch-1', records)
+        self.assertFalse(replayed)
+        self.assertEqual([r['success'] for r in results], [True, True, True, False, False])
+        logs = AuditLog.objects.filter(action='scan').order_by('asset_id')
+        self.assertEqual([log.asset_id for log in logs], [asset.pk for asset in self.assets])
+        self.assertTrue(all(log.timestamp == datetime.datetime(2026, 1, 5, 8, 30, tzinfo=datetime.timezone.utc) for log in logs))
+        self.assertEqual(logs[0].metadata['device'], 'dock-3')
+        retry = self.upload(records).json()
+        self.assertTrue(retry['replayed'])
+        self.assertEqual(retry['results'], results)
+        self.assertEqual(AuditLog.objects.filter(action='scan').count(), 3)
+        self.assertEqual(self.upload(records, key='').status_code, 400)
+
+    def test_requires_json_content_type(self):
+        body = json.dumps({'scans': [{'code': str(self.assets[0].uuid)}]})
+        response = self.client.post(self.url, body, content_type='text/plain', headers={'Idempotency-Key': 'form-1'})
+        self.assertEqual(response.status_code, 415)
+        self.assertFalse(AuditLog.objects.filter(action='scan').exists())
+
+
+class DashboardSummaryTest(TestCase):
+    """dashboard_summary_api runs a fixed number of queries however many categories exist, and stays role-scoped"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('viewer', password='x', role='user')
+        self.client.force_login(self.user)
+        self.url = reverse('dashboard_summary_api')
+        # The session middlewares purge expired sessions on a random 1% of requests
+        patcher = mock.patch('random.randint', return_value=100)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def summary(self):
+        # 8 for session and user tracking in the middlewares, 4 for the summary, 3 to save the session
+        with self.assertNumQueries(15):
+            return self.client.get(self.url).json()
+
+    def test_constant_queries_and_scoping(self):
+        category = AssetCategory.objects.create(name='Racks')
+        Asset.objects.create(category=category, assigned_to=self.user)
+        Asset.objects.create(category=category, status='maintenance')
+        self.summary()
+        for i in range(20):
+            Asset.objects.create(category=AssetCategory.objects.create(name=f'Category {i}'), assigned_to=self.user, status='lost')
+        body = self.summary()
+        self.assertEqual(body['kpis']['total_assets'], 21)
+        self.assertEqual(body['kpis']['lost_assets'], 20)
+        self.assertEqual(body['kpis']['maintenance_assets'], 0)
+        self.assertEqual(body['by_category']['Racks'], 1)
+        self.assertEqual(len(body['by_category']), 21)
+
+
+class AssetStatsTest(TestCase):
+    """The statistics table follows saves, deletes, user deletion and bulk imports without drift"""
+
+    def test_deltas_match_recompute(self):
+        User = get_user_model()
+        alice = User.objects.create_user('alice', password='x')
+        category = AssetCategory.objects.create(name='Scanners', natural_key='serial')
+        AssetCategoryField.objects.create(category=category, key='serial', label='Serial', type='text', required=True)
+        first = Asset.objects.create(category=category, dynamic_data={'serial': 'S1'}, assigned_to=alice)
+        Asset.objects.create(category=category, dynamic_data={'serial': 'S2'})
+        first.status = 'maintenance'
+        first.save()
+        log, _ = importer.start_import(alice, category.pk, uuid.uuid4(), ['serial', 'status'], 2)
+        importer.import_rows([(2, {'serial': 'S2', 'status': 'lost'}, ''), (3, {'serial': 'S3'}, '')], category.pk, alice, log)
+        Asset.objects.get(dynamic_data__serial='S3').delete()
+        kpis, by_category = stats.summary()
+        self.assertEqual((kpis['total_assets'], kpis['maintenance_assets'], kpis['lost_assets'], kpis['assigned_assets']), (2, 1, 1, 1))
+        self.assertEqual(by_category, {'Scanners': 2})
+        self.assertEqual(stats.summary(alice)[0]['total_assets'], 1)
+        alice.delete()
+        self.assertEqual(stats.summary()[0]['unassigned_assets'], 2)
+        self.assertEqual(stats.recompute(), 0)
+        AssetStat.objects.all().delete()
+        self.assertEqual(stats.recompute(), 2)
+        self.assertEqual(stats.total_assets(), 2)
+
+
+class AcquisitionChartTest(TestCase):
+    """Acquisition buckets follow calendar boundaries and are counted in the database"""
+
+    def test_buckets(self):
+        self.assertEqual(
+            [buckets.label(day, 'month') for day in buckets.bucket_range('month', periods=3, end=datetime.date(2026, 3, 31))],
+            ['2026-01', '2026-02', '2026-03'],
+        )
+        self.assertEqual(
+            [buckets.label(day, 'quarter') for day in buckets.bucket_range('quarter', start=datetime.date(2025, 11, 5), end=datetime.date(2026, 4, 1))],
+            ['2025-Q4', '2026-Q1', '2026-Q2'],
+        )
+        self.assertEqual(buckets.bucket_range('week', periods=2, end=datetime.date(2026, 1, 1)), [datetime.date(2025, 12, 22), datetime.date(2025, 12, 29)])
+
+    def test_chart(self):
+        self.client.force_login(get_user_model().objects.create_user('charts', password='x', role='admin'))
+        category = AssetCategory.objects.create(name='Forklifts')
+        for created in ('2026-01-31 23:30', '2026-02-01 00:30', '2026-02-15 12:00', '2025-06-01 12:00'):
+            asset = Asset.objects.create(category=category)
+            Asset.objects.filter(pk=asset.pk).update(created_at=timezone.make_aware(datetime.datetime.fromisoformat(created)))
+        starts = buckets.bucket_range('month', start=datetime.date(2026, 1, 1), end=datetime.date(2026, 3, 1))
+        with self.assertNumQueries(1):
+            self.assertEqual(buckets.count_by_bucket(Asset.objects.all(), 'created_at', 'month', starts), (['2026-01', '2026-02', '2026-03'], [1, 2, 0]))
+        url = reverse('dashboard_chart_data_api')
+        body = self.client.get(url, {'chart': 'acquisition', 'start': '2026-01-01', 'end': '2026-03-01'}).json()
+        self.assertEqual(body['data'], [1, 2, 0])
+        body = self.client.get(url, {'chart': 'acquisition', 'granularity': 'quarter', 'periods': 4, 'end': '2026-03-01'}).json()
+        self.assertEqual(body['data'], [1, 0, 0, 3])
+        self.assertEqual(self.client.get(url, {'chart': 'acquisition', 'granularity': 'day'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'chart': 'acquisition', 'granularity': 'week', 'periods': 1000000}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'chart': 'acquisition', 'granularity': 'week', 'end': '0001-01-01'}).status_code, 400)
+
+
+class DepreciationTest(TestCase):
+    """Every method's schedule, and snapshots kept for the chart and exports"""
+
+    def test_methods(self):
+        rows = [
+            (1, Decimal('1200'), datetime.date(2025, 1, 1), 1, 'straight_line', None, None, None),
+            (2, Decimal('1000'), datetime.date(2025, 1, 1), 1, 'declining_balance', Decimal('100'), None, None),
+            (3, Decimal('600'), datetime.date(2025, 1, 1), 2, 'sum_of_years', None, None, None),
+            (4, Decimal('1000'), datetime.date(2025, 1, 15), 5, 'units_of_production', None, 1000, 500),
+            (5, None, None, None, 'straight_line', None, None, None),
+        ]
+        columns = depreciation.load(rows, today=datetime.date(2025, 11, 3))
+        values = depreciation.schedule(columns, depreciation.month_index(datetime.date(2025, 1, 1)), 14)
+        self.assertEqual(values.shape, (4, 14))
+        self.assertEqual(list(values[0, [0, 6, 12, 13]]), [1200, 600, 0, 0])
+        self.assertAlmostEqual(values[1, 1], 1000 * 5 / 6)
+        self.assertEqual(list(values[1, [12, 13]]), [100, 100])
+        self.assertEqual(list(values[2, [6, 12]]), [400, 200])
+        # Held from February; 500 units in the 10 months since January is 50 a month
+        self.assertTrue(math.isnan(values[3, 0]))
+        self.assertEqual(values[3, 5], 750)
+
+    def test_snapshots(self):
+        self.client.force_login(get_user_model().objects.create_user('finance', password='x', role='admin'))
+        purchased = buckets.shift(timezone.localdate().replace(day=1), 'month', -6)
+        asset = Asset.objects.create(
+            category=AssetCategory.objects.create(name='Trucks'),
+            purchase_value=Decimal('1200'), purchase_date=purchased, useful_life_years=1,
+        )
+        self.assertEqual(asset.depreciation_snapshots.count(), depreciation.DEPRECIATION_SNAPSHOT_PAST + 1 + 6)
+        body = self.client.get(reverse('dashboard_chart_data_api'), {'chart': 'depreciation'}).json()
+        self.assertEqual(body['data'][-7:], [1200, 1100, 1000, 900, 800, 700, 600])
+        self.assertEqual(depreciation.book_values(timezone.localdate()), {'Trucks': 600})
+        asset.salvage_value = Decimal('600')
+        asset.save()
+        self.assertEqual(depreciation.book_values(timezone.localdate(), by='asset'), {asset.pk: 900})
+        self.assertEqual(list(iter_rows(Asset.objects.all(), ['ID', BOOK_VALUE_COLUMN])), [[asset.pk, Decimal('900.00')]])
+
+
+class DashboardBundleTest(TestCase):
+    """The bundle is cached per scope and answers unchanged revalidations with a 304"""
+
+    def setUp(self):
+        cache.clear()
+        self.category = AssetCategory.objects.create(name='Pumps')
+        self.user = get_user_model().objects.create_user('field', password='x', role='user')
+        self.client.force_login(self.user)
+        self.url = reverse('dashboard_bundle')
+
+    def test_etag_and_invalidation(self):
+        Asset.objects.create(category=self.category, assigned_to=self.user)
+        Asset.objects.create(category=self.category)
+        response = self.client.get(self.url)
+        self.assertEqual(set(response.json()['charts']), set(dashboard.CHARTS))
+        self.assertEqual(response.json()['summary']['kpis']['total_assets'], 1)
+        etag = response['ETag']
+        with mock.patch.object(dashboard, 'summary') as summary:
+            self.assertEqual(self.client.get(self.url, headers={'If-None-Match': etag}).status_code, 304)
+            self.assertEqual(self.client.get(self.url).json()['summary']['kpis']['total_assets'], 1)
+        summary.assert_not_called()
+        Asset.objects.create(category=self.category, assigned_to=self.user)
+        response = self.client.get(self.url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['summary']['kpis']['total_assets'], 2)
+        self.assertEqual(self.client.get(self.url, {'charts': 'category,nope'}).status_code, 400)
+
+
+class DashboardEventsTest(TestCase):
+    """Committed changes reach the event streams allowed to see them, and reconnects resume or resync"""
+
+    def setUp(self):
+        cache.clear()
+        self.category = AssetCategory.objects.create(name='Valves')
+        self.manager = get_user_model().objects.create_user('lead', password='x', role='manager')
+        self.user = get_user_model().objects.create_user('tech', password='x', role='user')
+        self.other = get_user_model().objects.create_user('other', password='x', role='user')
+
+    def received(self, stream):
+        return [(chunk.split('event: ')[1].split('\n')[0], json.loads(chunk.split('data: ')[1])) for chunk in stream.pending()]
+
+    def test_scoped_asset_events(self):
+        streams = [events.Stream(user, user.role) for user in (self.manager, self.user, self.other)]
+        with self.captureOnCommitCallbacks(execute=True):
+            asset = Asset.objects.create(category=self.category, assigned_to=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            asset.status = 'maintenance'
+            asset.save()
+        manager, user, other = [self.received(stream) for stream in streams]
+        self.assertEqual([kind for kind, _ in manager], ['asset', 'asset'])
+        self.assertEqual(manager[1][1]['from'], {'category': 'Valves', 'status': 'active', 'assignee': self.user.pk})
+        self.assertEqual(manager[1][1]['to']['status'], 'maintenance')
+        self.assertEqual(user, manager)
+        self.assertEqual(other, [])
+        # Nothing is published for a rolled back change
+        with transaction.atomic():
+            Asset.objects.create(category=self.category)
+            transaction.set_rollback(True)
+        self.assertEqual(self.received(streams[0]), [])
+
+    def test_reconnect(self):
+        broker = events.Broker(size=2)
+        first = broker.publish('refresh', {})
+        broker.publish('refresh', {})
+        broker.publish('refresh', {})
+        self.assertIsNone(broker.since(first - 1))
+        self.assertEqual([event.seq for event in broker.since(first)], [first + 1, first + 2])
+        self.assertIsNone(broker.parse_id('elsewhere-1'))
+        seq = events.broker.publish('refresh', {})
+        events.broker.publish('refresh', {})
+        resumed = events.Stream(self.manager, 'manager', events.broker.event_id(seq))
+        self.assertEqual(self.received(resumed), [('refresh', {})])
+        self.assertEqual(self.received(events.Stream(self.manager, 'manager', 'elsewhere-1')), [('resync', {})])
+
+    async def test_stream_endpoint(self):
+        await self.async_client.aforce_login(self.manager)
+        response = await self.async_client.get(reverse('dashboard_events'))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        chunks = aiter(response.streaming_content)
+        self.assertIn(b'event: hello', await anext(chunks))
+        events.broker.publish('audit', {'actions': ['scan']}, users={self.user.pk})
+        self.assertIn(b'"actions": ["scan"]', await anext(chunks))
+        await chunks.aclose()
+
+    def test_no_stream_under_wsgi(self):
+        self.client.force_login(self.manager)
+        self.assertEqual(self.client.get(reverse('dashboard_events')).status_code, 204)
+
+
+class PdfPagingTest(TestCase):
+    """PDF chunks number their pages continuously and match the precomputed page count"""
+
+    def test_pages_and_chunks(self):
+        for total in (0, pdf.FIRST_PAGE_ROWS, pdf.FIRST_PAGE_ROWS + 1, 5000):
+            chunks = list(pdf.iter_chunks(range(total)))
+            pages = [page for chunk in chunks for page in chunk]
+            self.assertEqual([p['number'] for p in pages], list(range(1, pdf.page_count(total) + 1)))
+            self.assertEqual([row for p in pages for row in p['rows']], list(range(total)))
+            self.assertTrue(all(len(chunk) == pdf.PAGES_PER_CHUNK for chunk in chunks[:-1]))
+
+    @override_settings(PDF_EXPORT_WORKERS=2)
+    def test_chunks_are_merged_in_order(self):
+        from concurrent.futures import ThreadPoolExecutor
+        from pypdf import PdfReader, PdfWriter
+
+        def render_chunk(html_string, target=None):
+            # A blank page per page of the chunk, sized by its page number
+            writer = PdfWriter()
+            for number in re.findall(r'data-label="Page (\d+) of', html_string):
+                writer.add_blank_page(100 + int(number), 100)
+            output = BytesIO()
+            writer.write(output)
+            return output.getvalue()
+
+        total = pdf.FIRST_PAGE_ROWS + 3 * pdf.PAGES_PER_CHUNK * pdf.ROWS_PER_PAGE
+        progress = []
+        target = BytesIO()
+        with mock.patch.object(pdf, 'render_chunk', render_chunk), \
+                mock.patch.object(pdf, 'ProcessPoolExecutor', lambda max_workers, **kwargs: ThreadPoolExecutor(max_workers)):
+            written = pdf.render_pdf(([i, f'Asset {i}'] for i in range(total)), ['ID', 'Name'], total, target, progress.append)
+        self.assertEqual((written, progress[-1], len(progress)), (total, total, 4))
+        widths = [int(page.mediabox.width) - 100 for page in PdfReader(BytesIO(target.getvalue())).pages]
+        self.assertEqual(widths, list(range(1, pdf.page_count(total) + 1)))
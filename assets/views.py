@@ -1,25 +1,29 @@
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required, permission_required, user_passes_test
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
 from django.views.generic import CreateView, ListView, DetailView, TemplateView, UpdateView
 from .models import Asset, AssetCategory, AssetCategoryField, ExportLog
 from .forms import AssetForm
-import qrcode
-from io import BytesIO
+from . import schema
+from .filters import filter_assets
+from .pagination import is_cursor_request, cursor_paginate
+from . import codes, dashboard, events, importer, pdf, qr, scans, staging, xlsx
+from .exports import column_types, export_columns, export_filters, filtered_assets, iter_rows, stream_csv
+from .export_jobs import JOB_FORMATS, CONTENT_TYPES, submit_export, job_status
+from .downloads import ranged_file_response
 from django.core.files.base import ContentFile
-from django.http import JsonResponse
+from django.http import FileResponse, JsonResponse, StreamingHttpResponse
 from django.views.decorators.http import require_GET, require_POST
 from django.db.models import Q
 from django.views.decorators.csrf import csrf_exempt, ensure_csrf_cookie, csrf_protect
 from django.utils.decorators import method_decorator
-import re
 from django.http import HttpResponse
 import csv
-import pandas as pd
+import json
 from django.conf import settings
 from django.template.loader import render_to_string
-from weasyprint import HTML
 import tempfile
+import time
 from datetime import datetime
 import openpyxl
 from django.core.files.storage import default_storage
@@ -29,9 +33,11 @@ from django.db import transaction
 from django.views import View
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from audit.models import AuditLog
-from audit.utils import log_audit, ASSIGN_ACTION, MAINTENANCE_ACTION
+from audit.utils import log_audit, ASSIGN_ACTION, MAINTENANCE_ACTION, SCAN_ACTION
 from django.core.paginator import Paginator, EmptyPage
 from django.utils.timezone import localtime
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.core.handlers.asgi import ASGIRequest
 
 # Permission check: only admin/manager
 def is_admin_or_manager(user):
@@ -51,14 +57,11 @@ class AssetCreateView(UserPassesTestMixin, CreateView):
     def form_valid(self, form):
         asset = form.save(commit=False)
         assigned_to = form.cleaned_data.get('assigned_to')
-        asset.save()  # Save first to ensure UUID is set
-        # Generate QR code with direct URL
-        base_url = self.request.build_absolute_uri('/')[:-1]  # Remove trailing slash
-        qr_url = f"{base_url}/assets/{asset.uuid}/"
-        qr = qrcode.make(qr_url)
-        buffer = BytesIO()
-        qr.save(buffer, 'PNG')
-        asset.qr_code.save(f"asset_{asset.uuid}.png", ContentFile(buffer.getvalue()), save=False)
+        if qr.STORE_FILES:
+            # QR code with direct URL; the UUID is assigned on instantiation, so one save is enough
+            qr_url = qr.asset_url(qr.QR_BASE_URL or self.request.build_absolute_uri('/'), asset.uuid)
+            asset.qr_code.save(qr.file_name(asset.uuid), ContentFile(qr.render_png(qr_url)), save=False)
+            asset.qr_hash = qr.url_hash(qr_url)
         asset.save()
         if assigned_to:
             log_audit(self.request.user, ASSIGN_ACTION, asset, f'Asset assigned to {assigned_to}', related_user=assigned_to)
@@ -123,12 +126,10 @@ class AssetUpdateView(UserPassesTestMixin, UpdateView):
 
 @require_GET
 def get_dynamic_fields(request):
-    category_id = request.GET.get('category_id')
-    try:
-        category = AssetCategory.objects.get(pk=category_id)
-        return JsonResponse({'success': True, 'fields': category.dynamic_fields})
-    except AssetCategory.DoesNotExist:
+    category = schema.get_category(request.GET.get('category_id'))
+    if category is None:
         return JsonResponse({'success': False, 'fields': {}})
+    return JsonResponse({'success': True, 'fields': category.dynamic_fields})
 
 # Asset list view: only for authenticated users
 class AssetListView(LoginRequiredMixin, ListView):
@@ -144,78 +145,30 @@ class AssetListView(LoginRequiredMixin, ListView):
         # Enforce role-based filtering
         if role == 'user':
             qs = qs.filter(assigned_to=user)
-        category = self.request.GET.get('category')
-        status = self.request.GET.get('status')
-        location = self.request.GET.get('location')
-        search = self.request.GET.get('search')
-        assigned = self.request.GET.get('assigned')
-        warranty = self.request.GET.get('warranty')
-        # Dynamic field filters
-        dynamic_filters = {}
-        if category:
-            qs = qs.filter(category__id=category)
-            # Fetch dynamic fields for this category
-            fields = AssetCategoryField.objects.filter(category_id=category)
-            for field in fields:
-                val = self.request.GET.get(f'dyn_{field.key}')
-                if val:
-                    # Filter by dynamic_data JSON key
-                    if field.type == 'text':
-                        qs = qs.filter(**{f'dynamic_data__{field.key}__icontains': val})
-                    elif field.type == 'number':
-                        try:
-                            qs = qs.filter(**{f'dynamic_data__{field.key}': float(val)})
-                        except ValueError:
-                            pass
-                    elif field.type == 'date':
-                        # Parse mm/dd/yyyy and convert to yyyy-MM-dd
-                        import datetime
-                        try:
-                            dt = datetime.datetime.strptime(val, '%m/%d/%Y')
-                            iso_val = dt.strftime('%Y-%m-%d')
-                            qs = qs.filter(**{f'dynamic_data__{field.key}': iso_val})
-                        except ValueError:
-                            pass  # Invalid date format, ignore filter
-        if status:
-            qs = qs.filter(status=status)
-        if assigned == 'yes':
-            qs = qs.filter(assigned_to__isnull=False)
-        elif assigned == 'no':
-            qs = qs.filter(assigned_to__isnull=True)
-        if warranty == 'expiring':
-            from datetime import timedelta
-            from django.utils import timezone
-            soon = timezone.now() + timedelta(days=30)
-            qs = qs.filter(dynamic_data__warranty_expiry__lte=soon.date().isoformat(), dynamic_data__warranty_expiry__gte=timezone.now().date().isoformat())
-        if location:
-            qs = qs.filter(dynamic_data__location__icontains=location)
-        if search:
-            qs = qs.filter(
-                Q(dynamic_data__name__icontains=search) |
-                Q(dynamic_data__model__icontains=search) |
-                Q(description__icontains=search)
-            )
+        qs = filter_assets(qs, self.request.GET)
+        if 'search_rank' in qs.query.annotations:
+            # Best full-text matches first
+            return qs.order_by('search_rank', '-created_at')
         return qs.order_by('-created_at')
 
+    def paginate_queryset(self, queryset, page_size):
+        # Opt-in keyset pagination over (created_at, id); relevance ordering keeps page numbers
+        if is_cursor_request(self.request.GET) and 'search_rank' not in queryset.query.annotations:
+            page = cursor_paginate(queryset, self.request.GET, 'created_at', page_size)
+            return (None, page, page.object_list, True)
+        return super().paginate_queryset(queryset, page_size)
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['categories'] = AssetCategory.objects.all()
+        context['categories'] = schema.categories()
         context['statuses'] = Asset.STATUS_CHOICES
         selected_category = self.request.GET.get('category')
         if selected_category:
             # Show all dynamic fields for the selected category
-            context['dynamic_fields'] = AssetCategoryField.objects.filter(category_id=selected_category)
+            context['dynamic_fields'] = schema.category_fields(selected_category)
         else:
             # Show the union of all dynamic fields across all categories, deduplicated by key and label (case-insensitive)
-            all_fields = AssetCategoryField.objects.all()
-            seen = set()
-            unique_fields = []
-            for f in all_fields:
-                dedup_key = (f.key.lower().strip(), f.label.lower().strip())
-                if dedup_key not in seen:
-                    unique_fields.append(f)
-                    seen.add(dedup_key)
-            context['dynamic_fields'] = unique_fields
+            context['dynamic_fields'] = schema.all_fields()
         return context
 
 class AssetDetailView(LoginRequiredMixin, DetailView):
@@ -236,32 +189,57 @@ class AssetScanView(TemplateView):
 @csrf_exempt
 def asset_by_code(request):
     code = request.GET.get('code')
-    asset = None
+    payload = None
     if code:
-        # Try to extract UUID from QR code format 'ASSET|v1|{uuid}'
-        match = re.match(r'^ASSET\|v1\|([0-9a-fA-F-]{36})$', code)
-        if match:
-            uuid_val = match.group(1)
-            asset = Asset.objects.filter(uuid=uuid_val).first()
-        # Fallback: Try by QR code filename or asset ID
-        if not asset:
-            asset = Asset.objects.filter(qr_code__icontains=code).first()
-        if not asset and code.isdigit():
-            asset = Asset.objects.filter(pk=int(code)).first()
-    if asset:
-        # Log QR code scan
-        log_audit(request.user, 'scan', asset, f'QR code scanned: {code}')
-        data = {
-            'id': asset.pk,
-            'dynamic_data': asset.dynamic_data,
-            'category_name': asset.category.name,
-            'status': asset.status,
-            'assigned_to': str(asset.assigned_to) if asset.assigned_to else '',
-            'created_at': asset.created_at.strftime('%Y-%m-%d %H:%M'),
-        }
-        return JsonResponse({'success': True, 'asset': data})
+        # UUID, 'ASSET|v1|{uuid}', QR URL, QR file name or asset ID (assets.codes)
+        asset_id = codes.resolve(code)
+        if asset_id is not None:
+            payload = codes.scan_payload(asset_id)
+            if payload is None:
+                codes.forget_code(code)
+    if payload:
+        # Log QR code scan; the payload came from the cache, so the asset is referenced by id alone
+        user = request.user if request.user.is_authenticated else None
+        log_audit(user, SCAN_ACTION, Asset(pk=payload['id']), f'QR code scanned: {code}')
+        return JsonResponse({'success': True, 'asset': payload})
     return JsonResponse({'success': False})
 
+@require_POST
+@csrf_exempt
+def asset_scan_batch(request):
+    """
+    Record scans buffered by a device: a JSON body {"scans": [{"code",
+    "scanned_at", "device"}, ...]} with an Idempotency-Key header (or an
+    "idempotency_key" field). Retrying with the same key returns the
+    original results without recording the scans again.
+
+    CSRF-exempt for devices, so the body must be sent as application/json:
+    a cross-site form cannot send that without a CORS preflight.
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({'success': False, 'error': 'Authentication required'}, status=401)
+    if request.content_type != 'application/json':
+        return JsonResponse({'success': False, 'error': 'Content-Type must be application/json'}, status=415)
+    try:
+        data = json.loads(request.body)
+    except (ValueError, UnicodeDecodeError):
+        return JsonResponse({'success': False, 'error': 'Body must be JSON'}, status=400)
+    if not isinstance(data, dict):
+        return JsonResponse({'success': False, 'error': 'Body must be a JSON object'}, status=400)
+    key = str(request.headers.get('Idempotency-Key') or data.get('idempotency_key') or '').strip()
+    if not key or len(key) > scans.MAX_KEY_LENGTH:
+        return JsonResponse({'success': False, 'error': f'An idempotency key of 1-{scans.MAX_KEY_LENGTH} characters is required'}, status=400)
+    try:
+        results, replayed = scans.ingest(request.user, key, data.get('scans'))
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    return JsonResponse({
+        'success': True,
+        'replayed': replayed,
+        'recorded': sum(result['success'] for result in results),
+        'results': results,
+    })
+
 class AssetDetailByUUIDView(LoginRequiredMixin, DetailView):
     model = Asset
     template_name = 'assets/asset_detail.html'
@@ -316,123 +294,132 @@ def asset_export(request):
         format = request.GET.get('format', 'csv')
         columns = request.GET.getlist('columns')
         selected_ids = request.GET.get('selected_ids', '')
-    # Reuse AssetListView filtering logic
-    assets = Asset.objects.all()
-    # If selected_ids provided, filter by those
-    if selected_ids:
-        id_list = [int(pk) for pk in selected_ids.split(',') if pk.strip().isdigit()]
-        assets = assets.filter(pk__in=id_list)
-    else:
-        category = request.GET.get('category')
-        status = request.GET.get('status')
-        location = request.GET.get('location')
-        search = request.GET.get('search')
-        if category:
-            assets = assets.filter(category__id=category)
-            fields = AssetCategoryField.objects.filter(category_id=category)
-            for field in fields:
-                val = request.GET.get(f'dyn_{field.key}')
-                if val:
-                    if field.type == 'text':
-                        assets = assets.filter(**{f'dynamic_data__{field.key}__icontains': val})
-                    elif field.type == 'number':
-                        try:
-                            assets = assets.filter(**{f'dynamic_data__{field.key}': float(val)})
-                        except ValueError:
-                            pass
-                    elif field.type == 'date':
-                        assets = assets.filter(**{f'dynamic_data__{field.key}': val})
-        if status:
-            assets = assets.filter(status=status)
-        if location:
-            assets = assets.filter(dynamic_data__location__icontains=location)
-        if search:
-            assets = assets.filter(
-                Q(dynamic_data__name__icontains=search) |
-                Q(dynamic_data__model__icontains=search) |
-                Q(description__icontains=search)
-            )
-    # Prepare data
-    data = []
-    for asset in assets:
-        row = {}
-        # Core fields
-        row['ID'] = asset.pk
-        row['Category'] = asset.category.name
-        row['Status'] = asset.status
-        row['Assigned To'] = str(asset.assigned_to) if asset.assigned_to else ''
-        row['Created'] = asset.created_at.strftime('%Y-%m-%d %H:%M')
-        row['Updated'] = asset.updated_at.strftime('%Y-%m-%d %H:%M')
-        # Dynamic fields
-        for k, v in asset.dynamic_data.items():
-            row[k] = v
-        data.append(row)
-    # Filter columns
-    if columns:
-        data = [ {k: row.get(k, '') for k in columns} for row in data ]
-    # Large export warning
-    large_export = len(data) > 1000
+    # Reuse AssetListView filtering logic (or the selected ids)
+    filters = export_filters(request.GET, selected_ids)
+    background = (request.POST if request.method == 'POST' else request.GET).get('background') == '1'
+    if background and format in JOB_FORMATS:
+        # Rendered by the run_export_jobs worker; the client polls status_url
+        if not request.user.is_authenticated:
+            return JsonResponse({'success': False, 'error': 'Authentication required'}, status=401)
+        job = submit_export(request.user, format, columns, filters)
+        log_audit(request.user, 'export', None, f'Asset export queued as {format} (job {job.pk})')
+        return JsonResponse({'success': True, 'job': job_status(job)}, status=202)
+    assets = filtered_assets(filters)
+    # Header is fixed up front from the category schema
+    header = export_columns(columns, None if selected_ids else request.GET.get('category'))
     # Log export
     log = ExportLog.objects.create(
         user=request.user if request.user.is_authenticated else None,
         format=format,
         columns=columns,
-        filters=request.POST.dict() if request.method == 'POST' else request.GET.dict(),
+        filters=filters,
         success=True
     )
     try:
         if format == 'csv':
-            df = pd.DataFrame(data)
-            response = HttpResponse(content_type='text/csv')
+            def record_failure(error):
+                ExportLog.objects.filter(pk=log.pk).update(status='failed', success=False, error_message=str(error))
+            # Streamed in chunks: memory stays flat and bytes flow from the first row
+            response = StreamingHttpResponse(stream_csv(assets, header, on_error=record_failure), content_type='text/csv')
             response['Content-Disposition'] = f'attachment; filename="assets_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"'
-            if large_export:
-                response['X-Export-Warning'] = 'Export is very large and may take time.'
-            df.to_csv(response, index=False)
+            # No X-Export-Warning: headers go out before the row count is known,
+            # and counting upfront would cost a full scan
             log_audit(request.user, 'export', None, 'Assets exported as CSV')
             return response
-        elif format == 'xlsx':
-            df = pd.DataFrame(data)
-            response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-            response['Content-Disposition'] = f'attachment; filename="assets_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"'
-            if large_export:
-                response['X-Export-Warning'] = 'Export is very large and may take time.'
-            with pd.ExcelWriter(response, engine='xlsxwriter') as writer:
-                df.to_excel(writer, index=False, sheet_name='Assets')
-            log_audit(request.user, 'export', None, 'Assets exported as Excel')
-            return response
-        elif format == 'pdf':
-            html_string = render_to_string('assets/export_pdf.html', {
-                'assets': data,
-                'columns': columns or (data[0].keys() if data else []),
-                'logo_url': settings.STATIC_URL + 'img/logo.png',
-                'export_date': datetime.now(),
-            })
-            import os
-            fd, temp_path = tempfile.mkstemp(suffix='.pdf')
-            os.close(fd)
-            try:
-                HTML(string=html_string, base_url=request.build_absolute_uri('/')).write_pdf(temp_path)
-                with open(temp_path, 'rb') as f:
-                    pdf = f.read()
-            finally:
-                os.remove(temp_path)
-            response = HttpResponse(pdf, content_type='application/pdf')
-            response['Content-Disposition'] = f'attachment; filename="assets_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"'
-            if large_export:
-                response['X-Export-Warning'] = 'Export is very large and may take time.'
-            log_audit(request.user, 'export', None, 'Assets exported as PDF')
-            return response
-        else:
+        if format not in ('xlsx', 'pdf'):
+            log.status = 'failed'
             log.success = False
             log.error_message = 'Invalid export format'
             log.save()
             return HttpResponse('Invalid export format', status=400)
+        if format == 'xlsx':
+            # Rows stream into a temporary file (deleted when the response closes it)
+            workbook_file = tempfile.TemporaryFile()
+            row_count = xlsx.write_rows(workbook_file, header, iter_rows(assets, header), column_types(header))
+            workbook_file.seek(0)
+            response = FileResponse(workbook_file, content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+            response['Content-Disposition'] = f'attachment; filename="assets_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"'
+            if row_count > 1000:
+                response['X-Export-Warning'] = 'Export is very large and may take time.'
+            log_audit(request.user, 'export', None, 'Assets exported as Excel')
+            return response
+        # PDF: rendered in row chunks across worker processes (assets.pdf)
+        row_count = assets.count()
+        pdf_file = tempfile.TemporaryFile()
+        pdf.render_pdf(iter_rows(assets, header), header, row_count, pdf_file)
+        pdf_file.seek(0)
+        response = FileResponse(pdf_file, content_type='application/pdf')
+        response['Content-Disposition'] = f'attachment; filename="assets_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"'
+        if row_count > 1000:
+            response['X-Export-Warning'] = 'Export is very large and may take time.'
+        log_audit(request.user, 'export', None, 'Assets exported as PDF')
+        return response
     except Exception as e:
+        log.status = 'failed'
         log.success = False
         log.error_message = str(e)
         log.save()
         return HttpResponse(f'Export failed: {e}', status=500)
 
+def get_export_job(request, job_id):
+    """The export job if it belongs to the user (admins and managers see all), else None"""
+    job = ExportLog.objects.filter(pk=job_id).first()
+    if job is None or (job.user_id != request.user.pk and not is_admin_or_manager(request.user)):
+        return None
+    return job
+
+def qr_params(request, format):
+    """(box size, error correction level) from the query string, or None if invalid"""
+    try:
+        box_size = int(request.GET.get('size', qr.DEFAULT_BOX_SIZE))
+    except ValueError:
+        return None
+    error_correction = request.GET.get('ecc', qr.DEFAULT_ERROR_CORRECTION).upper()
+    if not 1 <= box_size <= qr.MAX_BOX_SIZE or error_correction not in qr.ERROR_CORRECTION:
+        return None
+    return box_size, error_correction
+
+@login_required
+@require_GET
+def asset_qr(request, uuid, format):
+    """The asset's QR code, rendered on demand; cacheable forever since it is a pure function of the URL"""
+    if format not in qr.CONTENT_TYPES:
+        return HttpResponse('Unsupported QR format', status=404)
+    params = qr_params(request, format)
+    if params is None:
+        return HttpResponse(f'size must be 1-{qr.MAX_BOX_SIZE} and ecc one of L, M, Q, H', status=400)
+    url = qr.asset_url(qr.QR_BASE_URL or request.build_absolute_uri('/'), uuid)
+    etag = qr.etag(url, format, *params)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        if not Asset.objects.filter(uuid=uuid).exists():
+            return HttpResponse('Asset not found', status=404)
+        response = HttpResponse(qr.cached_render(url, format, *params), content_type=qr.CONTENT_TYPES[format])
+        response['ETag'] = etag
+        if request.GET.get('download'):
+            response['Content-Disposition'] = f'attachment; filename="asset_{uuid}.{format}"'
+    patch_cache_control(response, private=True, max_age=qr.CACHE_MAX_AGE, immutable=True)
+    return response
+
+@login_required
+@require_GET
+def export_job_status(request, job_id):
+    job = get_export_job(request, job_id)
+    if job is None:
+        return JsonResponse({'success': False, 'error': 'Export not found.'}, status=404)
+    return JsonResponse({'success': True, 'job': job_status(job)})
+
+@login_required
+@require_GET
+def export_job_download(request, job_id):
+    job = get_export_job(request, job_id)
+    if job is None or job.status != 'done' or not job.file:
+        return JsonResponse({'success': False, 'error': 'Export not available.'}, status=404)
+    if not default_storage.exists(job.file.name):
+        return JsonResponse({'success': False, 'error': 'Export file has expired.'}, status=410)
+    filename = f'assets_{job.finished_at:%Y%m%d_%H%M%S}.{job.format}'
+    return ranged_file_response(request, job.file, filename, CONTENT_TYPES.get(job.format, 'application/octet-stream'))
+
 @login_required
 @user_passes_test(is_admin_or_manager, login_url='login')
 def download_import_template(request):
@@ -440,8 +427,10 @@ def download_import_template(request):
     category_id = request.GET.get('category')
     if not category_id:
         return HttpResponse('Category required', status=400)
-    category = AssetCategory.objects.get(pk=category_id)
-    dynamic_fields = AssetCategoryField.objects.filter(category=category)
+    category = schema.get_category(category_id)
+    if category is None:
+        return HttpResponse('Category not found', status=404)
+    dynamic_fields = schema.category_fields(category.pk)
     wb = openpyxl.Workbook()
     ws = wb.active
     # Core fields
@@ -492,121 +481,82 @@ class AssetBulkImportView(View):
 
     def get(self, request):
         # Step 1: Select category, download template
-        categories = AssetCategory.objects.all()
+        categories = schema.categories()
+        token = request.GET.get('token')
+        if token:
+            # Step 2: Preview a page of a staged upload
+            batch = staging.get_batch(token, request.user)
+            if batch is None:
+                messages.error(request, 'This import has expired. Please upload the file again.')
+                return redirect('asset_bulk_import')
+            return render(request, self.template_name, self.preview_context(request, batch, categories))
         selected_category = request.GET.get('category')
         step = request.GET.get('step', '1')
         context = {'categories': categories, 'selected_category': selected_category, 'step': step}
         return render(request, self.template_name, context)
 
+    def preview_context(self, request, batch, categories):
+        paginator = Paginator(batch.rows.order_by('position').values_list('data', 'cell_errors'), staging.PREVIEW_PAGE_SIZE)
+        page = paginator.get_page(request.GET.get('page'))
+        return {
+            'categories': categories,
+            'selected_category': str(batch.category_id),
+            'step': '2',
+            'batch': batch,
+            'import_token': batch.token,
+            'columns': batch.columns,
+            'preview_data': page.object_list,
+            'page_obj': page,
+            'errors': staging.error_messages(batch),
+        }
+
     def post(self, request):
-        # Step 2: Upload and preview file
-        categories = AssetCategory.objects.all()
+        categories = schema.categories()
         selected_category = request.POST.get('category')
         step = request.POST.get('step', '2')
-        file = request.FILES.get('import_file')
-        preview_data = []
-        errors = []
-        columns = []
-        import_file = request.POST.get('import_file')
         if step == '3':
-            # Final confirmation: import assets
-            # Re-read the file from temp storage
-            file_path = default_storage.path(import_file)
+            # Final confirmation: import the staged rows
+            batch = staging.get_batch(request.POST.get('import_token'), request.user)
+            if batch is None:
+                messages.error(request, 'This import has expired. Please upload the file again.')
+                return redirect('asset_bulk_import')
+            # Batched import: one transaction and checkpoint per batch (assets.importer)
+            started = time.monotonic()
+            log, resumed_from = importer.start_import(request.user, batch.category_id, batch.token, batch.columns, batch.rows_total)
             try:
-                wb = openpyxl.load_workbook(file_path)
-                ws = wb.active
-                columns = [cell.value for cell in next(ws.iter_rows(min_row=1, max_row=1))]
-                for row in ws.iter_rows(min_row=2, values_only=True):
-                    row_data = dict(zip(columns, row))
-                    preview_data.append(row_data)
-            except Exception as e:
-                errors.append(f'Failed to parse file: {e}')
-            dynamic_fields = AssetCategoryField.objects.filter(category_id=selected_category)
-            success_count = 0
-            fail_count = 0
-            fail_rows = []
-            with transaction.atomic():
-                for i, row in enumerate(preview_data):
-                    try:
-                        # Validate required fields
-                        for field in dynamic_fields:
-                            if field.required and not row.get(field.key):
-                                raise ValueError(f'Missing required field {field.label}')
-                        asset = Asset(
-                            category_id=selected_category,
-                            status=row.get('status', 'active'),
-                            description=row.get('description', ''),
-                        )
-                        # Assign user if provided
-                        assigned_to = row.get('assigned_to')
-                        if assigned_to:
-                            from users.models import User
-                            user_obj = User.objects.filter(username=assigned_to).first()
-                            if user_obj:
-                                asset.assigned_to = user_obj
-                                # Log assignment/transfer
-                                log_audit(request.user, ASSIGN_ACTION, asset, f'Asset assigned to {user_obj.username} via bulk import (row {i+2})', related_user=user_obj)
-                        # Dynamic fields
-                        dyn_data = {}
-                        for field in dynamic_fields:
-                            dyn_data[field.key] = row.get(field.key)
-                        asset.dynamic_data = dyn_data
-                        asset.save()
-                        success_count += 1
-                        log_audit(request.user, 'create', asset, f'Asset imported via bulk import (row {i+2})')
-                    except Exception as e:
-                        fail_count += 1
-                        fail_rows.append({'row': i+2, 'error': str(e)})
-                # Audit log
-                from assets.models import ExportLog
-                ExportLog.objects.create(
-                    user=request.user,
-                    format='import',
-                    columns=columns,
-                    filters={'category': selected_category},
-                    success=(fail_count == 0),
-                    error_message='; '.join([f"Row {r['row']}: {r['error']}" for r in fail_rows]) if fail_rows else ''
+                counts, fail_rows = importer.import_rows(
+                    staging.iter_staged(batch, resumed_from), batch.category_id, request.user, log, start=resumed_from
                 )
+            except Exception as e:
+                importer.fail_import(log, e)
+                messages.error(request, f'Import stopped: {e}. Confirm the import again to resume.')
+                return redirect(f"{reverse('asset_bulk_import')}?token={batch.token}")
+            importer.finish_import(log, fail_rows, started)
+            batch.delete()
             context = {
                 'categories': categories,
-                'selected_category': selected_category,
+                'selected_category': str(batch.category_id),
                 'step': 'done',
-                'success_count': success_count,
-                'fail_count': fail_count,
+                'resumed_from': resumed_from,
+                'success_count': counts['created'] + counts['updated'],
+                'counts': counts,
+                'fail_count': len(fail_rows),
                 'fail_rows': fail_rows,
             }
             return render(request, self.template_name, context)
+        # Step 2: Parse the upload once into the staging store, then preview it
+        file = request.FILES.get('import_file')
         if not file or not selected_category:
             messages.error(request, 'Please select a category and upload a file.')
             return render(request, self.template_name, {'categories': categories, 'selected_category': selected_category, 'step': '1'})
-        # Save file temporarily
-        tmp_path = default_storage.save('tmp/' + file.name, file)
-        file_path = default_storage.path(tmp_path)
+        staging.purge_expired()
         try:
-            wb = openpyxl.load_workbook(file_path)
-            ws = wb.active
-            columns = [cell.value for cell in next(ws.iter_rows(min_row=1, max_row=1))]
-            for row in ws.iter_rows(min_row=2, values_only=True):
-                row_data = dict(zip(columns, row))
-                preview_data.append(row_data)
+            category = schema.get_category(selected_category)
+            batch = staging.stage_upload(request.user, selected_category, file, key=category.natural_key if category else None)
         except Exception as e:
-            errors.append(f'Failed to parse file: {e}')
-        # Validate rows (basic, more in confirm step)
-        dynamic_fields = AssetCategoryField.objects.filter(category_id=selected_category)
-        for i, row in enumerate(preview_data):
-            for field in dynamic_fields:
-                if field.required and not row.get(field.key):
-                    errors.append(f'Row {i+2}: Missing required field {field.label}')
-        context = {
-            'categories': categories,
-            'selected_category': selected_category,
-            'step': step,
-            'preview_data': preview_data,
-            'columns': columns,
-            'errors': errors,
-            'import_file': tmp_path,
-        }
-        return render(request, self.template_name, context)
+            messages.error(request, f'Failed to parse file: {e}')
+            return render(request, self.template_name, {'categories': categories, 'selected_category': selected_category, 'step': '1'})
+        return redirect(f"{reverse('asset_bulk_import')}?token={batch.token}")
 
     def put(self, request):
         # Step 3: Confirm import (AJAX or form submit)
@@ -625,59 +575,58 @@ class DashboardView(LoginRequiredMixin, TemplateView):
 @login_required
 @require_GET
 def dashboard_summary_api(request):
-    from datetime import timedelta
-    from django.utils import timezone
     user = request.user
     role = getattr(user, 'role', 'user')
-    qs = Asset.objects.all()
-    if role == 'user':
-        qs = qs.filter(assigned_to=user)
-    # KPIs
-    total_assets = qs.count()
-    active_assets = qs.filter(status='active').count()
-    maintenance_assets = qs.filter(status='maintenance').count()
-    retired_assets = qs.filter(status='retired').count()
-    lost_assets = qs.filter(status='lost').count()
-    assigned_assets = qs.filter(assigned_to__isnull=False).count()
-    unassigned_assets = qs.filter(assigned_to__isnull=True).count()
-    # Warranty expiry (assuming dynamic_data has 'warranty_expiry' as ISO date string)
-    soon = timezone.now() + timedelta(days=30)
-    warranty_expiring_soon = qs.filter(dynamic_data__warranty_expiry__lte=soon.date().isoformat(), dynamic_data__warranty_expiry__gte=timezone.now().date().isoformat()).count()
-    # Transferred assets (assuming status or audit log, fallback to status='transferred' if exists)
-    transferred_assets = qs.filter(status='transferred').count() if 'transferred' in dict(Asset.STATUS_CHOICES) else 0
-    # By category
-    by_category = {}
-    for cat in AssetCategory.objects.all():
-        cat_qs = qs.filter(category=cat)
-        by_category[cat.name] = cat_qs.count()
-    # Trends (example: monthly change in total assets)
-    month_ago = timezone.now() - timedelta(days=30)
-    total_assets_month_ago = qs.filter(created_at__lte=month_ago).count()
-    total_assets_monthly_change = None
-    if total_assets_month_ago:
-        total_assets_monthly_change = f"{((total_assets - total_assets_month_ago) / total_assets_month_ago) * 100:.1f}%"
-    else:
-        total_assets_monthly_change = "N/A"
     # TODO: Consider logging dashboard summary API access for auditability
-    return JsonResponse({
-        'kpis': {
-            'total_assets': total_assets,
-            'active_assets': active_assets,
-            'maintenance_assets': maintenance_assets,
-            'retired_assets': retired_assets,
-            'lost_assets': lost_assets,
-            'assigned_assets': assigned_assets,
-            'unassigned_assets': unassigned_assets,
-            'warranty_expiring_soon': warranty_expiring_soon,
-            'transferred_assets': transferred_assets,
-        },
-        'by_category': by_category,
-        'trends': {
-            'total_assets_monthly_change': total_assets_monthly_change,
-        },
-        'role': role,
-        'user_id': user.id,
-    })
+    return JsonResponse({**dashboard.summary(user, role), 'user_id': user.id})
+
+@login_required
+@require_GET
+def dashboard_bundle(request):
+    """
+    The summary and charts of the dashboard in one response: ?charts= is a
+    comma-separated subset of dashboard.CHARTS (all by default). Served from
+    a per-scope snapshot cache with an ETag, so revalidating an unchanged
+    dashboard costs a 304 and no dashboard query.
+    """
+    user = request.user
+    role = getattr(user, 'role', 'user')
+    requested = request.GET.get('charts')
+    charts = dashboard.CHARTS
+    if requested:
+        charts = tuple(dict.fromkeys(name.strip() for name in requested.split(',') if name.strip()))
+        if not set(charts) <= set(dashboard.CHARTS):
+            return JsonResponse({'error': f"charts must be among {', '.join(dashboard.CHARTS)}"}, status=400)
+    etag = dashboard.bundle_etag(user, role, charts)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        payload = dashboard.bundle(user, role, charts)
+        response = JsonResponse({**payload, 'summary': {**payload['summary'], 'user_id': user.id}})
+        response['ETag'] = etag
+    # Always revalidate: the ETag changes whenever the data does
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+@login_required
+@require_GET
+def dashboard_events(request):
+    """
+    Server-sent events for the dashboard (assets.events), replacing polling.
+    Resumes after the Last-Event-ID an EventSource sends when reconnecting.
+    Only served under ASGI: under WSGI a stream would hold a worker thread,
+    so the answer is 204, which stops the EventSource and leaves the page
+    polling.
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+    user = request.user
+    role = getattr(user, 'role', 'user')
+    stream = events.Stream(user, role, request.headers.get('Last-Event-ID'), getattr(request, 'user_session', None))
+    response = StreamingHttpResponse(events.async_stream(stream), content_type='text/event-stream')
+    patch_cache_control(response, private=True, no_cache=True)
+    # Keep proxies such as nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
 @login_required
 @require_GET
@@ -730,119 +679,16 @@ def dashboard_scan_logs_api(request):
 @login_required
 @require_GET
 def dashboard_chart_data_api(request):
-    from django.db.models import Count
-    from django.utils import timezone
-    import calendar
-    import datetime
     user = request.user
     role = getattr(user, 'role', 'user')
-    qs = Asset.objects.all()
-    if role == 'user':
-        qs = qs.filter(assigned_to=user)
     chart = request.GET.get('chart')
-    if not chart or chart not in {'category', 'acquisition', 'department', 'location', 'depreciation'}:
+    if not chart or chart not in dashboard.CHARTS:
         return JsonResponse({'error': 'Invalid or missing chart type'}, status=400)
-    data = []
-    labels = []
-    # 1. Assets by Category
-    if chart == 'category':
-        agg = qs.values('category__name').annotate(count=Count('id')).order_by('-count')
-        labels = [a['category__name'] for a in agg]
-        data = [a['count'] for a in agg]
-        return JsonResponse({'chart': 'assets_by_category', 'labels': labels, 'data': data, 'role': role})
-    # 2. Asset Acquisition Over Time (last 12 months)
-    elif chart == 'acquisition':
-        now = timezone.now()
-        months = [(now - datetime.timedelta(days=30*i)).strftime('%Y-%m') for i in reversed(range(12))]
-        month_counts = {m: 0 for m in months}
-        for asset in qs:
-            m = asset.created_at.strftime('%Y-%m')
-            if m in month_counts:
-                month_counts[m] += 1
-        labels = list(month_counts.keys())
-        data = list(month_counts.values())
-        return JsonResponse({'chart': 'acquisition_over_time', 'labels': labels, 'data': data, 'role': role})
-    # 3. Assets by Department (dynamic field)
-    elif chart == 'department':
-        from django.db.models import Count, Value as V
-        from django.db.models.functions import Coalesce
-        from django.db.models.expressions import RawSQL
-        try:
-            # Use KeyTextTransform for JSONField key extraction (Django >=3.1)
-            from django.db.models.functions import Cast
-            from django.db.models import CharField
-            qs_with_dept = qs.annotate(
-                department=Cast('dynamic_data__department', CharField())
-            )
-            agg = qs_with_dept.values('department').annotate(count=Count('id')).order_by('-count')
-            labels = [a['department'] or 'Unspecified' for a in agg]
-            data = [a['count'] for a in agg]
-        except Exception:
-            # Fallback to Python loop if ORM fails
-            dept_counts = {}
-            for asset in qs:
-                dept = asset.dynamic_data.get('department', 'Unspecified')
-                dept_counts[dept] = dept_counts.get(dept, 0) + 1
-            labels = list(dept_counts.keys())
-            data = list(dept_counts.values())
-        return JsonResponse({'chart': 'assets_by_department', 'labels': labels, 'data': data, 'role': role})
-    # 4. Assets by Location (dynamic field)
-    elif chart == 'location':
-        from django.db.models import Count, Value as V
-        from django.db.models.functions import Coalesce
-        from django.db.models.expressions import RawSQL
-        try:
-            from django.db.models.functions import Cast
-            from django.db.models import CharField
-            qs_with_loc = qs.annotate(
-                location=Cast('dynamic_data__location', CharField())
-            )
-            agg = qs_with_loc.values('location').annotate(count=Count('id')).order_by('-count')
-            labels = [a['location'] or 'Unspecified' for a in agg]
-            data = [a['count'] for a in agg]
-        except Exception:
-            loc_counts = {}
-            for asset in qs:
-                loc = asset.dynamic_data.get('location', 'Unspecified')
-                loc_counts[loc] = loc_counts.get(loc, 0) + 1
-            labels = list(loc_counts.keys())
-            data = list(loc_counts.values())
-        return JsonResponse({'chart': 'assets_by_location', 'labels': labels, 'data': data, 'role': role})
-    # 5. Depreciation/Value Trend (robust, using explicit depreciation fields)
-    elif chart == 'depreciation':
-        now = timezone.now()
-        months = [(now - datetime.timedelta(days=30*i)).replace(day=1).strftime('%Y-%m') for i in reversed(range(12))]
-        month_values = {m: 0 for m in months}
-        has_value_data = False
-        for asset in qs:
-            # Only include assets with all required depreciation fields
-            if not (asset.purchase_value and asset.purchase_date and asset.useful_life_years):
-                continue
-            if asset.depreciation_method != 'straight_line':
-                continue  # Only support straight-line for now
-            purchase_value = float(asset.purchase_value)
-            purchase_date = asset.purchase_date
-            useful_life_months = asset.useful_life_years * 12
-            monthly_depreciation = purchase_value / useful_life_months
-            for m in months:
-                year, month = map(int, m.split('-'))
-                period_start = datetime.datetime(year, month, 1, tzinfo=now.tzinfo)
-                if purchase_date > period_start.date():
-                    continue  # Asset not yet acquired
-                months_elapsed = (period_start.year - purchase_date.year) * 12 + (period_start.month - purchase_date.month)
-                if months_elapsed < 0:
-                    continue
-                depreciated_value = max(purchase_value - monthly_depreciation * months_elapsed, 0)
-                # Asset cannot depreciate below zero
-                month_values[m] += depreciated_value
-                has_value_data = True
-        labels = list(month_values.keys())
-        data = list(month_values.values())
-        if not has_value_data:
-            return JsonResponse({'chart': 'depreciation_trend', 'labels': labels, 'data': [], 'role': role, 'message': 'No depreciable asset data available for trend.'})
-        return JsonResponse({'chart': 'depreciation_trend', 'labels': labels, 'data': data, 'role': role})
-    # Should not reach here due to earlier validation
-    return JsonResponse({'error': 'Invalid chart type'}, status=400)
+    # acquisition takes ?granularity=week|month|quarter, and ?periods=N or ?start=&end= (yyyy-mm-dd)
+    try:
+        return JsonResponse(dashboard.chart_data(chart, user, role, request.GET))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
 
 def paginate_logs(logs, request, default_size=10, max_size=50):
     try:
@@ -852,6 +698,9 @@ def paginate_logs(logs, request, default_size=10, max_size=50):
     except Exception:
         page = 1
         page_size = default_size
+    if is_cursor_request(request.GET):
+        # Keyset mode: no COUNT(*) or OFFSET, see assets.pagination
+        return cursor_paginate(logs, request.GET, 'timestamp', page_size), None
     paginator = Paginator(logs, page_size)
     try:
         page_obj = paginator.page(page)
@@ -859,6 +708,11 @@ def paginate_logs(logs, request, default_size=10, max_size=50):
         page_obj = paginator.page(paginator.num_pages)
     return page_obj, paginator
 
+def pagination_meta(page_obj, paginator):
+    if paginator is None:
+        return page_obj.meta()
+    return {'page': page_obj.number, 'num_pages': paginator.num_pages, 'total': paginator.count}
+
 @login_required
 @require_GET
 def recent_added_assets_api(request):
@@ -878,7 +732,7 @@ def recent_added_assets_api(request):
         }
         for log in page_obj
     ]
-    return JsonResponse({'recent_added_assets': data, 'page': page_obj.number, 'num_pages': paginator.num_pages, 'total': paginator.count})
+    return JsonResponse({'recent_added_assets': data, **pagination_meta(page_obj, paginator)})
 
 @login_required
 @require_GET
@@ -900,7 +754,7 @@ def recent_scans_api(request):
         }
         for log in page_obj
     ]
-    return JsonResponse({'recent_scans': data, 'page': page_obj.number, 'num_pages': paginator.num_pages, 'total': paginator.count})
+    return JsonResponse({'recent_scans': data, **pagination_meta(page_obj, paginator)})
 
 @login_required
 @require_GET
@@ -922,7 +776,7 @@ def recent_transfers_api(request):
         }
         for log in page_obj
     ]
-    return JsonResponse({'recent_transfers': data, 'page': page_obj.number, 'num_pages': paginator.num_pages, 'total': paginator.count})
+    return JsonResponse({'recent_transfers': data, **pagination_meta(page_obj, paginator)})
 
 @login_required
 @require_GET
@@ -943,7 +797,7 @@ def recent_maintenance_api(request):
         }
         for log in page_obj
     ]
-    return JsonResponse({'recent_maintenance': data, 'page': page_obj.number, 'num_pages': paginator.num_pages, 'total': paginator.count})
+    return JsonResponse({'recent_maintenance': data, **pagination_meta(page_obj, paginator)})
 
 @login_required
 @require_GET
@@ -979,7 +833,7 @@ def full_audit_log_api(request):
         }
         for log in page_obj
     ]
-    return JsonResponse({'audit_log': data, 'page': page_obj.number, 'num_pages': paginator.num_pages, 'total': paginator.count})
+    return JsonResponse({'audit_log': data, **pagination_meta(page_obj, paginator)})
 
 @login_required
 def user_assets_api(request):
@@ -1031,18 +885,16 @@ def api_create_category(request):
 @login_required
 @user_passes_test(lambda u: u.is_authenticated and u.role == 'admin')
 def api_categories(request):
-    categories = list(AssetCategory.objects.all().order_by('name').values('id', 'name'))
+    categories = [{'id': c.pk, 'name': c.name} for c in schema.categories()]
     return JsonResponse({'success': True, 'categories': categories})
 
 @login_required
 @user_passes_test(lambda u: u.is_authenticated and u.role == 'admin')
 @require_GET
 def api_category_fields(request, category_id):
-    try:
-        category = AssetCategory.objects.get(pk=category_id)
-    except AssetCategory.DoesNotExist:
+    if schema.get_category(category_id) is None:
         return JsonResponse({'success': False, 'error': 'Category not found.'}, status=404)
-    fields = AssetCategoryField.objects.filter(category=category).order_by('label')
+    fields = sorted(schema.category_fields(category_id), key=lambda f: f.label)
     data = [
         {
             'id': f.id,
@@ -1050,6 +902,7 @@ def api_category_fields(request, category_id):
             'label': f.label,
             'type': f.type,
             'required': f.required,
+            'indexed': f.indexed,
         } for f in fields
     ]
     return JsonResponse({'success': True, 'fields': data})
@@ -1069,15 +922,16 @@ def api_create_field(request, category_id):
     label = request.POST.get('label', '').strip()
     field_type = request.POST.get('type', '').strip()
     required = request.POST.get('required', 'false') == 'true'
+    indexed = request.POST.get('indexed', 'false') == 'true'
     if not key or not label or field_type not in dict(AssetCategoryField.FIELD_TYPES):
         return JsonResponse({'success': False, 'error': 'Invalid field data.'}, status=400)
     if AssetCategoryField.objects.filter(category=category, key__iexact=key).exists():
         return JsonResponse({'success': False, 'error': 'Field key must be unique within the category.'}, status=400)
     field = AssetCategoryField.objects.create(
-        category=category, key=key, label=label, type=field_type, required=required
+        category=category, key=key, label=label, type=field_type, required=required, indexed=indexed
     )
     log_audit(request.user, 'create', None, f'Dynamic field created: {label} ({key}) in category {category.name}')
-    return JsonResponse({'success': True, 'field': {'id': field.id, 'key': field.key, 'label': field.label, 'type': field.type, 'required': field.required}})
+    return JsonResponse({'success': True, 'field': {'id': field.id, 'key': field.key, 'label': field.label, 'type': field.type, 'required': field.required, 'indexed': field.indexed}})
 
 @login_required
 @user_passes_test(lambda u: u.is_authenticated and u.role == 'admin')
@@ -1098,9 +952,11 @@ def api_update_field(request, field_id):
     field.label = label
     field.type = field_type
     field.required = required
+    if 'indexed' in request.POST:
+        field.indexed = request.POST.get('indexed') == 'true'
     field.save()
     log_audit(request.user, 'update', None, f'Dynamic field updated: {label} ({field.key}) in category {field.category.name}')
-    return JsonResponse({'success': True, 'field': {'id': field.id, 'key': field.key, 'label': field.label, 'type': field.type, 'required': field.required}})
+    return JsonResponse({'success': True, 'field': {'id': field.id, 'key': field.key, 'label': field.label, 'type': field.type, 'required': field.required, 'indexed': field.indexed}})
 
 @login_required
 @user_passes_test(lambda u: u.is_authenticated and u.role == 'admin')
@@ -0,0 +1,89 @@
+"""
+Streaming spreadsheet writer.
+
+Rows are written to xlsxwriter in constant_memory mode, which flushes each
+row to a temporary file as soon as the next one starts, so memory use does not
+grow with the row count. The workbook itself is assembled in a file (a path or
+an open temporary file), never in a BytesIO. Exports, background export jobs
+and reports all write through ``write_rows``.
+
+Columns can be typed: ``number`` and ``date`` cells are written as real
+numbers and dates (so Excel can sort, sum and filter them); values that do not
+parse, and infinities and NaN, which xlsx cannot hold, stay text.
+"""
+import datetime
+import decimal
+import math
+
+import xlsxwriter
+
+PROGRESS_EVERY = 1000
+
+
+def parse_number(value):
+    if value in (None, '') or isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    try:
+        number = float(value) if isinstance(value, float) else float(str(value).strip())
+    except ValueError:
+        return None
+    return number if math.isfinite(number) else None
+
+
+def parse_date(value):
+    if value in (None, ''):
+        return None
+    if isinstance(value, datetime.datetime):
+        return value.replace(tzinfo=None)
+    if isinstance(value, datetime.date):
+        return value
+    try:
+        return datetime.date.fromisoformat(str(value)[:10])
+    except ValueError:
+        return None
+
+
+def write_rows(target, header, rows, column_types=None, sheet_name='Assets', progress=None):
+    """
+    Write ``header`` and ``rows`` (an iterable of sequences) to ``target``.
+
+    ``target`` is a path or a binary file object. ``column_types`` maps column
+    names to 'number' or 'date'. ``progress`` is called with the row count
+    every PROGRESS_EVERY rows. Returns the number of data rows written.
+    """
+    workbook = xlsxwriter.Workbook(target, {
+        'constant_memory': True,
+        # Cell text is data: never turn it into formulas or hyperlinks
+        'strings_to_formulas': False,
+        'strings_to_urls': False,
+    })
+    worksheet = workbook.add_worksheet(sheet_name)
+    date_format = workbook.add_format({'num_format': 'yyyy-mm-dd'})
+    worksheet.write_row(0, 0, header, workbook.add_format({'bold': True}))
+    column_types = column_types or {}
+    types = [column_types.get(name) for name in header]
+    count = 0
+    try:
+        for count, row in enumerate(rows, 1):
+            for col, value in enumerate(row):
+                column_type = types[col] if col < len(types) else None
+                if column_type == 'number':
+                    number = parse_number(value)
+                    if number is not None:
+                        worksheet.write_number(count, col, number)
+                        continue
+                elif column_type == 'date':
+                    date = parse_date(value)
+                    if date is not None:
+                        worksheet.write_datetime(count, col, date, date_format)
+                        continue
+                if isinstance(value, (list, dict)) or (isinstance(value, (float, decimal.Decimal)) and not math.isfinite(value)):
+                    value = str(value)
+                worksheet.write(count, col, value)
+            if progress and count % PROGRESS_EVERY == 0:
+                progress(count)
+    finally:
+        workbook.close()
+    return count
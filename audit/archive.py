@@ -0,0 +1,158 @@
+"""
+Audit log archival.
+
+AuditLog holds the last AUDIT_RETENTION_MONTHS months (plus the current
+one). ``manage.py archive_audit_logs`` moves older entries, a batch per
+transaction, into ArchivedAuditLog, a table with the same columns, and adds
+them to AuditDailyRollup: entries per day, action, user and asset. With
+AUDIT_ARCHIVE_RETENTION_MONTHS set, it also deletes archived entries older
+than that, so only their rollups remain.
+
+The feeds and APIs read the hot table alone. ``query`` adds the archive only
+when the requested range starts before the newest archived entry, or is
+bounded by an end alone, and ``daily_counts`` combines rollups with a live
+count of the hot table, so counts over any range stay complete after
+archiving.
+
+The archive is one table with a (timestamp, id) index, not per-month
+partitions: it works the same on SQLite and PostgreSQL and needs no schema
+changes as months go by.
+"""
+import datetime
+import logging
+from collections import Counter
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import ArchivedAuditLog, AuditDailyRollup, AuditLog
+
+logger = logging.getLogger(__name__)
+
+AUDIT_RETENTION_MONTHS = getattr(settings, 'AUDIT_RETENTION_MONTHS', 6)
+AUDIT_ARCHIVE_RETENTION_MONTHS = getattr(settings, 'AUDIT_ARCHIVE_RETENTION_MONTHS', None)
+ARCHIVE_BATCH_SIZE = 2000
+# AuditLog columns, in ArchivedAuditLog's order
+COLUMNS = ('id', 'user_id', 'action', 'asset_id', 'timestamp', 'details', 'related_user_id', 'related_asset_id', 'metadata')
+
+
+def month_cutoff(months, today=None):
+    """Local midnight starting the month ``months`` months before the current one"""
+    today = today or timezone.localdate()
+    index = today.year * 12 + today.month - 1 - months
+    first = datetime.date(index // 12, index % 12 + 1, 1)
+    return timezone.make_aware(datetime.datetime.combine(first, datetime.time.min))
+
+
+def add_rollups(counts):
+    """Add ``counts``, a mapping of (day, action, user id, asset id) to entries, to the rollups"""
+    for (day, action, user, asset), count in sorted(counts.items()):
+        rows = AuditDailyRollup.objects.filter(day=day, action=action, user=user, asset=asset)
+        if rows.update(count=F('count') + count):
+            continue
+        try:
+            with transaction.atomic():
+                AuditDailyRollup.objects.create(day=day, action=action, user=user, asset=asset, count=count)
+        except IntegrityError:
+            # Created concurrently
+            rows.update(count=F('count') + count)
+
+
+def archive_batch(cutoff, batch_size=ARCHIVE_BATCH_SIZE):
+    """Move the oldest ``batch_size`` entries before ``cutoff`` to the archive. Returns how many moved."""
+    with transaction.atomic():
+        ids = list(AuditLog.objects.filter(timestamp__lt=cutoff).order_by('timestamp', 'id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return 0
+        entries = AuditLog.objects.filter(id__in=ids)
+        ArchivedAuditLog.objects.bulk_create([
+            ArchivedAuditLog(**dict(zip(COLUMNS, row))) for row in entries.values_list(*COLUMNS)
+        ])
+        daily = (
+            entries.annotate(day=TruncDate('timestamp', tzinfo=timezone.get_current_timezone()))
+            .values_list('day', 'action', 'user_id', 'asset_id').annotate(count=Count('id')).order_by()
+        )
+        add_rollups(Counter({(day, action, user or 0, asset or 0): count for day, action, user, asset, count in daily}))
+        entries.delete()
+    return len(ids)
+
+
+def archive(months=AUDIT_RETENTION_MONTHS, batch_size=ARCHIVE_BATCH_SIZE):
+    """Archive every entry older than the last ``months`` months. Returns how many moved."""
+    cutoff = month_cutoff(months)
+    moved = 0
+    while True:
+        count = archive_batch(cutoff, batch_size)
+        if not count:
+            break
+        moved += count
+    if moved:
+        logger.info('Archived %s audit entries before %s', moved, cutoff.date())
+    return moved
+
+
+def purge_archive(months, batch_size=ARCHIVE_BATCH_SIZE):
+    """Delete archived entries older than ``months`` months; their rollups stay. Returns how many."""
+    cutoff = month_cutoff(months)
+    purged = 0
+    while True:
+        ids = list(ArchivedAuditLog.objects.filter(timestamp__lt=cutoff).values_list('id', flat=True)[:batch_size])
+        if not ids:
+            break
+        ArchivedAuditLog.objects.filter(id__in=ids).delete()
+        purged += len(ids)
+    if purged:
+        logger.info('Purged %s archived audit entries before %s', purged, cutoff.date())
+    return purged
+
+
+def archive_boundary():
+    """Timestamp of the newest archived entry, or None"""
+    return ArchivedAuditLog.objects.aggregate(newest=Max('timestamp'))['newest']
+
+
+def query(q=Q(), since=None, until=None):
+    """
+    AuditLog entries matching ``q`` between ``since`` and ``until``
+    (datetimes, both optional). Archived entries are included, as AuditLog
+    instances of a union, only when the range reaches into the archive:
+    ``since`` is not after the newest archived entry, or only ``until`` is
+    given. A union only supports ordering, slicing and counting.
+    """
+    bounds = {}
+    if since is not None:
+        bounds['timestamp__gte'] = since
+    if until is not None:
+        bounds['timestamp__lte'] = until
+    hot = AuditLog.objects.filter(q, **bounds)
+    boundary = archive_boundary() if since is not None or until is not None else None
+    if boundary is None or (since is not None and since > boundary):
+        return hot
+    return hot.union(ArchivedAuditLog.objects.filter(q, **bounds), all=True)
+
+
+def daily_counts(since, until, by='action', user=None):
+    """
+    Entries per day and ``by`` ('action', 'user' or 'asset') for the dates
+    ``since`` to ``until``, from the rollups and the hot table together:
+    {(day, value): count}. ``user`` limits them to one user's entries.
+    """
+    rollups = AuditDailyRollup.objects.filter(day__gte=since, day__lte=until)
+    tz = timezone.get_current_timezone()
+    hot = AuditLog.objects.filter(
+        timestamp__gte=timezone.make_aware(datetime.datetime.combine(since, datetime.time.min)),
+        timestamp__lt=timezone.make_aware(datetime.datetime.combine(until + datetime.timedelta(days=1), datetime.time.min)),
+    )
+    if user is not None:
+        rollups = rollups.filter(user=user.pk)
+        hot = hot.filter(user=user)
+    counts = Counter()
+    for day, value, count in rollups.values_list('day', by).annotate(total=Sum('count')).order_by():
+        counts[day, value or None] += count
+    field = by if by == 'action' else f'{by}_id'
+    for day, value, count in hot.annotate(day=TruncDate('timestamp', tzinfo=tz)).values_list('day', field).annotate(total=Count('id')).order_by():
+        counts[day, value] += count
+    return dict(counts)
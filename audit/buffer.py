@@ -0,0 +1,288 @@
+"""
+Write-behind buffer for audit entries.
+
+``log_audit`` used to INSERT every entry on the request path. In 'buffered'
+mode (AUDIT_LOG_MODE) it hands the entry to this process's AuditBuffer once
+the surrounding transaction commits, and a background thread writes queued
+entries with one bulk_create every AUDIT_FLUSH_INTERVAL seconds, or sooner
+once AUDIT_FLUSH_SIZE are waiting. Entries keep the time they were logged,
+and ones pointing at users or assets deleted in the meantime are stored
+with those references cleared, as the foreign keys' SET_NULL would have
+done. When AUDIT_BUFFER_MAX entries are queued, the caller writes them
+itself rather than letting the queue grow.
+
+For crash safety every entry is also appended to a spool file in
+AUDIT_SPOOL_DIR before it is queued. Each flush moves the spool aside as a
+batch file and deletes it once the batch is written; a failed write leaves
+the file to be retried. Spool and batch files of processes that died are
+replayed by the next flush of any process (not on Windows, where process
+liveness is not checked), or by ``manage.py replay_audit_spool``. Delivery
+is at least once: a crash between a write and the deletion of its batch file
+replays the batch.
+
+'sync' mode writes each entry immediately, as tests expect.
+"""
+import atexit
+import datetime
+import itertools
+import json
+import logging
+import os
+import threading
+from collections import deque
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import close_old_connections, transaction
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .models import AuditLog
+
+logger = logging.getLogger(__name__)
+
+AUDIT_FLUSH_SIZE = getattr(settings, 'AUDIT_FLUSH_SIZE', 200)
+AUDIT_FLUSH_INTERVAL = getattr(settings, 'AUDIT_FLUSH_INTERVAL', 2)
+AUDIT_BUFFER_MAX = getattr(settings, 'AUDIT_BUFFER_MAX', 10000)
+AUDIT_SPOOL_DIR = Path(getattr(settings, 'AUDIT_SPOOL_DIR', Path(settings.BASE_DIR) / 'logs' / 'audit-spool'))
+
+# Sent with the AuditLog rows of each buffered write, which bulk_create saves without post_save
+audit_flushed = Signal()
+
+def buffered():
+    return getattr(settings, 'AUDIT_LOG_MODE', 'buffered') == 'buffered'
+
+
+def record(user, action, asset=None, details='', related_user=None, related_asset=None, metadata=None):
+    """An audit entry as a JSON-serializable dict"""
+    return {
+        'user_id': getattr(user, 'pk', None),
+        'action': action,
+        'asset_id': asset.pk if asset is not None else None,
+        'details': details,
+        'related_user_id': related_user.pk if related_user is not None else None,
+        'related_asset_id': related_asset.pk if related_asset is not None else None,
+        'metadata': metadata or {},
+        'timestamp': timezone.now().isoformat(),
+    }
+
+
+def write(records):
+    """Store ``records`` in one bulk_create. Returns the rows written."""
+    if not records:
+        return []
+    user_ids = {r[key] for r in records for key in ('user_id', 'related_user_id') if r[key]}
+    asset_ids = {r[key] for r in records for key in ('asset_id', 'related_asset_id') if r[key]}
+    # Only the ids that still exist; AuditLog.asset is an FK to assets.Asset
+    users = set(get_user_model().objects.filter(pk__in=user_ids).values_list('pk', flat=True)) if user_ids else set()
+    Asset = AuditLog._meta.get_field('asset').related_model
+    assets = set(Asset.objects.filter(pk__in=asset_ids).values_list('pk', flat=True)) if asset_ids else set()
+    rows = []
+    for r in records:
+        rows.append(AuditLog(
+            user_id=r['user_id'] if r['user_id'] in users else None,
+            action=r['action'],
+            asset_id=r['asset_id'] if r['asset_id'] in assets else None,
+            details=r['details'],
+            related_user_id=r['related_user_id'] if r['related_user_id'] in users else None,
+            related_asset_id=r['related_asset_id'] if r['related_asset_id'] in assets else None,
+            metadata=r['metadata'],
+            timestamp=datetime.datetime.fromisoformat(r['timestamp']),
+        ))
+    with transaction.atomic():
+        AuditLog.objects.bulk_create(rows)
+    audit_flushed.send(sender=AuditLog, logs=rows)
+    return rows
+
+
+def read_spool(path):
+    records = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                # A line cut short by a crash
+                logger.warning('Skipping unreadable audit spool line in %s', path)
+    return records
+
+
+def process_alive(pid):
+    if os.name == 'nt':
+        # os.kill would terminate the process; assume it is alive
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def file_pid(path):
+    # audit-<pid>.spool, audit-<pid>-<n>.batch
+    try:
+        return int(path.name.split('.')[0].split('-')[1])
+    except (IndexError, ValueError):
+        return None
+
+
+def recover(directory=None, own=False, skip=()):
+    """
+    Write the entries of spool and batch files left by dead processes, and
+    with ``own`` this process's failed batches too, except those in ``skip``.
+    Returns entries written.
+    """
+    directory = Path(directory or AUDIT_SPOOL_DIR)
+    if not directory.is_dir():
+        return 0
+    written = 0
+    pid = os.getpid()
+    for path in sorted(directory.glob('audit-*')):
+        owner = file_pid(path)
+        if owner is None or path.suffix not in ('.spool', '.batch'):
+            continue
+        if owner == pid:
+            if not own or path.suffix == '.spool' or path in skip:
+                continue
+        elif process_alive(owner):
+            continue
+        # Claimed by renaming, so two processes never replay the same file
+        claimed = path.with_name(f'audit-{pid}-{next(_claims)}.batch')
+        try:
+            os.rename(path, claimed)
+        except OSError:
+            continue
+        try:
+            records = read_spool(claimed)
+            write(records)
+        except Exception:
+            logger.exception('Could not replay audit spool %s', claimed)
+            continue
+        claimed.unlink()
+        written += len(records)
+    if written:
+        logger.warning('Replayed %s audit entries from %s', written, directory)
+    return written
+
+
+_claims = itertools.count()
+
+
+class AuditBuffer:
+    """This process's queue of audit entries, its spool file and its flusher thread"""
+
+    def __init__(self, directory=None, flush_size=AUDIT_FLUSH_SIZE, interval=AUDIT_FLUSH_INTERVAL, max_size=AUDIT_BUFFER_MAX, background=True):
+        self.directory = Path(directory or AUDIT_SPOOL_DIR)
+        # Without a background flusher, entries wait for flush()
+        self.background = background
+        self.flush_size = flush_size
+        self.interval = interval
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+        self._queue = deque()
+        self._spool = None
+        self._thread = None
+        self._pid = None
+        self._closed = False
+        # Batch files being written right now
+        self._writing = set()
+
+    @property
+    def spool_path(self):
+        return self.directory / f'audit-{os.getpid()}.spool'
+
+    def _reset_after_fork(self):
+        # A forked child inherits the parent's queue and spool handle, which stay the parent's to flush
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._queue.clear()
+            self._spool = None
+            self._thread = None
+
+    def put(self, entry):
+        with self._lock:
+            self._reset_after_fork()
+            if self._spool is None:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                self._spool = open(self.spool_path, 'a', encoding='utf-8')
+            self._spool.write(json.dumps(entry) + '\n')
+            self._spool.flush()
+            self._queue.append(entry)
+            full = len(self._queue) >= self.max_size
+            if len(self._queue) >= self.flush_size:
+                self._ready.notify()
+            if self.background and self._thread is None and not self._closed:
+                self._thread = threading.Thread(target=self._run, name='audit-flusher', daemon=True)
+                self._thread.start()
+        if full:
+            # Back-pressure: the caller writes the backlog instead of queuing more
+            self.flush()
+
+    def _drain(self):
+        """Take the queued entries and move their spool file aside. Call with the lock held."""
+        if not self._queue:
+            return [], None
+        records = list(self._queue)
+        self._queue.clear()
+        self._spool.close()
+        self._spool = None
+        batch = self.directory / f'audit-{os.getpid()}-{next(_claims)}.batch'
+        os.rename(self.spool_path, batch)
+        return records, batch
+
+    def flush(self):
+        """Write the queued entries now. Returns how many."""
+        with self._lock:
+            self._reset_after_fork()
+            records, batch = self._drain()
+            if not records:
+                return 0
+            self._writing.add(batch)
+        try:
+            write(records)
+        except Exception:
+            logger.exception('Could not write %s audit entries; kept in %s', len(records), batch)
+            return 0
+        else:
+            batch.unlink()
+        finally:
+            with self._lock:
+                self._writing.discard(batch)
+        return len(records)
+
+    def _run(self):
+        recover(self.directory)
+        while True:
+            with self._lock:
+                if len(self._queue) < self.flush_size and not self._closed:
+                    self._ready.wait(self.interval)
+                if self._closed:
+                    return
+            close_old_connections()
+            try:
+                if self.flush():
+                    with self._lock:
+                        writing = set(self._writing)
+                    recover(self.directory, own=True, skip=writing)
+            except Exception:
+                logger.exception('Audit flusher failed')
+
+    def close(self):
+        """Stop the flusher and write what is left"""
+        with self._lock:
+            self._closed = True
+            self._ready.notify()
+        self.flush()
+
+
+buffer = AuditBuffer()
+atexit.register(buffer.close)
+
+
+def log(entry):
+    """Buffer ``entry``, a ``record``, once the current transaction commits"""
+    transaction.on_commit(lambda: buffer.put(entry))
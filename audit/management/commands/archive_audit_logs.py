@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from audit import archive
+
+class Command(BaseCommand):
+    help = 'Move audit entries older than the retention window to the archive table, leaving daily rollups. Meant to run periodically (e.g. nightly from cron).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months', type=int, default=archive.AUDIT_RETENTION_MONTHS, help='Months to keep in the audit log besides the current one')
+        parser.add_argument('--purge-months', type=int, default=archive.AUDIT_ARCHIVE_RETENTION_MONTHS, help='Also delete archived entries older than this many months (rollups stay)')
+        parser.add_argument('--batch-size', type=int, default=archive.ARCHIVE_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        moved = archive.archive(options['months'], options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Archived {moved} audit entries.'))
+        if options['purge_months'] is not None:
+            purged = archive.purge_archive(options['purge_months'], options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'Purged {purged} archived audit entries.'))
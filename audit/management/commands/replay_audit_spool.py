@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from audit import buffer
+
+class Command(BaseCommand):
+    help = 'Write the audit entries left in the spool directory by processes that exited without flushing them. Run after a crash or restart.'
+
+    def handle(self, *args, **options):
+        written = buffer.recover()
+        self.stdout.write(self.style.SUCCESS(f'Replayed {written} audit entries.'))
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.4 on 2026-10-18 01:21
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0011_keyset_pagination_indexes'),
+        ('audit', '0003_auditlog_metadata_auditlog_related_asset_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['timestamp', 'id'], name='audit_log_ts_id_idx'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.4 on 2026-10-18 02:32
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0020_depreciation_snapshots'),
+        ('audit', '0005_auditlog_timestamp_default'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('action', models.CharField(max_length=20)),
+                ('user', models.PositiveIntegerField(default=0)),
+                ('asset', models.PositiveIntegerField(default=0)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'day'], name='audit_rollup_user_day_idx'), models.Index(fields=['asset', 'day'], name='audit_rollup_asset_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('day', 'action', 'user', 'asset'), name='audit_rollup_key_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedAuditLog',
+            fields=[
+                ('id', models.BigIntegerField(help_text='Id the entry had in AuditLog', primary_key=True, serialize=False)),
+                ('action', models.CharField(choices=[('view', 'View'), ('edit', 'Edit'), ('move', 'Move'), ('delete', 'Delete'), ('create', 'Create'), ('add', 'Add'), ('assign', 'Assign/Transfer'), ('scan', 'Scan'), ('maintenance', 'Maintenance'), ('error', 'Error'), ('login', 'Login'), ('logout', 'Logout')], max_length=20)),
+                ('timestamp', models.DateTimeField()),
+                ('details', models.TextField(blank=True)),
+                ('metadata', models.JSONField(blank=True, default=dict)),
+                ('asset', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='assets.asset')),
+                ('related_asset', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='assets.asset')),
+                ('related_user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'audit_log_archive',
+                'indexes': [models.Index(fields=['timestamp', 'id'], name='audit_archive_ts_id_idx')],
+            },
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 from assets.models import Asset
 
 # Create your models here.
@@ -19,15 +20,72 @@ class AuditLog(models.Model):
         ('login', 'Login'),
         ('logout', 'Logout'),
     ]
-    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    # Not indexed on their own: the (user, timestamp) and (asset, timestamp) indexes lead with them
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, db_index=False)
     action = models.CharField(max_length=20, choices=ACTION_CHOICES)
-    asset = models.ForeignKey(Asset, on_delete=models.SET_NULL, null=True, blank=True)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    asset = models.ForeignKey(Asset, on_delete=models.SET_NULL, null=True, blank=True, db_index=False)
+    # Not auto_now_add: batched device scans carry their own scan times (assets.scans)
+    timestamp = models.DateTimeField(default=timezone.now)
     details = models.TextField(blank=True)
     # Enterprise enhancements
     related_user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='related_audit_logs')
     related_asset = models.ForeignKey(Asset, on_delete=models.SET_NULL, null=True, blank=True, related_name='related_audit_logs')
     metadata = models.JSONField(default=dict, blank=True, help_text="Structured metadata for advanced filtering/grouping")
 
+    class Meta:
+        indexes = [
+            # Keyset pagination of the audit feeds (assets.pagination)
+            models.Index(fields=['timestamp', 'id'], name='audit_log_ts_id_idx'),
+            # Newest first within one action, user or asset (audit.queries)
+            models.Index(fields=['action', 'timestamp', 'id'], name='audit_log_action_ts_idx'),
+            models.Index(fields=['user', 'timestamp', 'id'], name='audit_log_user_ts_idx'),
+            models.Index(fields=['asset', 'timestamp', 'id'], name='audit_log_asset_ts_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user} {self.action} {self.asset} at {self.timestamp}"
+
+
+class ArchivedAuditLog(models.Model):
+    """An AuditLog row moved out of the hot table by archive_audit_logs (see audit.archive)."""
+    # Same columns in the same order as AuditLog, so the two tables can be queried as one
+    id = models.BigIntegerField(primary_key=True, help_text='Id the entry had in AuditLog')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    action = models.CharField(max_length=20, choices=AuditLog.ACTION_CHOICES)
+    asset = models.ForeignKey(Asset, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    timestamp = models.DateTimeField()
+    details = models.TextField(blank=True)
+    related_user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    related_asset = models.ForeignKey(Asset, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    metadata = models.JSONField(default=dict, blank=True)
+
+    class Meta:
+        db_table = 'audit_log_archive'
+        indexes = [
+            models.Index(fields=['timestamp', 'id'], name='audit_archive_ts_id_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} {self.action} {self.asset} at {self.timestamp} (archived)"
+
+
+class AuditDailyRollup(models.Model):
+    """Number of archived audit entries of one day, action, user and asset (see audit.archive)."""
+    day = models.DateField()
+    action = models.CharField(max_length=20)
+    # Not foreign keys: rollups outlive the users and assets they count, and 0 stands for none
+    user = models.PositiveIntegerField(default=0)
+    asset = models.PositiveIntegerField(default=0)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'action', 'user', 'asset'], name='audit_rollup_key_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'day'], name='audit_rollup_user_day_idx'),
+            models.Index(fields=['asset', 'day'], name='audit_rollup_asset_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.count} {self.action} entries on {self.day} by user #{self.user} on asset #{self.asset}"
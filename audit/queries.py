@@ -0,0 +1,33 @@
+"""
+Audit log filters shaped for the AuditLog indexes.
+
+AuditLog has one composite index per access pattern, each ending in
+(timestamp, id): (asset, timestamp, id), (user, timestamp, id), (action,
+timestamp, id), and (timestamp, id) for unfiltered listings and date ranges.
+A page of entries is then read by walking one index newest first and
+stopping after the page, with no sort step, provided the query has equality
+on the index's leading column and orders by ORDERING.
+
+``conditions`` builds the equality filters of the audit dashboard. The
+order of its terms does not matter to the database, which picks the index
+itself; with these indexes every combination of filters is served by one of
+them.
+"""
+from django.db.models import Q
+
+ORDERING = ('-timestamp', '-id')
+LOOKUPS = {'asset': 'asset_id', 'user': 'user_id', 'action': 'action'}
+
+
+def clean_id(value):
+    """An id from a query parameter, or None if missing or not a number"""
+    try:
+        return int(value) if value not in (None, '') else None
+    except (TypeError, ValueError):
+        return None
+
+
+def conditions(user=None, action=None, asset=None):
+    """Q of equality filters on user id, action and asset id; empty ones are ignored"""
+    filters = {'asset': clean_id(asset), 'user': clean_id(user), 'action': action or None}
+    return Q(**{LOOKUPS[column]: value for column, value in filters.items() if value is not None})
@@ -1,3 +1,4 @@
+from audit import buffer
 from audit.models import AuditLog
 
 # Action constants for audit logging
@@ -6,6 +7,10 @@ MAINTENANCE_ACTION = 'maintenance'
 SCAN_ACTION = 'scan'
 
 def log_audit(user, action, asset=None, details='', related_user=None, related_asset=None, metadata=None):
+    """Record an audit entry: behind the request when AUDIT_LOG_MODE is 'buffered' (audit.buffer), at once when 'sync'"""
+    if buffer.buffered():
+        buffer.log(buffer.record(user, action, asset, details, related_user, related_asset, metadata))
+        return
     AuditLog.objects.create(
         user=user,
         action=action,
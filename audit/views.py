@@ -4,13 +4,25 @@ from .models import AuditLog
 from users.models import User
 from assets.models import Asset
 from django.core.paginator import Paginator
-from django.db.models import Q
+from django.db.models import Q, prefetch_related_objects
+from django.utils.dateparse import parse_date
+from . import archive, queries
+import datetime
+from django.utils import timezone
 
 # Create your views here.
 
+def local_midnight(value):
+    try:
+        day = parse_date(value) if value else None
+    except ValueError:
+        day = None
+    if day is None:
+        return None
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
 @login_required
 def audit_dashboard(request):
-    logs = AuditLog.objects.select_related('user', 'asset').all()
     users = User.objects.all()
     assets = Asset.objects.all()
     actions = AuditLog.ACTION_CHOICES
@@ -20,25 +32,26 @@ def audit_dashboard(request):
     asset_id = request.GET.get('asset')
     date_from = request.GET.get('date_from')
     date_to = request.GET.get('date_to')
-    if user_id:
-        logs = logs.filter(user_id=user_id)
-    if action:
-        logs = logs.filter(action=action)
-    if asset_id:
-        logs = logs.filter(asset_id=asset_id)
-    if date_from:
-        logs = logs.filter(timestamp__gte=date_from)
-    if date_to:
-        logs = logs.filter(timestamp__lte=date_to)
+    # Equality filters; every combination is served by an AuditLog index (audit.queries)
+    q = queries.conditions(user=user_id, action=action, asset=asset_id)
     # Search
     search = request.GET.get('search')
     if search:
-        logs = logs.filter(Q(details__icontains=search) | Q(asset__dynamic_data__icontains=search))
-    logs = logs.order_by('-timestamp')
+        q &= Q(details__icontains=search) | Q(asset__dynamic_data__icontains=search)
+    # Archived months are only searched when the date range reaches back to them
+    since = local_midnight(date_from)
+    until = local_midnight(date_to)
+    logs = archive.query(q, since, until)
+    if logs.query.combinator is None:
+        logs = logs.select_related('user', 'asset')
+    logs = logs.order_by(*queries.ORDERING)
     # Pagination
     paginator = Paginator(logs, 25)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
+    if logs.query.combinator:
+        page_obj.object_list = list(page_obj.object_list)
+        prefetch_related_objects(page_obj.object_list, 'user', 'asset')
     return render(request, 'audit/audit_dashboard.html', {
         'page_obj': page_obj,
         'users': users,
@@ -2,11 +2,14 @@ from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required, user_passes_test
 from .models import Report
 from django.http import HttpResponse
-import pandas as pd
 from assets.models import Asset
-from django.core.files.base import ContentFile
+from assets import xlsx
+from assets.exports import column_types, export_columns, iter_rows
+from django.core.files import File
 from django.urls import reverse
+import csv
 import io
+import tempfile
 
 def is_admin_or_manager(user):
     return user.is_authenticated and user.role in ('admin', 'manager')
@@ -25,38 +28,31 @@ def generate_report(request):
         report_type = request.POST.get('report_type')
         fmt = request.POST.get('format')
         if report_type == 'asset_summary':
-            # Gather asset data
-            assets = Asset.objects.select_related('category', 'assigned_to').all()
-            data = []
-            for asset in assets:
-                data.append({
-                    'ID': asset.pk,
-                    'Category': asset.category.name,
-                    'Status': asset.status,
-                    'Assigned To': str(asset.assigned_to) if asset.assigned_to else '',
-                    'Created': asset.created_at.strftime('%Y-%m-%d %H:%M'),
-                    'Updated': asset.updated_at.strftime('%Y-%m-%d %H:%M'),
-                    **asset.dynamic_data
-                })
-            df = pd.DataFrame(data)
-            # Generate file
+            # Stream asset rows into a temporary file rather than building the report in memory
+            assets = Asset.objects.all()
+            header = export_columns()
+            report_file = tempfile.TemporaryFile()
             if fmt == 'excel':
-                buffer = io.BytesIO()
-                with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
-                    df.to_excel(writer, index=False, sheet_name='Assets')
-                file_content = buffer.getvalue()
+                xlsx.write_rows(report_file, header, iter_rows(assets, header), column_types(header))
                 ext = 'xlsx'
             elif fmt == 'csv':
-                file_content = df.to_csv(index=False).encode('utf-8')
+                text = io.TextIOWrapper(report_file, encoding='utf-8', newline='')
+                writer = csv.writer(text)
+                writer.writerow(header)
+                writer.writerows(iter_rows(assets, header))
+                text.flush()
+                text.detach()
                 ext = 'csv'
             else:
+                report_file.close()
                 return HttpResponse('Invalid format', status=400)
+            report_file.seek(0)
             # Save to Report model
             report = Report.objects.create(
                 report_type=fmt,
                 created_by=request.user
             )
-            report.file.save(f'asset_summary_{report.pk}.{ext}', ContentFile(file_content))
-            report.save()
+            with report_file:
+                report.file.save(f'asset_summary_{report.pk}.{ext}', File(report_file))
             return redirect(reverse('reports_dashboard'))
     return HttpResponse('Invalid request', status=400)
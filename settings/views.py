@@ -46,9 +46,9 @@ def settings_dashboard(request):
     total_users = 0
     total_assets = 0
     try:
-        from assets.models import Asset
+        from assets import stats
         total_users = User.objects.count()
-        total_assets = Asset.objects.count()
+        total_assets = stats.total_assets()
     except:
         pass
     
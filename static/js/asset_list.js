@@ -112,6 +112,41 @@ document.addEventListener('DOMContentLoaded', function() {
       document.querySelectorAll('.export-col').forEach(cb => {
         if (!cb.checked) cb.disabled = true;
       });
+      // Excel and PDF run as background jobs: queue, poll, then download
+      const format = exportForm.querySelector('[name="format"]').value;
+      if (format === 'xlsx' || format === 'pdf') {
+        e.preventDefault();
+        const body = new FormData(exportForm);
+        body.append('background', '1');
+        document.querySelectorAll('.export-col').forEach(cb => { cb.disabled = false; });
+        fetch(exportForm.action, {method: 'POST', body: body, credentials: 'same-origin', headers: {'X-Requested-With': 'XMLHttpRequest'}})
+          .then(r => r.json())
+          .then(data => pollExportJob(data.job))
+          .catch(() => setExportMessage('Export could not be started.'));
+      }
     });
   }
+  function setExportMessage(text) {
+    const summary = document.getElementById('export-summary');
+    if (summary) summary.textContent = text;
+  }
+  function pollExportJob(job) {
+    if (!job) {
+      setExportMessage('Export could not be started.');
+    } else if (job.status === 'done') {
+      setExportMessage('Export ready, downloading...');
+      window.location = job.download_url;
+    } else if (job.status === 'failed') {
+      setExportMessage(`Export failed: ${job.error}`);
+    } else {
+      const progress = job.progress !== null ? ` (${job.progress}%)` : '';
+      setExportMessage(`Export ${job.status}${progress}...`);
+      setTimeout(() => {
+        fetch(job.status_url, {credentials: 'same-origin'})
+          .then(r => r.json())
+          .then(data => pollExportJob(data.job))
+          .catch(() => setExportMessage('Lost track of the export; try again.'));
+      }, 2000);
+    }
+  }
 }); 
\ No newline at end of file
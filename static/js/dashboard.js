@@ -242,20 +242,151 @@ function fetchAndRenderAllActivityFeeds() {
 }
 
 function loadDashboardData() {
-  Promise.all([
-    fetch('/dashboard_summary_api/').then(r => r.json())
-    // Removed fetch('/dashboard_activity_api/') and renderActivityTable
-  ]).then(([summary]) => {
-    const widgets = [
-      renderDashboardCards(summary)
-      // Removed legacy activity table rendering
-    ].join('');
-    document.getElementById('dashboard-widgets').innerHTML = widgets;
+  // Cards and charts in one request. The browser revalidates it with
+  // If-None-Match, so an unchanged dashboard costs a 304 and no re-render.
+  fetch('/dashboard/bundle/', { cache: 'no-cache' })
+    .then(r => {
+      const etag = r.headers.get('ETag');
+      if (etag && etag === window._dashboardETag) return null;
+      window._dashboardETag = etag;
+      return r.json();
+    })
+    .then(bundle => {
+      if (!bundle) return;
+      window._dashboardBundle = bundle;
+      document.getElementById('dashboard-widgets').innerHTML = renderDashboardCards(bundle.summary);
+      renderDashboardCharts(bundle.charts);
+    })
+    .catch(() => {
+      document.querySelectorAll('canvas[id^="chart-"]').forEach(ctx => {
+        ctx.parentNode.querySelector('h5').innerHTML += ' <span style="color:#888;font-size:0.95rem;">(Error loading data)</span>';
+      });
+    });
+}
+
+// Push channel: /dashboard/events/ tells the page what changed (assets.events)
+const AUDIT_FEEDS = {
+  create: 'recent-added-assets',
+  add: 'recent-added-assets',
+  scan: 'recent-scans',
+  assign: 'recent-transfers',
+  maintenance: 'recent-maintenance',
+};
+const dashboardTimers = {};
+
+function debounce(key, fn, delay) {
+  // Coalesce bursts of events (a bulk import, a batch of scans) into one reload
+  if (dashboardTimers[key]) return;
+  dashboardTimers[key] = setTimeout(() => {
+    delete dashboardTimers[key];
+    fn();
+  }, delay);
+}
+
+function applyAssetChange(change, stream) {
+  // Move the asset between KPI and category counts locally; charts that
+  // depend on other fields catch up with a debounced bundle revalidation.
+  const bundle = window._dashboardBundle;
+  if (!bundle || JSON.stringify(change.from) === JSON.stringify(change.to)) return;
+  const kpis = bundle.summary.kpis;
+  const byCategory = bundle.summary.by_category;
+  const categoryChart = bundle.charts && bundle.charts.category;
+  const adjust = (state, delta) => {
+    if (!state || (stream.role === 'user' && state.assignee !== stream.user_id)) return;
+    kpis.total_assets = (kpis.total_assets || 0) + delta;
+    kpis[`${state.status}_assets`] = (kpis[`${state.status}_assets`] || 0) + delta;
+    const assignment = state.assignee ? 'assigned_assets' : 'unassigned_assets';
+    kpis[assignment] = (kpis[assignment] || 0) + delta;
+    byCategory[state.category] = (byCategory[state.category] || 0) + delta;
+    if (categoryChart) {
+      let index = categoryChart.labels.indexOf(state.category);
+      if (index < 0) {
+        categoryChart.labels.push(state.category);
+        categoryChart.data.push(0);
+        index = categoryChart.labels.length - 1;
+      }
+      categoryChart.data[index] += delta;
+    }
+  };
+  adjust(change.from, -1);
+  adjust(change.to, 1);
+  document.getElementById('dashboard-widgets').innerHTML = renderDashboardCards(bundle.summary);
+  const ctx = document.getElementById('chart-category');
+  if (categoryChart && ctx && ctx._chartInstance) {
+    ctx._chartInstance.data.labels = categoryChart.labels;
+    ctx._chartInstance.data.datasets[0].data = categoryChart.data;
+    ctx._chartInstance.update();
+  }
+}
+
+function refreshAuditFeeds(actions) {
+  const feeds = new Set(actions.map(action => AUDIT_FEEDS[action]).filter(Boolean));
+  feeds.add('audit-log');
+  feeds.forEach(feed => debounce(feed, () => fetchAndRenderActivityFeed(feed), 1000));
+  if (window._activityLogCurrentPage === 1) {
+    debounce('activity-log', () => fetchAndRenderActivityLogTable(1), 1000);
+  }
+}
+
+function startPolling() {
+  if (!window._dashboardPoll) {
+    window._dashboardPoll = setInterval(loadDashboardData, 60000);
+  }
+}
+
+function stopPolling() {
+  clearInterval(window._dashboardPoll);
+  window._dashboardPoll = null;
+}
+
+function setPushChannel(open) {
+  // While the stream is open its keepalives keep the session alive
+  if (window.sessionManager && window.sessionManager.setPushChannel) {
+    window.sessionManager.setPushChannel(open);
+  }
+}
+
+function connectDashboardEvents() {
+  if (!window.EventSource) {
+    startPolling();
+    return;
+  }
+  const source = new EventSource('/dashboard/events/');
+  const stream = {};
+  source.addEventListener('hello', e => {
+    Object.assign(stream, JSON.parse(e.data));
+    stopPolling();
+    setPushChannel(true);
+  });
+  source.addEventListener('asset', e => {
+    applyAssetChange(JSON.parse(e.data), stream);
+    debounce('bundle', loadDashboardData, 5000);
+  });
+  source.addEventListener('audit', e => refreshAuditFeeds(JSON.parse(e.data).actions));
+  source.addEventListener('refresh', () => debounce('bundle', loadDashboardData, 2000));
+  source.addEventListener('resync', () => {
+    loadDashboardData();
+    fetchAndRenderAllActivityFeeds();
+    fetchAndRenderActivityLogTable(window._activityLogCurrentPage || 1);
+  });
+  source.addEventListener('session', () => {
+    // Signed out elsewhere or timed out: let the server redirect to login
+    source.close();
+    window.location.reload();
   });
+  source.onerror = () => {
+    // The browser reconnects by itself unless the stream was refused
+    // (204 when the server runs under WSGI)
+    setPushChannel(false);
+    if (source.readyState === EventSource.CLOSED) {
+      startPolling();
+      setTimeout(connectDashboardEvents, 60000);
+    }
+  };
 }
 
 // Chart.js integration for dashboard charts
-function renderDashboardCharts() {
+function renderDashboardCharts(charts) {
   const chartConfigs = [
     { id: 'chart-category', type: 'doughnut', chart: 'category', label: 'Assets by Category' },
     { id: 'chart-acquisition', type: 'line', chart: 'acquisition', label: 'Asset Acquisition Over Time' },
@@ -264,53 +395,46 @@ function renderDashboardCharts() {
     { id: 'chart-depreciation', type: 'line', chart: 'depreciation', label: 'Depreciation / Value Trend' },
   ];
   chartConfigs.forEach(cfg => {
-    fetch(`/dashboard_chart_data_api/?chart=${cfg.chart}`)
-      .then(r => r.json())
-      .then(data => {
-        const ctx = document.getElementById(cfg.id);
-        if (!ctx) return;
-        // Destroy previous chart instance if exists
-        if (ctx._chartInstance) {
-          ctx._chartInstance.destroy();
-        }
-        if (!data || !data.labels || !data.data || data.data.every(v => v === 0)) {
-          ctx.parentNode.querySelector('h5').innerHTML += ' <span style="color:#888;font-size:0.95rem;">(No data)</span>';
-          return;
-        }
-        ctx._chartInstance = new Chart(ctx, {
-          type: cfg.type,
-          data: {
-            labels: data.labels,
-            datasets: [{
-              label: cfg.label,
-              data: data.data,
-              backgroundColor: [
-                '#00A6EB','#28a745','#ffc107','#6c757d','#dc3545','#007bff','#adb5bd','#fd7e14','#6610f2','#17a2b8','#343a40'
-              ],
-              borderColor: '#fff',
-              borderWidth: 1,
-              fill: cfg.type === 'line' ? true : false,
-              tension: 0.3
-            }]
-          },
-          options: {
-            responsive: true,
-            plugins: {
-              legend: { display: cfg.type !== 'line' },
-              tooltip: { enabled: true },
-              title: { display: false }
-            },
-            scales: cfg.type === 'line' ? {
-              x: { display: true, title: { display: false } },
-              y: { display: true, beginAtZero: true }
-            } : {}
-          }
-        });
-      })
-      .catch(() => {
-        const ctx = document.getElementById(cfg.id);
-        if (ctx) ctx.parentNode.querySelector('h5').innerHTML += ' <span style="color:#888;font-size:0.95rem;">(Error loading data)</span>';
-      });
+    const data = charts[cfg.chart];
+    const ctx = document.getElementById(cfg.id);
+    if (!ctx) return;
+    // Destroy previous chart instance if exists
+    if (ctx._chartInstance) {
+      ctx._chartInstance.destroy();
+    }
+    if (!data || !data.labels || !data.data || data.data.every(v => v === 0)) {
+      ctx.parentNode.querySelector('h5').innerHTML += ' <span style="color:#888;font-size:0.95rem;">(No data)</span>';
+      return;
+    }
+    ctx._chartInstance = new Chart(ctx, {
+      type: cfg.type,
+      data: {
+        labels: data.labels,
+        datasets: [{
+          label: cfg.label,
+          data: data.data,
+          backgroundColor: [
+            '#00A6EB','#28a745','#ffc107','#6c757d','#dc3545','#007bff','#adb5bd','#fd7e14','#6610f2','#17a2b8','#343a40'
+          ],
+          borderColor: '#fff',
+          borderWidth: 1,
+          fill: cfg.type === 'line' ? true : false,
+          tension: 0.3
+        }]
+      },
+      options: {
+        responsive: true,
+        plugins: {
+          legend: { display: cfg.type !== 'line' },
+          tooltip: { enabled: true },
+          title: { display: false }
+        },
+        scales: cfg.type === 'line' ? {
+          x: { display: true, title: { display: false } },
+          y: { display: true, beginAtZero: true }
+        } : {}
+      }
+    });
   });
 }
 
@@ -437,7 +561,6 @@ document.addEventListener('DOMContentLoaded', function() {
   // Sidebar collapse (future)
   // Dropdowns, tooltips, etc. (future)
   loadDashboardData();
-  renderDashboardCharts();
   // Show loading indicators before fetching
   setLoading('recent-added-assets');
   setLoading('recent-scans');
@@ -457,7 +580,6 @@ document.addEventListener('DOMContentLoaded', function() {
             fetchAndRenderActivityLogTable(window._activityLogCurrentPage + 1);
         }
     });
-  // Optionally, refresh every 60s for real-time effect
-  setInterval(loadDashboardData, 60000);
-  setInterval(renderDashboardCharts, 60000);
+  // Live updates over the push channel, polling every 60s without one
+  connectDashboardEvents();
 }); 
\ No newline at end of file
@@ -7,6 +7,7 @@ class EnterpriseSessionManager {
         this.sessionId = this.generateSessionId();
         this.heartbeatInterval = 30000; // 30 seconds
         this.heartbeatTimer = null;
+        this.pushChannel = false;
         this.init();
     }
     
@@ -52,11 +53,21 @@ class EnterpriseSessionManager {
     }
     
     resumeHeartbeat() {
-        if (!this.heartbeatTimer) {
+        if (!this.heartbeatTimer && !this.pushChannel) {
             this.startHeartbeat();
         }
     }
     
+    setPushChannel(open) {
+        // An open dashboard event stream keeps the session alive server-side
+        this.pushChannel = open;
+        if (open) {
+            this.pauseHeartbeat();
+        } else {
+            this.resumeHeartbeat();
+        }
+    }
+    
     async sendHeartbeat() {
         try {
             const response = await fetch('/settings/api/session/heartbeat/', {